@@ -0,0 +1,115 @@
+"""
+성향 지도 데이터 저장 모듈
+- 캐릭터 기본 성향을 페르소나 해시로 키를 단 스냅샷 파일에 저장해, 재시작 시 계산 없이 불러옵니다.
+- 사용자의 최근 대화로 계산한 캐릭터별 성향 보정값을 메모리에 캐시합니다.
+  대화/메시지가 저장되거나 삭제되면 해당 사용자의 캐시를 비웁니다.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# 캐릭터 기본 성향 스냅샷 파일 경로
+ARCHETYPE_SNAPSHOT_PATH = os.environ.get("ARCHETYPE_SNAPSHOT_PATH", "./archetype_snapshot.json")
+# 스냅샷 형식/계산 방식이 바뀌면 올려서 기존 스냅샷을 버림
+ARCHETYPE_SNAPSHOT_VERSION = 1
+
+# 사용자별 보정값 캐시 유지 시간 (초)
+ARCHETYPE_ADJUSTMENT_TTL_SECONDS = int(os.environ.get("ARCHETYPE_ADJUSTMENT_TTL_SECONDS", "600"))
+# 캐시할 사용자 수
+ARCHETYPE_ADJUSTMENT_CACHE_SIZE = 4096
+
+# 캐릭터 ID -> (대화 기반 warmth, 대화 기반 realism)
+AdjustmentVector = Dict[str, Tuple[float, float]]
+
+
+# ===========================================
+# 캐릭터 기본 성향 스냅샷
+# ===========================================
+
+def personas_hash(personas: dict) -> str:
+    """페르소나 정의 해시 (페르소나가 바뀌면 스냅샷을 다시 계산)"""
+    payload = json.dumps(personas, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_archetype_snapshot(personas_key: str, path: str = ARCHETYPE_SNAPSHOT_PATH) -> Optional[List[dict]]:
+    """버전과 페르소나 해시가 맞는 스냅샷의 캐릭터 성향 목록 (없거나 맞지 않으면 None)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[성향 지도] 스냅샷 읽기 실패 (무시됨): {e}")
+        return None
+
+    if not isinstance(snapshot, dict):
+        return None
+    if snapshot.get("version") != ARCHETYPE_SNAPSHOT_VERSION or snapshot.get("personas_hash") != personas_key:
+        return None
+    characters = snapshot.get("characters")
+    return characters if isinstance(characters, list) else None
+
+
+def save_archetype_snapshot(personas_key: str, characters: List[dict], path: str = ARCHETYPE_SNAPSHOT_PATH):
+    """캐릭터 성향 목록을 스냅샷 파일에 저장 (임시 파일에 쓴 뒤 교체)"""
+    snapshot = {
+        "version": ARCHETYPE_SNAPSHOT_VERSION,
+        "personas_hash": personas_key,
+        "characters": [dict(c) for c in characters],
+    }
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[성향 지도] 스냅샷 저장 실패 (무시됨): {e}")
+
+
+# ===========================================
+# 사용자별 성향 보정 캐시
+# ===========================================
+
+class ArchetypeAdjustmentCache:
+    """사용자별 캐릭터 성향 보정값 캐시"""
+
+    def __init__(self, ttl: int = ARCHETYPE_ADJUSTMENT_TTL_SECONDS, maxsize: int = ARCHETYPE_ADJUSTMENT_CACHE_SIZE):
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[int, Tuple[float, AdjustmentVector]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[AdjustmentVector]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, adjustments = entry
+            if expires_at < time.time():
+                self._entries.pop(user_id, None)
+                return None
+            self._entries.move_to_end(user_id)
+            return adjustments
+
+    def put(self, user_id: int, adjustments: AdjustmentVector):
+        with self._lock:
+            self._entries[user_id] = (time.time() + self._ttl, adjustments)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[int]):
+        """사용자의 대화가 저장/삭제되었을 때 호출"""
+        if user_id is None:
+            return
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+archetype_adjustments = ArchetypeAdjustmentCache()
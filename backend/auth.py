@@ -4,7 +4,8 @@
 JWT 토큰 생성 및 검증, 비밀번호 해싱 유틸리티도 포함합니다.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
@@ -14,7 +15,8 @@ from datetime import datetime, timedelta
 from typing import Optional
 from pydantic import BaseModel, EmailStr, field_validator
 
-from database import get_db, User
+from database import get_db, release_connection, User
+from avatar_store import get_avatar, get_profile_pic, set_avatar, avatar_url, decode_avatar, etag_matches, validate_avatar_data
 from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -62,6 +64,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def token_subject(token: str) -> Optional[str]:
+    """토큰의 사용자 이름 (검증에 실패하면 None)"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     """현재 로그인한 사용자 가져오기 (필수)"""
     credentials_exception = HTTPException(
@@ -80,6 +90,8 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
+    # async 엔드포인트가 LLM 응답을 기다리는 동안 연결을 쥐고 있지 않도록 조회 트랜잭션을 끝냄
+    release_connection(db)
     return user
 
 
@@ -97,6 +109,7 @@ def get_current_user_optional(credentials: Optional[HTTPAuthorizationCredentials
         return None
     try:
         user = db.query(User).filter(User.username == username).first()
+        release_connection(db)
         return user
     except Exception as e:
         # 데이터베이스 연결 오류 등 예외 발생 시 None 반환
@@ -175,6 +188,13 @@ class UserProfile(BaseModel):
 class UserProfileUpdate(BaseModel):
     nickname: Optional[str] = None
     profile_pic: Optional[str] = None
+    
+    @field_validator('profile_pic')
+    @classmethod
+    def validate_profile_pic(cls, v):
+        if v is None:
+            return v
+        return validate_avatar_data(v)
 
 
 # ===========================================
@@ -217,7 +237,8 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
             "username": db_user.username,
             "email": db_user.email,
             "nickname": db_user.nickname,
-            "profile_pic": db_user.profile_pic or ""
+            "profile_pic": "",
+            "avatar_url": None
         }
     }
 
@@ -242,20 +263,22 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
             "username": user.username,
             "email": user.email,
             "nickname": user.nickname,
-            "profile_pic": user.profile_pic or ""
+            "profile_pic": get_profile_pic(user.id, db),
+            "avatar_url": avatar_url(user.id, db)
         }
     }
 
 
 @router.get("/me")
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+def get_current_user_info(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """현재 사용자 정보 조회"""
     return {
         "id": current_user.id,
         "username": current_user.username,
         "email": current_user.email,
         "nickname": current_user.nickname,
-        "profile_pic": current_user.profile_pic or ""
+        "profile_pic": get_profile_pic(current_user.id, db),
+        "avatar_url": avatar_url(current_user.id, db)
     }
 
 
@@ -265,7 +288,7 @@ def update_profile(profile_data: UserProfileUpdate, current_user: User = Depends
     if profile_data.nickname is not None:
         current_user.nickname = profile_data.nickname
     if profile_data.profile_pic is not None:
-        current_user.profile_pic = profile_data.profile_pic
+        set_avatar(current_user.id, profile_data.profile_pic, db)
     db.commit()
     db.refresh(current_user)
     return {
@@ -273,8 +296,36 @@ def update_profile(profile_data: UserProfileUpdate, current_user: User = Depends
         "username": current_user.username,
         "email": current_user.email,
         "nickname": current_user.nickname,
-        "profile_pic": current_user.profile_pic or ""
+        "profile_pic": get_profile_pic(current_user.id, db),
+        "avatar_url": avatar_url(current_user.id, db)
+    }
+
+
+@router.get("/avatar/{user_id}/{etag}")
+def get_user_avatar(user_id: int, etag: str, request: Request, db: Session = Depends(get_db)):
+    """프로필 사진 이미지 (ETag로 캐시 검증, 변경이 없으면 304)
+
+    로그인 없이 <img>로 불러오므로, 사진 내용 해시가 들어간 avatar_url을 아는 경우에만 응답합니다.
+    """
+    avatar = get_avatar(user_id, db)
+    if avatar is None or not etag_matches(avatar, etag):
+        raise HTTPException(status_code=404, detail="Avatar not found")
+
+    etag_header = f'"{avatar.etag}"'
+    headers = {
+        "ETag": etag_header,
+        "Cache-Control": "private, max-age=86400",
+        "X-Content-Type-Options": "nosniff",
     }
+    if request.headers.get("if-none-match") == etag_header:
+        return Response(status_code=304, headers=headers)
+
+    decoded = decode_avatar(avatar.data)
+    if decoded is None:
+        # 이전 버전에서 옮겨온 이미지가 아닌 값은 내보내지 않음
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    content, media_type = decoded
+    return Response(content=content, media_type=media_type, headers=headers)
 
 
 @router.post("/password-reset-request")
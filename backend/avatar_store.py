@@ -0,0 +1,111 @@
+"""
+프로필 사진 저장 모듈
+프로필 사진(base64 data URL)은 users 테이블이 아닌 user_avatars 테이블에 저장합니다.
+인증 시 사용자 조회는 작은 식별 정보만 읽고, 사진은 필요한 응답이나 GET /auth/avatar/{user_id}/{etag}에서만 읽습니다.
+저장할 수 있는 값은 래스터 이미지 data URL(png/jpeg/gif/webp)뿐이며, 프론트엔드 기본 이미지 주소는 사진 없음으로 저장합니다.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+from typing import Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import UserAvatar
+
+# 프로필 사진으로 받는 이미지 형식 (스크립트를 담을 수 있는 svg/html 등은 받지 않음)
+ALLOWED_AVATAR_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp")
+
+# 프론트엔드 기본 프로필 이미지 주소 (사진 없음과 같음)
+DEFAULT_AVATAR_URLS = frozenset({
+    "https://placehold.co/100x100/bcaaa4/795548?text=User",
+})
+
+
+def _split_data_url(data: str) -> Optional[Tuple[str, str]]:
+    """허용된 이미지 형식의 base64 data URL이면 (media type, base64 본문)"""
+    if not data.startswith("data:") or "," not in data:
+        return None
+    header, encoded = data[5:].split(",", 1)
+    media_type, _, encoding = header.partition(";")
+    if media_type.lower() not in ALLOWED_AVATAR_TYPES or encoding != "base64":
+        return None
+    return media_type.lower(), encoded
+
+
+def validate_avatar_data(data: str) -> str:
+    """저장 가능한 프로필 사진 값인지 확인 (아니면 ValueError). 기본 이미지 주소는 빈 값으로 바꿈"""
+    if not data or data in DEFAULT_AVATAR_URLS:
+        return ""
+    parts = _split_data_url(data)
+    if parts is None:
+        raise ValueError("프로필 사진은 png/jpeg/gif/webp 이미지의 base64 data URL이어야 합니다.")
+    try:
+        base64.b64decode(parts[1], validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("프로필 사진의 base64 데이터가 올바르지 않습니다.")
+    return data
+
+
+def avatar_etag(data: str) -> str:
+    """프로필 사진 내용 해시 (HTTP ETag 값)"""
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+
+def get_avatar(user_id: int, db: Session) -> Optional[UserAvatar]:
+    return db.query(UserAvatar).filter(UserAvatar.user_id == user_id).first()
+
+
+def get_profile_pic(user_id: int, db: Session) -> str:
+    """저장된 프로필 사진 (없으면 빈 문자열)"""
+    data = db.query(UserAvatar.data).filter(UserAvatar.user_id == user_id).scalar()
+    return data or ""
+
+
+def set_avatar(user_id: int, data: str, db: Session) -> Optional[UserAvatar]:
+    """프로필 사진 저장/교체 (빈 값이나 기본 이미지 주소면 삭제, 허용되지 않는 값이면 ValueError). 커밋은 호출한 쪽에서 합니다."""
+    data = validate_avatar_data(data)
+    avatar = get_avatar(user_id, db)
+    if not data:
+        if avatar is not None:
+            db.delete(avatar)
+        return None
+
+    etag = avatar_etag(data)
+    if avatar is None:
+        avatar = UserAvatar(user_id=user_id, data=data, etag=etag)
+        db.add(avatar)
+    elif avatar.etag != etag:
+        avatar.data = data
+        avatar.etag = etag
+    return avatar
+
+
+def avatar_url(user_id: int, db: Session) -> Optional[str]:
+    """캐시 가능한 프로필 사진 URL (내용 해시가 경로에 들어가 내용이 바뀌면 URL도 바뀜, 사진이 없으면 None)
+
+    로그인 없이 받을 수 있는 주소이므로 사용자 번호만으로는 추측할 수 없도록 해시 전체를 넣습니다.
+    """
+    etag = db.query(UserAvatar.etag).filter(UserAvatar.user_id == user_id).scalar()
+    if not etag:
+        return None
+    return f"/auth/avatar/{user_id}/{etag}"
+
+
+def etag_matches(avatar: UserAvatar, etag: str) -> bool:
+    """요청 경로의 해시가 저장된 사진의 해시와 같은지 (상수 시간 비교)"""
+    return hmac.compare_digest(avatar.etag.encode("ascii"), etag.encode("ascii", "replace"))
+
+
+def decode_avatar(data: str) -> Optional[Tuple[bytes, str]]:
+    """data URL을 (이미지 바이트, media type)으로 변환 (허용된 이미지 data URL이 아니거나 잘못되면 None)"""
+    parts = _split_data_url(data)
+    if parts is None:
+        return None
+    media_type, encoded = parts
+    try:
+        return base64.b64decode(encoded, validate=False), media_type
+    except (binascii.Error, ValueError):
+        return None
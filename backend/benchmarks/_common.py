@@ -0,0 +1,58 @@
+"""
+벤치마크 공용 도우미
+- 백엔드 디렉토리를 모듈 경로에 올리고, 비교할 이전 커밋의 모듈을 git에서 꺼내 불러옵니다.
+- API 키 없이 실행되도록 키 환경변수(Gemini/날씨)를 비우고, DATABASE_URL이 없으면 임시 SQLite DB를 씁니다.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import types
+import subprocess
+from typing import Callable, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+
+os.environ.pop("GOOGLE_API_KEY", None)
+os.environ.pop("GEMINI_API_KEY", None)
+os.environ.pop("WEATHER_API_KEY", None)
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='drama_chat_bench_'), 'bench.db')}"
+)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def load_module_at(revision: str, path: str, name: str) -> types.ModuleType:
+    """git 리비전의 파일(저장소 기준 경로)을 별도 이름의 모듈로 불러오기
+
+    불러온 모듈의 import는 현재 작업 트리의 모듈을 가리킵니다.
+    """
+    source = subprocess.run(
+        ["git", "show", f"{revision}:{path}"], cwd=REPO_DIR, check=True, capture_output=True
+    ).stdout.decode("utf-8")
+    module = types.ModuleType(name)
+    module.__file__ = f"{revision}:{path}"
+    sys.modules[name] = module
+    exec(compile(source, module.__file__, "exec"), module.__dict__)
+    return module
+
+
+def best_of(func: Callable[[], object], repeat: int = 3) -> Tuple[float, object]:
+    """func를 repeat번 실행해 가장 빠른 시간(초)과 마지막 결과 반환"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def report(title: str, rows, unit: str = "s"):
+    """(이름, 시간) 목록을 첫 행 대비 배율과 함께 출력"""
+    print(title)
+    base = rows[0][1]
+    for name, seconds in rows:
+        print(f"  {seconds:8.3f}{unit}  x{base / seconds:5.2f}  {name}")
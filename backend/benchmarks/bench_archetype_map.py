@@ -0,0 +1,121 @@
+"""
+성향 지도 벤치마크
+최근 대화 30개(메시지 각 20개)가 있는 사용자로 성향 지도(21명 전체)를 요청할 때, 요청당 SELECT 수와 시간을 비교하고
+두 구현의 응답이 같은지 확인합니다.
+- 캐릭터마다 보정 조회: 사용자 보정을 캐릭터마다 따로 조회/계산 (변경 전, 84d6a05^)
+- 최근 대화 한 번 조회, 캐시 미스: 최근 대화를 한 번 읽어 캐릭터별로 나눔 (현재, 보정값 캐시를 비운 상태)
+- 최근 대화 한 번 조회, 캐시 적중: 현재 구현에서 보정값 캐시가 있는 경우
+
+캐릭터 기본 성향은 두 구현에 같은 값을 미리 넣어 두고, 사용자 보정 단계만 비교합니다.
+
+    python benchmarks/bench_archetype_map.py [--requests 20]
+"""
+
+import os
+import copy
+import json
+import argparse
+import tempfile
+import threading
+
+os.environ.setdefault("ARCHETYPE_SNAPSHOT_PATH", os.path.join(tempfile.mkdtemp(prefix="archetype_bench_"), "snapshot.json"))
+
+from _common import best_of, load_module_at, report  # noqa: E402
+
+from sqlalchemy import event  # noqa: E402
+
+import features  # noqa: E402
+from archetype_store import archetype_adjustments  # noqa: E402
+from chat_store import replace_messages  # noqa: E402
+from database import engine, SessionLocal, ChatHistory, User  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+from personas import CHARACTER_PERSONAS  # noqa: E402
+
+CHATS = 30
+MESSAGES_PER_CHAT = 20
+USER_LINES = ["오늘 좀 힘들었어", "너랑 얘기하면 마음이 편해", "현실적으로 생각해보면 어려워", "꿈 같은 얘기지만 해보고 싶어"]
+AI_LINES = ["따뜻하게 안아주고 싶다", "현실은 현실이지", "언젠가 그 꿈 이뤄질 거야", "위로가 됐으면 좋겠어"]
+
+
+def seed_user(db) -> User:
+    user = User(username="archetype_bench", email="archetype_bench@example.com", hashed_password="x", nickname="테스터")
+    db.add(user)
+    db.commit()
+    char_ids = list(CHARACTER_PERSONAS)
+    for i in range(CHATS):
+        char_id = char_ids[i % len(char_ids)]
+        chat = ChatHistory(user_id=user.id, title="대화", character_ids=json.dumps([char_id]), messages="[]")
+        db.add(chat)
+        messages = []
+        for j in range(MESSAGES_PER_CHAT):
+            if j % 2 == 0:
+                messages.append({"id": float(j), "sender": "user", "text": USER_LINES[j % 4], "characterId": None})
+            else:
+                # 보정 계산은 character_id 키로 캐릭터를 찾음
+                messages.append({"id": float(j), "sender": "ai", "text": AI_LINES[j % 4],
+                                 "characterId": char_id, "character_id": char_id})
+        replace_messages(chat, messages, db)
+    db.commit()
+    return user
+
+
+def count_selects(call):
+    count = 0
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        nonlocal count
+        if statement.lstrip().upper().startswith("SELECT"):
+            count += 1
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        result = call()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return count, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    run_migrations()
+    db = SessionLocal()
+    user = seed_user(db)
+
+    # 두 구현에 같은 캐릭터 기본 성향 (백그라운드 계산까지 끝난 값)
+    features.initialize_archetype_cache(db)
+    for thread in threading.enumerate():
+        if thread.name == "archetype-warmup":
+            thread.join()
+    before = load_module_at("84d6a05^", "backend/features.py", "features_before_user013")
+    before._character_archetype_cache = copy.deepcopy(features._character_archetype_cache)
+
+    def old_request():
+        return before.get_archetype_map(request=None, character_ids=None, current_user=user, db=db)
+
+    def new_request(cached: bool):
+        if not cached:
+            archetype_adjustments.invalidate(user.id)
+        return features.get_archetype_map(request=None, character_ids=None, current_user=user, db=db)
+
+    old_queries, old_result = count_selects(old_request)
+    miss_queries, new_result = count_selects(lambda: new_request(cached=False))
+    hit_queries, hit_result = count_selects(lambda: new_request(cached=True))
+    assert old_result == new_result == hit_result, "구현별 성향 지도가 다름"
+
+    rows = []
+    for label, call, queries in (
+        ("캐릭터마다 보정 조회", old_request, old_queries),
+        ("최근 대화 한 번 조회, 캐시 미스", lambda: new_request(cached=False), miss_queries),
+        ("최근 대화 한 번 조회, 캐시 적중", lambda: new_request(cached=True), hit_queries),
+    ):
+        seconds, _ = best_of(lambda: [call() for _ in range(args.requests)])
+        rows.append((f"{label} - 요청당 SELECT {queries}개", seconds / args.requests * 1000))
+    report(f"성향 지도 {len(CHARACTER_PERSONAS)}명, 최근 대화 {CHATS}개 x 메시지 {MESSAGES_PER_CHAT}개, 요청당 평균", rows, unit="ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+감정 점수 벤치마크
+채팅 메시지 10만 개(고정 시드)의 감정 점수를 네 가지 구현으로 계산해 시간을 비교하고 결과가 같은지 확인합니다.
+- 목록별 부분 문자열 검색: 키워드 목록마다 `in` 검색 (991dcf1^)
+- 단일 오토마톤: 모든 키워드 목록을 모듈 전용 Aho-Corasick 오토마톤 하나로 (991dcf1)
+- 공용 사전 스캔: 말투/날씨 등 모든 키워드 집합을 함께 훑는 전역 lexicon.scan 경유 (f271a1b)
+- 감정 전용 매처: 현재 구현
+
+공용 사전에는 실제 서버처럼 말투/날씨/기억 키워드 집합까지 모두 등록한 상태에서 잽니다.
+
+    python benchmarks/bench_emotion_scoring.py [--messages 100000]
+"""
+
+import argparse
+import random
+
+from _common import best_of, load_module_at, report
+
+import ai_service  # noqa: F401 - 말투/기억 키워드 집합 등록
+import diary  # noqa: F401 - 날씨/일기 감정 키워드 집합 등록
+import features  # noqa: F401 - 아키타입/기분 키워드 집합 등록
+import emotion_scoring
+from lexicon import lexicon
+
+FILLER = ['오늘', '그냥', '나', '너', '회사에서', '집에', '밥', '먹었어', '했어', '그래서', '근데', '있잖아', '비가', '와서', '날씨']
+ENDINGS = ['', '', '.', '!', '!!', '?', '??', '...', 'ㅋㅋ', 'ㅠㅠ', ' 😊', ' 😢', ' ❤️']
+
+
+def make_messages(count: int, seed: int = 20240101):
+    rng = random.Random(seed)
+    keywords = sorted({keyword for name in lexicon._sets for keyword in lexicon.keywords(name)})
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(3, 12))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        if rng.random() < 0.2:
+            words.insert(0, rng.choice(['너무', '정말', '진짜', '완전', '엄청']))
+        messages.append(' '.join(words) + rng.choice(ENDINGS))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    before = load_module_at('991dcf1^', 'backend/emotion_scoring.py', 'emotion_scoring_substring')
+    automaton = load_module_at('991dcf1', 'backend/emotion_scoring.py', 'emotion_scoring_automaton')
+    shared = load_module_at('f271a1b', 'backend/emotion_scoring.py', 'emotion_scoring_lexicon')
+
+    rows, results = [], []
+    for name, func in (
+        ('목록별 부분 문자열 검색', lambda: [before.calculate_emotion_score(m) for m in messages]),
+        ('단일 오토마톤', lambda: automaton.calculate_emotion_scores(messages)),
+        ('공용 사전 스캔', lambda: shared.calculate_emotion_scores(messages)),
+        ('감정 전용 매처 (현재)', lambda: emotion_scoring.calculate_emotion_scores(messages)),
+    ):
+        seconds, scores = best_of(func, args.repeat)
+        rows.append((name, seconds))
+        results.append(scores)
+
+    assert all(scores == results[0] for scores in results[1:]), '구현별 점수가 다름'
+    report(f'감정 점수 {len(messages):,}개 (최소 {args.repeat}회 중 최단)', rows)
+
+
+if __name__ == '__main__':
+    main()
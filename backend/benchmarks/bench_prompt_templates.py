@@ -0,0 +1,131 @@
+"""
+페르소나 프롬프트 벤치마크
+기준 커밋(df53ca1)의 ai_service가 모델에 보내던 대화 프롬프트(contents)와 현재 프롬프트 템플릿으로 만든 프롬프트가
+바이트 단위로 같은지 확인하고, 요청마다 프롬프트를 조립하는 시간을 비교합니다.
+- 단일 캐릭터: 모든 캐릭터
+- 멀티 캐릭터: 모든 (A, B) 순서쌍 (같은 캐릭터끼리 포함)
+
+기준 구현은 모델 호출 직전에 contents를 가로채고 호출을 중단시켜 얻습니다 (그 시점까지의 시간을 잼).
+시간 컨텍스트가 실행 시각에 따라 달라지지 않도록 두 모듈의 현재 시각을 고정합니다.
+기준 커밋의 ai_service는 그때의 의존성(tenacity)이 필요합니다.
+
+    python benchmarks/bench_prompt_templates.py [--rounds 20]
+"""
+
+import io
+import argparse
+import contextlib
+from datetime import datetime, timezone
+
+from _common import best_of, load_module_at, report
+
+import ai_service
+from personas import CHARACTER_PERSONAS
+from prompt_templates import compile_prompt_skeletons
+
+BASELINE_REVISION = "df53ca1"
+NICKNAME = "민지"
+SETTINGS = {"mood": "romantic", "timeOfDay": "current"}
+HISTORY = [
+    {"role": "user", "parts": [{"text": "오늘 하루 어땠어?"}]},
+    {"role": "model", "parts": [{"text": "너를 기다리느라 길었지."}]},
+    {"role": "user", "parts": [{"text": "나도 보고 싶었어"}]},
+]
+
+
+class FrozenDatetime(datetime):
+    """현재 시각을 고정한 datetime"""
+
+    @classmethod
+    def now(cls, tz=None):
+        fixed = datetime(2026, 10, 16, 12, 30, tzinfo=timezone.utc)
+        return fixed.astimezone(tz) if tz else fixed.replace(tzinfo=None)
+
+
+class _Captured(Exception):
+    pass
+
+
+def load_baseline():
+    baseline = load_module_at(BASELINE_REVISION, "backend/ai_service.py", "ai_service_baseline")
+    baseline.datetime = FrozenDatetime
+    baseline.model = object()
+    return baseline
+
+
+def baseline_prompt(baseline, call):
+    """기준 구현이 모델에 보내려던 contents (모델까지 가지 않으면 None)"""
+    captured = []
+
+    def capture(model_instance, **kwargs):
+        captured.append(kwargs["contents"])
+        raise _Captured()
+
+    baseline.generate_content_with_retry = capture
+    with contextlib.redirect_stdout(io.StringIO()):
+        call()
+    return captured[0] if captured else None
+
+
+def prompt_cases():
+    """(이름, 기준 호출, 현재 조립 호출) 목록"""
+    cases = []
+    for char_id, persona in CHARACTER_PERSONAS.items():
+        cases.append((
+            char_id,
+            lambda b, c=char_id, p=persona: b.get_ai_response(c, p, HISTORY, NICKNAME, settings=SETTINGS),
+            lambda c=char_id, p=persona: ai_service.build_single_chat_contents(c, p, HISTORY, NICKNAME, settings=SETTINGS),
+        ))
+    for a_id, persona_a in CHARACTER_PERSONAS.items():
+        for b_id, persona_b in CHARACTER_PERSONAS.items():
+            cases.append((
+                f"{a_id}+{b_id}",
+                lambda b, pa=persona_a, pb=persona_b, a=a_id, c=b_id: b.get_multi_ai_response_json(
+                    pa, pb, HISTORY, NICKNAME, settings=SETTINGS, char_a_id=a, char_b_id=c),
+                lambda pa=persona_a, pb=persona_b, a=a_id, c=b_id: ai_service._build_multi_chat_contents(
+                    pa, pb, HISTORY, NICKNAME, settings=SETTINGS, char_a_id=a, char_b_id=c),
+            ))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=20, help="시간 측정 시 전체 프롬프트를 조립하는 횟수")
+    args = parser.parse_args()
+
+    ai_service.datetime = FrozenDatetime
+    baseline = load_baseline()
+    compile_prompt_skeletons()
+    cases = prompt_cases()
+
+    compared, skipped, mismatched = 0, 0, []
+    for name, baseline_call, current_call in cases:
+        expected = baseline_prompt(baseline, lambda: baseline_call(baseline))
+        if expected is None:
+            # 기준 구현도 모델을 부르지 않는 경우 (대사 데이터가 없는 캐릭터)
+            skipped += 1
+            continue
+        compared += 1
+        if current_call() != expected:
+            mismatched.append(name)
+
+    print(f"프롬프트 비교: {compared}개 일치 확인, {skipped}개 건너뜀 (기준 구현이 모델을 부르지 않음)")
+    assert not mismatched, f"기준 커밋과 다른 프롬프트: {mismatched}"
+
+    def run_baseline():
+        for _, baseline_call, _ in cases:
+            baseline_prompt(baseline, lambda: baseline_call(baseline))
+
+    def run_current():
+        for _, _, current_call in cases:
+            current_call()
+
+    rows = []
+    for label, func in (("기준 커밋 (요청마다 조립)", run_baseline), ("프롬프트 템플릿 (현재)", run_current)):
+        seconds, _ = best_of(lambda: [func() for _ in range(args.rounds)])
+        rows.append((label, seconds / (args.rounds * len(cases)) * 1e6))
+    report(f"프롬프트 {len(cases)}개 조립, 프롬프트당 평균 (최소 3회 중 최단)", rows, unit="us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+SQLite 동시 읽기/쓰기 부하 테스트
+앱(main.app)을 httpx ASGI 전송으로 띄우고, LLM은 정해진 시간만큼 기다렸다가 답하는 가짜 모델로 바꿔서
+- 채팅 클라이언트: POST /chat (전체 대화 업로드 -> 자동 저장 쓰기 -> LLM 대기)
+- 통계 클라이언트: GET /chat/stats/weekly (집계 테이블 읽기)
+를 동시에 돌리며 통계 응답 시간, 채팅 처리량, 연결 풀에서 동시에 꺼낸 연결 수(최대), 오류 수를 잽니다.
+
+DB 설정은 모듈 로드 시 정해지므로 모드마다 하위 프로세스로 실행합니다.
+- wal: SQLITE_PERFORMANCE_MODE=1 (WAL, PRAGMA, 크기를 정한 풀)
+- journal: SQLITE_PERFORMANCE_MODE=0 (기본 저널 모드, SQLAlchemy 기본 풀)
+
+    python benchmarks/load_sqlite_pool.py [--chat-clients 64] [--stats-clients 8] [--seconds 20] [--llm-latency 0.5]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+from _common import BACKEND_DIR
+
+MODES = {"wal": "1", "journal": "0"}
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_mode(args):
+    """하위 프로세스: 현재 환경변수의 DB 설정으로 부하를 걸고 결과를 JSON 한 줄로 출력"""
+    import asyncio
+    import threading
+    from types import SimpleNamespace
+
+    import httpx
+    from sqlalchemy import event
+
+    import ai_service
+    from auth import create_access_token, get_password_hash
+    from database import engine, SessionLocal, User
+    from migrations import run_migrations
+    from main import app
+
+    run_migrations()
+
+    class FakeModel:
+        """llm_latency초 뒤에 답하는 가짜 모델 (실제 LLM 호출처럼 이벤트 루프를 막지 않음)"""
+
+        async def generate_content_async(self, *a, **kw):
+            await asyncio.sleep(args.llm_latency)
+            return SimpleNamespace(text="그랬구나. 오늘 얘기 더 해줘.", candidates=None)
+
+    ai_service.model = FakeModel()
+
+    # 풀에서 동시에 꺼낸 연결 수 추적
+    pool_state = {"current": 0, "peak": 0}
+    pool_lock = threading.Lock()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(*_):
+        with pool_lock:
+            pool_state["current"] += 1
+            pool_state["peak"] = max(pool_state["peak"], pool_state["current"])
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(*_):
+        with pool_lock:
+            pool_state["current"] -= 1
+
+    db = SessionLocal()
+    tokens = []
+    hashed = get_password_hash("load-test")
+    for i in range(args.chat_clients + args.stats_clients):
+        username = f"load_{i}"
+        db.add(User(username=username, email=f"{username}@example.com", hashed_password=hashed, nickname=f"사용자{i}"))
+        tokens.append(create_access_token({"sub": username}))
+    db.commit()
+    db.close()
+
+    chat_latencies, stats_latencies, errors = [], [], {}
+
+    def record_error(kind):
+        errors[kind] = errors.get(kind, 0) + 1
+
+    async def chat_client(client, token, deadline):
+        headers = {"Authorization": f"Bearer {token}"}
+        history, chat_id = [], None
+        while time.monotonic() < deadline:
+            history.append({"id": time.time() * 1000, "sender": "user", "text": "오늘 회사에서 좀 힘들었어", "characterId": None})
+            body = {"character_ids": ["kim_shin"], "user_nickname": "테스터", "chat_history": history[-20:], "current_chat_id": chat_id}
+            started = time.monotonic()
+            try:
+                response = await client.post("/chat", json=body, headers=headers)
+            except Exception as e:
+                record_error(type(e).__name__)
+                continue
+            if response.status_code != 200:
+                record_error(f"chat {response.status_code}")
+                continue
+            chat_latencies.append(time.monotonic() - started)
+            data = response.json()
+            chat_id = data.get("chat_id") or chat_id
+            for res in data["responses"]:
+                for text in res["texts"]:
+                    history.append({"id": time.time() * 1000, "sender": "ai", "text": text, "characterId": res["id"]})
+
+    async def stats_client(client, token, deadline):
+        headers = {"Authorization": f"Bearer {token}"}
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                response = await client.get("/chat/stats/weekly", headers=headers)
+            except Exception as e:
+                record_error(type(e).__name__)
+                continue
+            if response.status_code != 200:
+                record_error(f"stats {response.status_code}")
+                continue
+            stats_latencies.append(time.monotonic() - started)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120) as client:
+            deadline = time.monotonic() + args.seconds
+            await asyncio.gather(
+                *(chat_client(client, tokens[i], deadline) for i in range(args.chat_clients)),
+                *(stats_client(client, tokens[args.chat_clients + i], deadline) for i in range(args.stats_clients)),
+            )
+
+    started = time.monotonic()
+    asyncio.run(main())
+    elapsed = time.monotonic() - started
+
+    print(json.dumps({
+        "pool": f"{engine.pool.__class__.__name__} {engine.pool.status()}",
+        "chat_rps": len(chat_latencies) / elapsed,
+        "chat_p50": _percentile(chat_latencies, 0.5),
+        "chat_p95": _percentile(chat_latencies, 0.95),
+        "stats_count": len(stats_latencies),
+        "stats_p50": _percentile(stats_latencies, 0.5),
+        "stats_p95": _percentile(stats_latencies, 0.95),
+        "stats_max": max(stats_latencies, default=0.0),
+        "peak_connections": pool_state["peak"],
+        "errors": errors,
+    }, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chat-clients", type=int, default=64)
+    parser.add_argument("--stats-clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--modes", default="wal,journal")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args)
+        return
+
+    print(f"채팅 클라이언트 {args.chat_clients}, 통계 클라이언트 {args.stats_clients}, "
+          f"{args.seconds:.0f}초, LLM 지연 {args.llm_latency}s")
+    for mode in args.modes.split(","):
+        env = dict(os.environ, SQLITE_PERFORMANCE_MODE=MODES[mode], LLM_USER_RPM="100000", LLM_USER_BURST="1000",
+                   LLM_CHAT_RPM="1000000", LLM_CHAT_BURST="10000", LLM_KEY_RPM="1000000", LLM_KEY_BURST="10000")
+        env.pop("DATABASE_URL", None)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--chat-clients", str(args.chat_clients),
+             "--stats-clients", str(args.stats_clients), "--seconds", str(args.seconds), "--llm-latency", str(args.llm_latency)],
+            cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"[{mode}] 채팅 {result['chat_rps']:.1f} req/s (p50 {result['chat_p50']:.2f}s, p95 {result['chat_p95']:.2f}s) | "
+              f"통계 {result['stats_count']}회 p50 {result['stats_p50'] * 1000:.0f}ms p95 {result['stats_p95'] * 1000:.0f}ms "
+              f"max {result['stats_max'] * 1000:.0f}ms | 동시 연결 최대 {result['peak_connections']} | 오류 {result['errors'] or '없음'}")
+        print(f"       {result['pool']}")
+
+
+if __name__ == "__main__":
+    main()
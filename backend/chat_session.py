@@ -0,0 +1,190 @@
+"""
+대화 세션 상태 모듈
+세션 모드(클라이언트가 current_chat_id와 새 메시지만 보내는 방식)에서 쓰는
+대화별 AI 히스토리(토론 구간 제외, 최근 MAX_HISTORY_MESSAGES개)를 프로세스 내 LRU로 유지합니다.
+캐시에 없으면 저장소에서 최신 메시지부터 필요한 만큼만 읽어 복원합니다.
+"""
+
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from config import MAX_HISTORY_MESSAGES
+from database import ChatHistory, ChatMessage
+from chat_store import append_messages, ensure_message_rows, iter_messages_reverse, next_message_seq
+
+# 프로세스당 메모리에 유지할 대화 세션 수
+SESSION_CACHE_SIZE = int(os.environ.get("CHAT_SESSION_CACHE_SIZE", "1024"))
+# 메시지 추가 잠금 수 (대화 ID로 나눠 씀)
+APPEND_LOCK_STRIPES = 64
+
+# 토론 구간 표시 시스템 메시지
+DEBATE_START_MARKER = '토론이 시작되었습니다'
+DEBATE_END_MARKER = '토론이 종료되었습니다'
+
+
+def debate_marker(sender: Optional[str], text: Optional[str]) -> Optional[str]:
+    """토론 시작/종료 시스템 메시지면 'start'/'end', 아니면 None"""
+    if sender != 'system' or not text:
+        return None
+    if DEBATE_START_MARKER in text:
+        return 'start'
+    if DEBATE_END_MARKER in text:
+        return 'end'
+    return None
+
+
+def to_ai_turn(sender: Optional[str], text: Optional[str]) -> Optional[dict]:
+    """메시지를 AI 히스토리 항목으로 변환 (user/ai 이외는 None)"""
+    if sender == 'user':
+        return {"role": "user", "parts": [{"text": text}]}
+    if sender == 'ai':
+        return {"role": "model", "parts": [{"text": text}]}
+    return None
+
+
+class ChatSession:
+    """대화 하나의 서버 측 상태"""
+
+    def __init__(self, chat_id: int, history: List[dict], in_debate: bool, next_seq: int):
+        self.chat_id = chat_id
+        self.history = deque(history, maxlen=MAX_HISTORY_MESSAGES)
+        self.in_debate = in_debate
+        self.next_seq = next_seq
+
+    def apply(self, message: dict):
+        """메시지 하나를 반영 (토론 구간은 AI 히스토리에서 제외)"""
+        marker = debate_marker(message.get('sender'), message.get('text'))
+        if marker:
+            self.in_debate = marker == 'start'
+            return
+        if self.in_debate:
+            return
+        turn = to_ai_turn(message.get('sender'), message.get('text'))
+        if turn:
+            self.history.append(turn)
+
+    def history_for_ai(self) -> List[dict]:
+        return list(self.history)
+
+
+def _count_debate_markers(chat: ChatHistory, db: Session) -> Optional[int]:
+    """저장된 토론 표시 메시지 수 (메시지가 아직 행으로 옮겨지지 않은 대화는 None)"""
+    if next_message_seq(chat, db) == 0:
+        return None
+    return db.query(func.count(ChatMessage.id)).filter(
+        ChatMessage.chat_id == chat.id,
+        ChatMessage.sender == 'system',
+        or_(ChatMessage.text.contains(DEBATE_START_MARKER), ChatMessage.text.contains(DEBATE_END_MARKER))
+    ).scalar()
+
+
+def _load_session(chat: ChatHistory, db: Session) -> ChatSession:
+    """저장소에서 세션 복원
+
+    최신 메시지부터 거꾸로 읽으면서, 토론 표시 메시지를 만날 때마다 그 뒤 구간의 포함 여부를 결정합니다.
+    (시작 표시 뒤 구간은 토론이므로 버리고, 종료 표시 뒤 구간은 유지)
+    AI 히스토리가 MAX_HISTORY_MESSAGES개 모이면 더 읽지 않습니다. 아직 포함 여부가 정해지지 않은 구간은
+    그보다 오래된 토론 표시가 없을 때(토론 표시를 모두 지나왔거나 아예 없는 대화)만 포함이 확정되므로,
+    그 구간으로 개수가 차면 토론 표시 수를 한 번 세어 확인합니다.
+    """
+    kept = []      # 최신순
+    pending = []   # 아직 토론 구간인지 결정되지 않은 항목 (최신순)
+    in_debate = None
+    markers_seen = 0
+    markers_total = None
+    markers_counted = False
+
+    for message in iter_messages_reverse(chat, db):
+        marker = debate_marker(message.get('sender'), message.get('text'))
+        if marker:
+            markers_seen += 1
+            if in_debate is None:
+                in_debate = marker == 'start'
+            if marker == 'end':
+                kept.extend(pending)
+            pending = []
+            if len(kept) >= MAX_HISTORY_MESSAGES:
+                break
+            continue
+        turn = to_ai_turn(message.get('sender'), message.get('text'))
+        if turn:
+            pending.append(turn)
+            if len(kept) + len(pending) >= MAX_HISTORY_MESSAGES:
+                if not markers_counted:
+                    markers_total = _count_debate_markers(chat, db)
+                    markers_counted = True
+                if markers_seen == markers_total:
+                    break
+
+    # 첫 토론 표시 이전 구간은 토론이 아님 (토론 표시에서 멈춘 경우 pending은 비어 있음)
+    kept.extend(pending)
+
+    kept = kept[:MAX_HISTORY_MESSAGES]
+    kept.reverse()
+    return ChatSession(chat.id, kept, bool(in_debate), next_message_seq(chat, db))
+
+
+class ChatSessionStore:
+    """대화 세션 LRU 캐시"""
+
+    def __init__(self, maxsize: int = SESSION_CACHE_SIZE):
+        self._maxsize = maxsize
+        self._sessions: "OrderedDict[int, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._append_locks = [threading.Lock() for _ in range(APPEND_LOCK_STRIPES)]
+
+    def get(self, chat: ChatHistory, db: Session) -> ChatSession:
+        """대화 세션 조회 (다른 프로세스나 전체 업로드로 저장소가 바뀌었으면 다시 복원)"""
+        if ensure_message_rows(chat, db):
+            db.commit()
+        next_seq = next_message_seq(chat, db)
+        with self._lock:
+            session = self._sessions.get(chat.id)
+            if session is not None and session.next_seq == next_seq:
+                self._sessions.move_to_end(chat.id)
+                return session
+
+        session = _load_session(chat, db)
+        self._put(session)
+        return session
+
+    def append(self, session: ChatSession, chat: ChatHistory, messages: List[dict], db: Session) -> ChatSession:
+        """메시지를 저장소에 추가하고 반영된 세션 반환
+
+        같은 대화의 추가는 대화별 잠금 안에서 저장소의 다음 seq를 다시 읽어 위치를 정하므로,
+        동시에 들어온 요청(새 메시지와 스트리밍이 끝난 AI 응답 등)이 같은 seq를 쓰지 않습니다.
+        그 사이 세션이 모르는 메시지가 저장되었으면(다른 프로세스, 전체 업로드) 세션을 다시 복원합니다.
+        """
+        with self._append_locks[chat.id % APPEND_LOCK_STRIPES]:
+            start_seq = next_message_seq(chat, db)
+            append_messages(chat, messages, start_seq, db)
+            chat.updated_at = datetime.utcnow()
+            db.commit()
+            if start_seq != session.next_seq:
+                session = _load_session(chat, db)
+                self._put(session)
+                return session
+            for message in messages:
+                session.apply(message)
+            session.next_seq = start_seq + len(messages)
+        return session
+
+    def invalidate(self, chat_id: int):
+        with self._lock:
+            self._sessions.pop(chat_id, None)
+
+    def _put(self, session: ChatSession):
+        with self._lock:
+            self._sessions[session.chat_id] = session
+            self._sessions.move_to_end(session.chat_id)
+            while len(self._sessions) > self._maxsize:
+                self._sessions.popitem(last=False)
+
+
+chat_sessions = ChatSessionStore()
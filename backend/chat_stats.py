@@ -0,0 +1,169 @@
+"""
+채팅 통계 집계 모듈
+대화/메시지가 저장될 때마다 (사용자, 날짜) 및 (사용자, 날짜, 캐릭터) 단위 집계 테이블을 증분 갱신합니다.
+통계 화면은 대화 전체를 읽지 않고 집계 테이블의 날짜 범위만 조회합니다.
+날짜는 기존 통계와 같이 대화 생성 시각(UTC)의 날짜 기준입니다.
+"""
+
+import json
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import ChatHistory, ChatDailyStat, ChatCharacterDailyStat
+from emotion_scoring import sum_emotion_scores
+
+# 재집계 시 한 번에 처리할 대화 수
+REBUILD_BATCH_SIZE = 200
+
+
+def _chat_key(chat: ChatHistory) -> Tuple[int, date, int]:
+    """집계 키 (user_id, 날짜, 대사 저장 여부)"""
+    created_at = chat.created_at or datetime.utcnow()
+    return chat.user_id, created_at.date(), 1 if chat.is_manual_quote == 1 else 0
+
+
+def _character_ids(chat: ChatHistory) -> List[str]:
+    try:
+        char_ids = json.loads(chat.character_ids) if isinstance(chat.character_ids, str) else chat.character_ids
+    except (TypeError, ValueError):
+        return []
+    return char_ids if isinstance(char_ids, list) else []
+
+
+def emotion_totals(messages: List[dict]) -> Tuple[int, int]:
+    """사용자 메시지 감정 점수 (합계, 개수) - '💭' 시스템 메시지 제외"""
+    texts = []
+    for msg in messages:
+        if isinstance(msg, dict) and msg.get('sender') == 'user':
+            text = msg.get('text', '')
+            if text and not text.startswith('💭'):
+                texts.append(text)
+    return sum_emotion_scores(texts)
+
+
+def _upsert(db: Session, model, keys: dict, increments: dict):
+    """키에 해당하는 집계 행에 증분을 더함 (없으면 생성)"""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(model).values(**keys, **increments)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys.keys()),
+            set_={name: getattr(model, name) + stmt.excluded[name] for name in increments}
+        )
+        db.execute(stmt)
+        return
+
+    row = db.query(model).filter_by(**keys).with_for_update().first()
+    if row is None:
+        db.add(model(**keys, **increments))
+        db.flush()
+    else:
+        for name, value in increments.items():
+            setattr(row, name, (getattr(row, name) or 0) + value)
+
+
+def _apply(db: Session, chat: ChatHistory, chat_delta: int, message_delta: int, score_delta: int, scored_delta: int):
+    if not (chat_delta or message_delta or score_delta or scored_delta):
+        return
+    user_id, day, is_quote = _chat_key(chat)
+    keys = {"user_id": user_id, "day": day, "is_quote": is_quote}
+    _upsert(db, ChatDailyStat, keys, {
+        "chat_count": chat_delta,
+        "message_count": message_delta,
+        "emotion_score_sum": score_delta,
+        "emotion_message_count": scored_delta,
+    })
+    if chat_delta or message_delta:
+        for char_id in _character_ids(chat):
+            _upsert(db, ChatCharacterDailyStat, {**keys, "character_id": char_id}, {
+                "chat_count": chat_delta,
+                "message_count": message_delta,
+            })
+
+
+# ===========================================
+# 쓰기 시 증분 갱신 (commit은 호출한 쪽에서)
+# ===========================================
+
+def record_chat_created(chat: ChatHistory, db: Session):
+    """새 대화 생성 반영 (메시지는 record_messages_changed로 따로 반영)"""
+    _apply(db, chat, 1, 0, 0, 0)
+
+
+def record_chat_deleted(chat: ChatHistory, messages: List[dict], db: Session):
+    """대화 삭제 반영"""
+    score_sum, scored = emotion_totals(messages)
+    _apply(db, chat, -1, -len(messages), -score_sum, -scored)
+
+
+def record_messages_changed(chat: ChatHistory, added: List[dict], removed: Optional[List[dict]], db: Session):
+    """메시지 추가/삭제/수정 반영"""
+    removed = removed or []
+    added_sum, added_scored = emotion_totals(added)
+    removed_sum, removed_scored = emotion_totals(removed)
+    _apply(db, chat, 0, len(added) - len(removed), added_sum - removed_sum, added_scored - removed_scored)
+
+
+# ===========================================
+# 재집계
+# ===========================================
+
+def rebuild_chat_stats(db: Session, user_id: Optional[int] = None, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """기존 대화로 집계 테이블을 처음부터 다시 만들고, 집계한 대화 수 반환"""
+    from chat_store import load_messages_bulk
+
+    daily: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0, 0, 0])
+    characters: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0])
+
+    total = 0
+    last_id = 0
+    while True:
+        query = db.query(ChatHistory).filter(ChatHistory.id > last_id)
+        if user_id is not None:
+            query = query.filter(ChatHistory.user_id == user_id)
+        chats = query.order_by(ChatHistory.id).limit(batch_size).all()
+        if not chats:
+            break
+
+        messages_by_chat = load_messages_bulk(chats, db)
+        for chat in chats:
+            messages = [m for m in messages_by_chat.get(chat.id, []) if isinstance(m, dict)]
+            key = _chat_key(chat)
+            score_sum, scored = emotion_totals(messages)
+            totals = daily[key]
+            totals[0] += 1
+            totals[1] += len(messages)
+            totals[2] += score_sum
+            totals[3] += scored
+            for char_id in _character_ids(chat):
+                char_totals = characters[key + (char_id,)]
+                char_totals[0] += 1
+                char_totals[1] += len(messages)
+        total += len(chats)
+        last_id = chats[-1].id
+        db.expunge_all()
+
+    for model in (ChatDailyStat, ChatCharacterDailyStat):
+        query = db.query(model)
+        if user_id is not None:
+            query = query.filter(model.user_id == user_id)
+        query.delete(synchronize_session=False)
+
+    db.bulk_insert_mappings(ChatDailyStat, [
+        {"user_id": k[0], "day": k[1], "is_quote": k[2], "chat_count": v[0], "message_count": v[1],
+         "emotion_score_sum": v[2], "emotion_message_count": v[3]}
+        for k, v in daily.items()
+    ])
+    db.bulk_insert_mappings(ChatCharacterDailyStat, [
+        {"user_id": k[0], "day": k[1], "is_quote": k[2], "character_id": k[3], "chat_count": v[0], "message_count": v[1]}
+        for k, v in characters.items()
+    ])
+    db.commit()
+    return total
@@ -0,0 +1,302 @@
+"""
+대화 메시지 저장소 모듈
+대화 메시지를 chat_messages 테이블에 한 메시지당 한 행으로 저장하고 다시 조립합니다.
+대화가 이어질 때는 새로 추가된 메시지만 INSERT 하므로 매 턴 전체 JSON을 다시 쓰지 않습니다.
+"""
+
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import ChatHistory, ChatMessage
+from chat_stats import record_messages_changed
+from archetype_store import archetype_adjustments
+
+# 메시지 dict에서 전용 컬럼으로 저장하는 필드 (나머지는 extra JSON으로 보관)
+_COLUMN_FIELDS = ("id", "sender", "text", "characterId")
+
+# 백필 시 한 번에 처리할 대화 수
+BACKFILL_BATCH_SIZE = 200
+
+
+def _to_row(chat_id: int, seq: int, message: dict) -> dict:
+    """메시지 dict -> chat_messages 행 값"""
+    message_id = message.get("id")
+    try:
+        message_id = float(message_id) if message_id is not None else None
+    except (TypeError, ValueError):
+        message_id = None
+    extra = {k: v for k, v in message.items() if k not in _COLUMN_FIELDS}
+    return {
+        "chat_id": chat_id,
+        "seq": seq,
+        "message_id": message_id,
+        "sender": message.get("sender") or "",
+        "text": message.get("text") or "",
+        "character_id": message.get("characterId"),
+        "extra": json.dumps(extra, ensure_ascii=False, default=str) if extra else None,
+    }
+
+
+def _to_message(row: ChatMessage) -> dict:
+    """chat_messages 행 -> 프론트엔드 메시지 dict (기존 JSON 형식과 동일)"""
+    message = {
+        "id": row.message_id,
+        "sender": row.sender,
+        "text": row.text,
+        "characterId": row.character_id,
+    }
+    if row.extra:
+        try:
+            message.update(json.loads(row.extra))
+        except (TypeError, ValueError):
+            pass
+    return message
+
+
+def _load_blob(chat: ChatHistory) -> List[dict]:
+    """아직 행으로 옮겨지지 않은 대화의 messages JSON 파싱"""
+    try:
+        messages = json.loads(chat.messages) if isinstance(chat.messages, str) else chat.messages
+    except (TypeError, ValueError):
+        return []
+    return messages if isinstance(messages, list) else []
+
+
+def _insert_rows(chat_id: int, messages: List[dict], start_seq: int, db: Session) -> List[dict]:
+    """행 INSERT 후 실제로 저장한 메시지 목록 반환"""
+    messages = [m for m in messages if isinstance(m, dict)]
+    rows = [_to_row(chat_id, start_seq + i, m) for i, m in enumerate(messages)]
+    if rows:
+        db.bulk_insert_mappings(ChatMessage, rows)
+    return messages
+
+
+# ===========================================
+# 쓰기
+# ===========================================
+
+def _record_changed(chat: ChatHistory, added: List[dict], removed: Optional[List[dict]], db: Session):
+    """메시지 변경을 통계에 반영하고 사용자별 성향 보정 캐시를 비움"""
+    record_messages_changed(chat, added, removed, db)
+    archetype_adjustments.invalidate(chat.user_id)
+
+
+def replace_messages(chat: ChatHistory, messages: List[dict], db: Session):
+    """대화의 메시지 전체 교체 (commit은 호출한 쪽에서)"""
+    if chat.id is None:
+        db.flush()
+    removed = load_messages(chat, db)
+    db.query(ChatMessage).filter(ChatMessage.chat_id == chat.id).delete(synchronize_session=False)
+    added = _insert_rows(chat.id, messages, 0, db)
+    chat.messages = "[]"
+    _record_changed(chat, added, removed, db)
+
+
+def sync_messages(chat: ChatHistory, messages: List[dict], db: Session) -> int:
+    """클라이언트가 보낸 전체 대화와 저장된 행을 맞춤 (commit은 호출한 쪽에서)
+
+    저장된 마지막 메시지가 클라이언트 대화의 같은 위치에 그대로 있으면 그 뒤의 메시지만 INSERT 하고,
+    중간 메시지가 수정/삭제된 경우에만 전체를 다시 씁니다. INSERT 한 메시지 수를 반환합니다.
+    """
+    last = db.query(ChatMessage.seq, ChatMessage.message_id).filter(
+        ChatMessage.chat_id == chat.id
+    ).order_by(ChatMessage.seq.desc()).first()
+
+    if last is None:
+        # 행이 없는 대화 (백필 전 대화 포함)
+        replace_messages(chat, messages, db)
+        return len(messages)
+
+    stored_count = last.seq + 1
+    if len(messages) >= stored_count:
+        anchor = _to_row(chat.id, last.seq, messages[last.seq])
+        if anchor["message_id"] == last.message_id:
+            added = _insert_rows(chat.id, messages[stored_count:], stored_count, db)
+            _record_changed(chat, added, None, db)
+            return len(added)
+
+    replace_messages(chat, messages, db)
+    return len(messages)
+
+
+def append_messages(chat: ChatHistory, messages: List[dict], start_seq: int, db: Session):
+    """start_seq 위치부터 메시지 추가 (commit은 호출한 쪽에서)"""
+    added = _insert_rows(chat.id, messages, start_seq, db)
+    _record_changed(chat, added, None, db)
+
+
+def ensure_message_rows(chat: ChatHistory, db: Session) -> bool:
+    """아직 행으로 옮겨지지 않은 대화의 JSON을 행으로 옮김 (commit은 호출한 쪽에서)"""
+    if chat.messages and chat.messages != "[]" and next_message_seq(chat, db) == 0:
+        replace_messages(chat, _load_blob(chat), db)
+        return True
+    return False
+
+
+def update_message_text(chat: ChatHistory, seq: int, text: str, db: Session) -> bool:
+    """특정 위치 메시지의 텍스트 수정 (commit은 호출한 쪽에서)"""
+    row = db.query(ChatMessage).filter(
+        ChatMessage.chat_id == chat.id,
+        ChatMessage.seq == seq
+    ).first()
+    if row is not None:
+        before = _to_message(row)
+        row.text = text
+        _record_changed(chat, [_to_message(row)], [before], db)
+        return True
+
+    # 아직 행으로 옮겨지지 않은 대화
+    messages = _load_blob(chat)
+    if seq >= len(messages) or not isinstance(messages[seq], dict):
+        return False
+    messages[seq]["text"] = text
+    replace_messages(chat, messages, db)
+    return True
+
+
+# ===========================================
+# 읽기
+# ===========================================
+
+def load_messages(chat: ChatHistory, db: Session) -> List[dict]:
+    """대화의 메시지 목록 조립 (행이 없으면 기존 JSON 사용)"""
+    rows = db.query(ChatMessage).filter(
+        ChatMessage.chat_id == chat.id
+    ).order_by(ChatMessage.seq).all()
+    if rows:
+        return [_to_message(row) for row in rows]
+    return _load_blob(chat)
+
+
+def next_message_seq(chat: ChatHistory, db: Session) -> int:
+    """다음 메시지가 들어갈 seq (= 저장된 메시지 수)"""
+    last_seq = db.query(func.max(ChatMessage.seq)).filter(ChatMessage.chat_id == chat.id).scalar()
+    return 0 if last_seq is None else last_seq + 1
+
+
+def iter_messages_reverse(chat: ChatHistory, db: Session, batch_size: int = 100) -> Iterator[dict]:
+    """최신 메시지부터 거꾸로 순회 (필요한 만큼만 배치 단위로 조회)"""
+    before_seq = None
+    found = False
+    while True:
+        query = db.query(ChatMessage).filter(ChatMessage.chat_id == chat.id)
+        if before_seq is not None:
+            query = query.filter(ChatMessage.seq < before_seq)
+        rows = query.order_by(ChatMessage.seq.desc()).limit(batch_size).all()
+        if not rows:
+            break
+        found = True
+        for row in rows:
+            yield _to_message(row)
+        before_seq = rows[-1].seq
+
+    if not found:
+        yield from reversed(_load_blob(chat))
+
+
+def load_messages_bulk(chats: Iterable[ChatHistory], db: Session) -> Dict[int, List[dict]]:
+    """여러 대화의 메시지를 한 번의 쿼리로 조립 ({chat_id: messages})"""
+    chats = list(chats)
+    if not chats:
+        return {}
+
+    result: Dict[int, List[dict]] = {chat.id: [] for chat in chats}
+    rows = db.query(ChatMessage).filter(
+        ChatMessage.chat_id.in_(list(result.keys()))
+    ).order_by(ChatMessage.chat_id, ChatMessage.seq).all()
+    for row in rows:
+        result[row.chat_id].append(_to_message(row))
+
+    for chat in chats:
+        if not result[chat.id]:
+            result[chat.id] = _load_blob(chat)
+    return result
+
+
+def count_messages_bulk(chats: Iterable[ChatHistory], db: Session) -> Dict[int, int]:
+    """여러 대화의 메시지 수 ({chat_id: count})"""
+    chats = list(chats)
+    if not chats:
+        return {}
+
+    counts = dict(
+        db.query(ChatMessage.chat_id, func.count(ChatMessage.id)).filter(
+            ChatMessage.chat_id.in_([chat.id for chat in chats])
+        ).group_by(ChatMessage.chat_id).all()
+    )
+    result = {}
+    for chat in chats:
+        result[chat.id] = counts.get(chat.id) or len(_load_blob(chat))
+    return result
+
+
+def summarize_messages_bulk(chat_ids: Iterable[int], db: Session, preview_length: int = 80) -> Dict[int, dict]:
+    """여러 대화의 메시지 수와 마지막 메시지 미리보기 ({chat_id: {"message_count", "last_message"}})
+
+    chat_messages 행만 조회하므로 chat_histories.messages 컬럼은 읽지 않습니다.
+    """
+    chat_ids = list(chat_ids)
+    if not chat_ids:
+        return {}
+
+    stats = db.query(
+        ChatMessage.chat_id,
+        func.count(ChatMessage.id).label("message_count"),
+        func.max(ChatMessage.seq).label("last_seq")
+    ).filter(
+        ChatMessage.chat_id.in_(chat_ids)
+    ).group_by(ChatMessage.chat_id).subquery()
+    rows = db.query(
+        stats.c.chat_id, stats.c.message_count, ChatMessage.sender, ChatMessage.text, ChatMessage.character_id
+    ).join(
+        ChatMessage, (ChatMessage.chat_id == stats.c.chat_id) & (ChatMessage.seq == stats.c.last_seq)
+    ).all()
+
+    result = {chat_id: {"message_count": 0, "last_message": None} for chat_id in chat_ids}
+    for chat_id, count, sender, text, character_id in rows:
+        text = text or ""
+        result[chat_id] = {
+            "message_count": count,
+            "last_message": {
+                "sender": sender,
+                "characterId": character_id,
+                "text": text[:preview_length] + ("..." if len(text) > preview_length else ""),
+            },
+        }
+    return result
+
+
+# ===========================================
+# 백필
+# ===========================================
+
+def backfill_chat_messages(db: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """messages JSON만 있는 기존 대화를 chat_messages 행으로 옮기고, 옮긴 대화 수 반환
+
+    옮긴 대화의 messages 컬럼은 "[]"로 비워 다음 실행 때 다시 처리하지 않습니다.
+    """
+    migrated = 0
+    while True:
+        chats = db.query(ChatHistory).filter(
+            ChatHistory.messages != "[]",
+            ~ChatHistory.message_rows.any()
+        ).order_by(ChatHistory.id).limit(batch_size).all()
+        if not chats:
+            break
+
+        for chat in chats:
+            _insert_rows(chat.id, _load_blob(chat), 0, db)
+        # updated_at을 그대로 두어 목록 정렬 순서가 바뀌지 않게 함
+        db.query(ChatHistory).filter(
+            ChatHistory.id.in_([chat.id for chat in chats])
+        ).update(
+            {ChatHistory.messages: "[]", ChatHistory.updated_at: ChatHistory.updated_at},
+            synchronize_session=False
+        )
+        db.commit()
+        db.expire_all()
+        migrated += len(chats)
+    return migrated
@@ -1,6 +1,6 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import create_engine, event, Column, Integer, String, Text, DateTime, Date, ForeignKey, Boolean, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, deferred, Session
 from datetime import datetime
 import os
 
@@ -11,8 +11,35 @@ SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./drama_chat
 connect_args = {}
 engine_kwargs = {}
 
+# SQLite 성능 설정 (SQLITE_PERFORMANCE_MODE=0 이면 기본 저널 모드 그대로 사용)
+SQLITE_PERFORMANCE_MODE = os.environ.get("SQLITE_PERFORMANCE_MODE", "1") != "0"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",          # 쓰기 중에도 읽기가 막히지 않음
+    "synchronous": "NORMAL",        # WAL에서는 커밋마다 fsync하지 않아도 안전
+    "mmap_size": 256 * 1024 * 1024,  # 256MB 메모리 맵 읽기
+    "cache_size": -64 * 1024,       # 페이지 캐시 64MB (음수: KB 단위)
+    "busy_timeout": 5000,           # 잠금 대기 (ms) - 바로 'database is locked' 오류를 내지 않음
+    "temp_store": "MEMORY",
+}
+# 연결 풀 크기
+# 연결을 쥐는 것은 DB 코드를 실행 중인 스레드뿐입니다 (async 엔드포인트와 예약 작업은 LLM 응답을 기다리기 전에
+# release_connection으로 연결을 돌려줌).
+# - 동기 엔드포인트/의존성: Starlette(anyio) 스레드풀
+# - async 코드의 asyncio.to_thread: 이벤트 루프 기본 실행기 (min(32, CPU 수 + 4))
+# 넘침 연결은 이 밖의 백그라운드 스레드(기억 참조 시각 기록, 아키타입 준비 등)용입니다.
+SYNC_THREADPOOL_SIZE = 40  # anyio 기본값
+SQLITE_POOL_SIZE = int(os.environ.get(
+    "SQLITE_POOL_SIZE", str(SYNC_THREADPOOL_SIZE + min(32, (os.cpu_count() or 1) + 4))
+))
+SQLITE_MAX_OVERFLOW = int(os.environ.get("SQLITE_MAX_OVERFLOW", "8"))
+
 if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
+    if SQLITE_PERFORMANCE_MODE and ":memory:" not in SQLALCHEMY_DATABASE_URL:
+        engine_kwargs = {
+            "pool_size": SQLITE_POOL_SIZE,
+            "max_overflow": SQLITE_MAX_OVERFLOW,
+        }
 elif SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
     # PostgreSQL 연결 풀 설정
     engine_kwargs = {
@@ -29,6 +56,18 @@ engine = create_engine(
     connect_args=connect_args,
     **engine_kwargs
 )
+
+if SQLALCHEMY_DATABASE_URL.startswith("sqlite") and SQLITE_PERFORMANCE_MODE:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """새 SQLite 연결마다 성능 PRAGMA 적용 (journal_mode=WAL은 DB 파일에 유지됨)"""
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in SQLITE_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -41,11 +80,20 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     nickname = Column(String, default="사용자")
-    profile_pic = Column(Text, default="")
+    # 이전 버전의 프로필 사진 (base64) - user_avatars로 옮겨졌으며, 인증 조회 시 읽지 않도록 지연 로딩
+    profile_pic = deferred(Column(Text, default=""))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     chat_histories = relationship("ChatHistory", back_populates="owner", cascade="all, delete-orphan")
 
+class UserAvatar(Base):
+    __tablename__ = "user_avatars"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    data = Column(Text, nullable=False)  # 프로필 사진 (이미지 base64 data URL)
+    etag = Column(String, nullable=False)  # 내용 해시 (변경 감지 / HTTP 캐시 검증)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class ChatHistory(Base):
     __tablename__ = "chat_histories"
     
@@ -61,6 +109,64 @@ class ChatHistory(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     owner = relationship("User", back_populates="chat_histories")
+    message_rows = relationship("ChatMessage", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # 대사 목록 / 대사 제외 히스토리 목록 (updated_at 최신순)
+        Index("ix_chat_histories_user_quote_updated", "user_id", "is_manual_quote", "updated_at"),
+        # 직접 저장한 대화 목록 / 최근 기분 분석 (updated_at 최신순)
+        Index("ix_chat_histories_user_manual_updated", "user_id", "is_manual", "updated_at"),
+        # 최근 대화 (created_at 최신순)
+        Index("ix_chat_histories_user_created", "user_id", "created_at"),
+    )
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(Integer, ForeignKey("chat_histories.id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)  # 대화 내 순서 (0부터)
+    message_id = Column(Float, nullable=True)  # 프론트엔드 메시지 ID
+    sender = Column(String, nullable=False)  # 'user', 'ai', 'system'
+    text = Column(Text, nullable=False, default="")
+    character_id = Column(String, nullable=True)
+    extra = Column(Text, nullable=True)  # 그 외 메시지 필드 (JSON string)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_chat_messages_chat_id_seq", "chat_id", "seq", unique=True),
+    )
+
+class ChatDailyStat(Base):
+    __tablename__ = "chat_daily_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)  # 대화 생성일 (UTC)
+    is_quote = Column(Integer, nullable=False, default=0)  # 1: 대사 저장
+    chat_count = Column(Integer, nullable=False, default=0)
+    message_count = Column(Integer, nullable=False, default=0)
+    emotion_score_sum = Column(Integer, nullable=False, default=0)  # 사용자 메시지 감정 점수 합
+    emotion_message_count = Column(Integer, nullable=False, default=0)  # 감정 점수를 계산한 사용자 메시지 수
+    
+    __table_args__ = (
+        Index("ix_chat_daily_stats_user_day", "user_id", "day", "is_quote", unique=True),
+    )
+
+class ChatCharacterDailyStat(Base):
+    __tablename__ = "chat_character_daily_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)  # 대화 생성일 (UTC)
+    is_quote = Column(Integer, nullable=False, default=0)
+    character_id = Column(String, nullable=False)
+    chat_count = Column(Integer, nullable=False, default=0)
+    message_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index("ix_chat_character_daily_stats_user_day", "user_id", "day", "is_quote", "character_id", unique=True),
+    )
 
 class CharacterMemory(Base):
     __tablename__ = "character_memories"
@@ -76,6 +182,11 @@ class CharacterMemory(Base):
     last_referenced = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User")
+    
+    __table_args__ = (
+        # (사용자, 캐릭터)별 기억 조회 (중요도 순)
+        Index("ix_character_memories_user_character", "user_id", "character_id", "importance"),
+    )
 
 class EmotionDiary(Base):
     __tablename__ = "emotion_diaries"
@@ -91,6 +202,11 @@ class EmotionDiary(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User")
+    
+    __table_args__ = (
+        # 일기 목록 (diary_date 최신순)
+        Index("ix_emotion_diaries_user_date", "user_id", "diary_date", "id"),
+    )
 
 class CharacterArchetype(Base):
     __tablename__ = "character_archetypes"
@@ -127,201 +243,44 @@ class ExchangeDiary(Base):
     
     user = relationship("User")
     diary = relationship("EmotionDiary")
-
-# 데이터베이스 테이블 생성
-Base.metadata.create_all(bind=engine)
-
-# is_manual 컬럼 마이그레이션
-def migrate_database():
-    """기존 데이터베이스에 is_manual 컬럼이 없으면 추가"""
-    from sqlalchemy import inspect, text
     
-    try:
-        inspector = inspect(engine)
-        # 테이블이 존재하는지 확인
-        if 'chat_histories' not in inspector.get_table_names():
-            return
-        
-        columns = [col['name'] for col in inspector.get_columns('chat_histories')]
-        
-        if 'is_manual' not in columns:
-            with engine.connect() as conn:
-                try:
-                    conn.execute(text("ALTER TABLE chat_histories ADD COLUMN is_manual INTEGER DEFAULT 0"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: is_manual 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-    except Exception as e:
-        print(f"마이그레이션 확인 중 오류 (무시 가능): {e}")
+    __table_args__ = (
+        # 교환일기 목록 / 오늘 작성한 교환일기 (created_at 순)
+        Index("ix_exchange_diaries_user_created", "user_id", "created_at"),
+        # 가장 최근 답장 (reply_created_at 최신순)
+        Index("ix_exchange_diaries_user_reply", "user_id", "reply_created_at"),
+    )
 
-# emotion_diaries 테이블 weather 컬럼 마이그레이션
-def migrate_emotion_diaries():
-    """기존 데이터베이스에 emotion_diaries.weather 컬럼이 없으면 추가"""
-    from sqlalchemy import inspect, text
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
     
-    try:
-        inspector = inspect(engine)
-        # 테이블이 존재하는지 확인
-        if 'emotion_diaries' not in inspector.get_table_names():
-            return
-        
-        columns = [col['name'] for col in inspector.get_columns('emotion_diaries')]
-        
-        if 'weather' not in columns:
-            with engine.connect() as conn:
-                try:
-                    conn.execute(text("ALTER TABLE emotion_diaries ADD COLUMN weather VARCHAR DEFAULT '맑음'"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: emotion_diaries.weather 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-    except Exception as e:
-        print(f"마이그레이션 확인 중 오류 (무시 가능): {e}")
+    version = Column(Integer, primary_key=True)  # 적용된 마이그레이션 버전
+    description = Column(String, nullable=True)
+    applied_at = Column(DateTime, default=datetime.utcnow)
 
-# chat_histories 테이블 컬럼 마이그레이션
-def migrate_chat_histories_quote():
-    """기존 데이터베이스에 is_manual_quote, quote_message_id 컬럼이 없으면 추가"""
-    from sqlalchemy import inspect, text
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
     
-    try:
-        inspector = inspect(engine)
-        if 'chat_histories' not in inspector.get_table_names():
-            return
-        
-        columns = [col['name'] for col in inspector.get_columns('chat_histories')]
-        
-        with engine.connect() as conn:
-            if 'is_manual_quote' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE chat_histories ADD COLUMN is_manual_quote INTEGER DEFAULT 0"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: is_manual_quote 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-            
-            if 'quote_message_id' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE chat_histories ADD COLUMN quote_message_id VARCHAR"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: quote_message_id 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-    except Exception as e:
-        print(f"마이그레이션 확인 중 오류 (무시 가능): {e}")
-
-# exchange_diaries 테이블 마이그레이션
-def migrate_exchange_diaries():
-    """기존 데이터베이스에 exchange_diaries 테이블이 없으면 생성하고 필요한 컬럼 추가"""
-    from sqlalchemy import inspect, text
-    
-    try:
-        inspector = inspect(engine)
-        if 'exchange_diaries' not in inspector.get_table_names():
-            # 테이블이 없으면 Base.metadata.create_all에서 생성됨
-            return
-        
-        columns = [col['name'] for col in inspector.get_columns('exchange_diaries')]
-        
-        with engine.connect() as conn:
-            if 'scheduled_time' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE exchange_diaries ADD COLUMN scheduled_time TIMESTAMP"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: exchange_diaries.scheduled_time 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-            
-            if 'preview_message' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE exchange_diaries ADD COLUMN preview_message TEXT"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: exchange_diaries.preview_message 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-            
-            if 'reply_created_at' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE exchange_diaries ADD COLUMN reply_created_at TIMESTAMP"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: exchange_diaries.reply_created_at 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-            
-            if 'topic_used' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE exchange_diaries ADD COLUMN topic_used INTEGER DEFAULT 0"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: exchange_diaries.topic_used 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-            
-            # 기존 답장 데이터에 대한 preview_message와 reply_created_at 업데이트
-            try:
-                # PostgreSQL과 SQLite 모두 호환되는 쿼리
-                # preview_message가 없는 답장들에 대해 첫 50자로 설정
-                conn.execute(text("""
-                    UPDATE exchange_diaries 
-                    SET preview_message = CASE 
-                        WHEN length(reply_content) > 50 THEN substring(reply_content, 1, 50) || '...'
-                        ELSE reply_content
-                    END
-                    WHERE reply_received = TRUE AND (preview_message IS NULL OR preview_message = '')
-                """))
-                
-                # reply_created_at가 없는 답장들에 대해 updated_at 또는 created_at으로 설정
-                conn.execute(text("""
-                    UPDATE exchange_diaries 
-                    SET reply_created_at = COALESCE(updated_at, created_at)
-                    WHERE reply_received = TRUE AND reply_created_at IS NULL
-                """))
-                
-                conn.commit()
-                print("기존 교환일기 답장 데이터 마이그레이션 완료")
-            except Exception as e:
-                print(f"기존 데이터 마이그레이션 오류 (무시 가능): {e}")
-                
-    except Exception as e:
-        print(f"마이그레이션 확인 중 오류 (무시 가능): {e}")
-
-# character_archetypes 테이블 컬럼 마이그레이션
-def migrate_character_archetypes():
-    """기존 데이터베이스에 character_archetypes.order_chaos, good_evil 컬럼이 없으면 추가"""
-    from sqlalchemy import inspect, text
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # 작업 종류 (job_queue 핸들러 이름)
+    job_key = Column(String, unique=True, nullable=True)  # 같은 대상의 작업을 하나로 유지하는 키 (예: reply_12)
+    payload = Column(Text, nullable=False, default="{}")  # 핸들러 인자 (JSON string)
+    priority = Column(Integer, default=0)  # 작을수록 먼저 실행
+    run_at = Column(DateTime, nullable=False)  # 실행 예정 시각 (UTC)
+    status = Column(String, nullable=False, default="pending")  # pending / running / done / failed
+    attempts = Column(Integer, default=0)  # 실행 시도 횟수
+    lease_token = Column(String, nullable=True)  # 작업을 가져간 디스패처의 임대 토큰
+    leased_until = Column(DateTime, nullable=True)  # 임대 만료 시각 (지나면 다른 디스패처가 다시 가져감)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    try:
-        inspector = inspect(engine)
-        # 테이블이 존재하는지 확인
-        if 'character_archetypes' not in inspector.get_table_names():
-            return
-        
-        columns = [col['name'] for col in inspector.get_columns('character_archetypes')]
-        
-        with engine.connect() as conn:
-            if 'order_chaos' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE character_archetypes ADD COLUMN order_chaos VARCHAR"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: character_archetypes.order_chaos 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-            
-            if 'good_evil' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE character_archetypes ADD COLUMN good_evil VARCHAR"))
-                    conn.commit()
-                    print("데이터베이스 마이그레이션 완료: character_archetypes.good_evil 컬럼 추가됨")
-                except Exception as e:
-                    print(f"마이그레이션 오류 (이미 존재할 수 있음): {e}")
-    except Exception as e:
-        print(f"마이그레이션 확인 중 오류 (무시 가능): {e}")
+    __table_args__ = (
+        # 실행할 작업 조회 (status, run_at 순)
+        Index("ix_scheduled_jobs_status_run_at", "status", "run_at"),
+    )
 
-# 마이그레이션 실행
-migrate_database()
-migrate_emotion_diaries()
-migrate_chat_histories_quote()
-migrate_exchange_diaries()
-migrate_character_archetypes()
+# 테이블 생성/마이그레이션은 migrations.py (python migrations.py 또는 서버 시작 시 run_migrations)
 
 def get_db():
     db = SessionLocal()
@@ -330,3 +289,19 @@ def get_db():
     finally:
         db.close()
 
+
+def release_connection(db: Session):
+    """읽기만 한 세션의 트랜잭션을 끝내 연결을 풀에 돌려줌 (로드한 객체는 만료시키지 않음)
+
+    async 엔드포인트/작업이 LLM 응답을 기다리는 동안 연결을 쥐고 있지 않도록, 기다리기 전에 스레드에서 호출합니다.
+    다음 조회 때 새 트랜잭션으로 연결을 다시 꺼냅니다. 저장하지 않은 변경이 있으면 아무것도 하지 않습니다.
+    """
+    if db.new or db.dirty or db.deleted or not db.in_transaction():
+        return
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
@@ -3,21 +3,28 @@
 감정일기, 교환일기 기능을 담당합니다.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import func, or_
+from typing import Optional, List, Tuple
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone, timedelta
+import os
 import json
 import pytz
+import asyncio
 import random
-import atexit
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.date import DateTrigger
 
-from database import get_db, User, EmotionDiary, ExchangeDiary
+from database import get_db, release_connection, SessionLocal, User, EmotionDiary, ExchangeDiary
 from auth import get_current_user
 from config import model, SAFETY_SETTINGS
+from llm_gateway import generate_content_async, gather_with_fallbacks, rate_limit_cooldown, RATE_LIMIT_COOLDOWN_SECONDS
+from google.api_core.exceptions import ResourceExhausted
+from rate_limiter import RateLimitExceeded, llm_scope, ENDPOINT_DIARY
+from weather import fetch_current_weather
+from lexicon import lexicon
+from pagination import paginate_desc, MAX_PAGE_SIZE
+from job_queue import job_handler, enqueue_job, cancel_job, has_active_job, RetryJob, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY_SECONDS
 from personas import CHARACTER_PERSONAS
 
 router = APIRouter(tags=["diary"])
@@ -25,11 +32,12 @@ router = APIRouter(tags=["diary"])
 # 한국 시간대 설정
 KST = pytz.timezone('Asia/Seoul')
 
-# 스케줄러 초기화 (한국 시간대 사용)
-scheduler = BackgroundScheduler(timezone=KST)
-scheduler.start()
-# 프로그램 종료 시 스케줄러 안전하게 종료
-atexit.register(lambda: scheduler.shutdown())
+# 예약 작업 종류 (job_queue)
+REPLY_JOB = "exchange_diary_reply"
+TOPIC_REMINDER_JOB = "topic_reminder"
+# 답장 작업 우선순위 (작을수록 먼저) - 바로 받기 요청이 예약 답장보다 먼저 실행됨
+REPLY_PRIORITY_IMMEDIATE = 0
+REPLY_PRIORITY_SCHEDULED = 10
 
 
 # ===========================================
@@ -97,46 +105,6 @@ def strip_keyword_highlights(text: Optional[str]) -> str:
     return text.replace('**', '')
 
 
-def fetch_current_weather(default_weather: str) -> str:
-    """실제 날씨 API가 있으면 호출해서 최신 날씨로 반환"""
-    import os
-    weather = default_weather or "맑음"
-    try:
-        weather_api_key = os.getenv('WEATHER_API_KEY')
-        if not weather_api_key:
-            return weather
-        
-        import requests
-        response = requests.get(
-            "https://api.openweathermap.org/data/2.5/weather",
-            params={
-                "q": "Seoul",
-                "appid": weather_api_key,
-                "lang": "kr",
-                "units": "metric"
-            },
-            timeout=5
-        )
-        if response.ok:
-            data = response.json()
-            weather_desc = data.get('weather', [{}])[0].get('description', '')
-            weather_map = {
-                'clear sky': '맑음',
-                'few clouds': '구름 조금',
-                'scattered clouds': '구름 많음',
-                'broken clouds': '흐림',
-                'shower rain': '소나기',
-                'rain': '비',
-                'thunderstorm': '천둥번개',
-                'snow': '눈',
-                'mist': '안개'
-            }
-            weather = weather_map.get(weather_desc, weather_desc) or weather
-    except Exception as e:
-        print(f"날씨 API 오류 (무시됨): {e}")
-    return weather
-
-
 def convert_to_kst(utc_datetime: datetime) -> datetime:
     """UTC 시간을 KST로 변환"""
     if utc_datetime.tzinfo is None:
@@ -258,18 +226,90 @@ def get_preview_message(character_id: str) -> str:
     return random.choice(PREVIEW_MESSAGES[selected_category])
 
 
-def generate_reply(exchange_diary_id: int):
-    """교환일기 답장 생성 (스케줄러에서 호출)"""
-    from database import SessionLocal
+async def _generate_text(prompt: str) -> str:
+    """프롬프트 하나로 텍스트 생성"""
+    response = await generate_content_async(model, prompt, safety_settings=SAFETY_SETTINGS)
+    return response.text.strip()
+
+
+@job_handler(REPLY_JOB)
+async def run_generate_reply(payload: dict, attempt: int):
+    """예약 작업: 교환일기 답장 생성
+
+    LLM 요청 한도 초과 직후에는 시작하지 않고 미루고, 답장 생성이 실패하면 다시 시도합니다.
+    마지막 시도에서는 미루지 않고 기본 답장으로라도 완료합니다.
+    """
+    can_retry = attempt < JOB_MAX_ATTEMPTS
+    cooldown = rate_limit_cooldown()
+    if can_retry and cooldown > 0:
+        raise RetryJob(cooldown, "LLM rate limited")
+    with llm_scope(ENDPOINT_DIARY):
+        await generate_reply(payload["exchange_diary_id"], retry_on_failure=can_retry)
+
+
+@job_handler(TOPIC_REMINDER_JOB)
+def send_topic_reminder(payload: dict, attempt: int):
+    """예약 작업: 내일의 주제 리마인더 푸시 알림"""
+    PushNotificationService.send_notification(
+        user_id=payload["user_id"],
+        title=payload["title"],
+        body=payload["body"],
+        data=payload.get("data")
+    )
+
+
+def recover_pending_replies():
+    """예약 시간이 있지만 답장을 받지 못했고 대기 중인 작업도 없는 교환일기의 답장 작업을 다시 등록
+
+    (이전 버전의 메모리 스케줄러에서 재시작으로 사라진 예약 포함, 시간이 지난 예약은 바로 실행)
+    """
+    db = SessionLocal()
+    try:
+        diaries = db.query(ExchangeDiary.id, ExchangeDiary.scheduled_time).filter(
+            ExchangeDiary.scheduled_time != None,
+            or_(ExchangeDiary.reply_received == False, ExchangeDiary.reply_received == None)
+        ).all()
+        recovered = 0
+        for diary_id, scheduled_time in diaries:
+            key = f"reply_{diary_id}"
+            if has_active_job(db, key):
+                continue
+            enqueue_job(
+                db, REPLY_JOB, {"exchange_diary_id": diary_id},
+                run_at=scheduled_time, key=key, priority=REPLY_PRIORITY_SCHEDULED
+            )
+            recovered += 1
+        if recovered:
+            print(f"[교환일기] 답장 예약 {recovered}개 복구")
+    finally:
+        db.close()
+
+
+def _topic_already_set(user_id: int, since: datetime, db: Session) -> bool:
+    """since 이후 작성된 교환일기 중 리액션으로 내일의 주제가 정해진 것이 있는지"""
+    return db.query(ExchangeDiary.id).filter(
+        ExchangeDiary.user_id == user_id,
+        ExchangeDiary.created_at >= since,
+        ExchangeDiary.reacted == True,
+        ExchangeDiary.next_topic != None,
+        ExchangeDiary.next_topic != ""
+    ).first() is not None
+
+
+async def generate_reply(exchange_diary_id: int, retry_on_failure: bool = False):
+    """교환일기 답장 생성
+
+    retry_on_failure이면 본문 생성이 실패했을 때 기본 답장 대신 RetryJob을 올려 나중에 다시 생성합니다.
+    (요청 한도 초과는 한도가 풀릴 때까지, 그 밖의 오류는 JOB_RETRY_DELAY_SECONDS 뒤)
+    DB 조회/저장은 스레드에서 실행하고 LLM 호출만 이벤트 루프에서 기다립니다.
+    """
     import random
     
     db = SessionLocal()
     
     try:
         # 교환일기 조회
-        exchange_diary = db.query(ExchangeDiary).filter(
-            ExchangeDiary.id == exchange_diary_id
-        ).first()
+        exchange_diary = await asyncio.to_thread(db.get, ExchangeDiary, exchange_diary_id)
         
         if not exchange_diary or exchange_diary.reply_received:
             print(f"⚠️ 교환일기 {exchange_diary_id}를 찾을 수 없거나 이미 답장을 받았습니다.")
@@ -282,10 +322,12 @@ def generate_reply(exchange_diary_id: int):
             return
         
         # 사용자 정보 가져오기
-        user = db.query(User).filter(User.id == exchange_diary.user_id).first()
+        user = await asyncio.to_thread(db.get, User, exchange_diary.user_id)
         if not user:
             print(f"⚠️ 사용자 {exchange_diary.user_id}를 찾을 수 없습니다.")
             return
+        # 답장 본문 생성(LLM)을 기다리는 동안 연결을 쥐고 있지 않도록 조회 트랜잭션을 끝냄
+        await asyncio.to_thread(release_connection, db)
         
         char_name = persona.get('name', '').split(' (')[0] if ' (' in persona.get('name', '') else persona.get('name', '캐릭터')
         recipient_name = user.nickname or '사용자'
@@ -344,7 +386,8 @@ def generate_reply(exchange_diary_id: int):
 답장:"""
             
             try:
-                response = model.generate_content(
+                response = await generate_content_async(
+                    model,
                     prompt,
                     safety_settings=SAFETY_SETTINGS
                 )
@@ -355,7 +398,8 @@ def generate_reply(exchange_diary_id: int):
                     if len(body_text) < 100 or body_text == f"{char_name}의 답장이 도착했습니다.":
                         print(f"⚠️ AI 답장이 너무 짧거나 비어있음. 재시도...")
                         # 한 번 더 시도
-                        response = model.generate_content(
+                        response = await generate_content_async(
+                            model,
                             prompt,
                             safety_settings=SAFETY_SETTINGS
                         )
@@ -366,6 +410,12 @@ def generate_reply(exchange_diary_id: int):
                 else:
                     raise ValueError("AI 응답이 없습니다.")
             except Exception as e:
+                if retry_on_failure:
+                    if isinstance(e, RateLimitExceeded):
+                        raise RetryJob(e.retry_after, "LLM rate limited")
+                    if isinstance(e, ResourceExhausted):
+                        raise RetryJob(max(rate_limit_cooldown(), RATE_LIMIT_COOLDOWN_SECONDS), "LLM rate limited")
+                    raise RetryJob(JOB_RETRY_DELAY_SECONDS, f"AI 답장 생성 실패: {type(e).__name__}: {e}")
                 print(f"⚠️ AI 답장 생성 실패: {e}")
                 print(f"⚠️ 오류 상세: {type(e).__name__}: {str(e)}")
                 # 예외 발생 시에도 기본 답장 내용 생성
@@ -409,14 +459,12 @@ P.S. 오늘 밤 따뜻하게 잠자리에 들었으면 좋겠어."""
         today_start = now_kst.replace(hour=0, minute=0, second=0, microsecond=0)
         today_start_utc = today_start.astimezone(pytz.utc).replace(tzinfo=None)
         
-        # 오늘 작성된 모든 교환일기 조회
-        today_diaries = db.query(ExchangeDiary).filter(
-            ExchangeDiary.user_id == exchange_diary.user_id,
-            ExchangeDiary.created_at >= today_start_utc
-        ).order_by(ExchangeDiary.created_at.asc()).all()
-        
-        # 오늘 이미 주제가 설정되었는지 확인
-        topic_already_set = any(diary.reacted and diary.next_topic for diary in today_diaries)
+        # 오늘 이미 주제가 설정되었는지 확인 (오늘 작성된 교환일기 중 리액션하고 주제가 있는 것)
+        topic_already_set = await asyncio.to_thread(
+            _topic_already_set, exchange_diary.user_id, today_start_utc, db
+        )
+        # 주제 생성(LLM)을 기다리는 동안에도 연결을 쥐고 있지 않도록 다시 조회 트랜잭션을 끝냄
+        await asyncio.to_thread(release_connection, db)
         
         # 아직 주제가 설정되지 않았다면 내일의 주제 생성
         next_topic = None
@@ -437,7 +485,7 @@ P.S. 오늘 밤 따뜻하게 잠자리에 들었으면 좋겠어."""
 
 **다시 강조: 주제만 출력하세요.**"""
                 
-                topic_response = model.generate_content(topic_prompt, safety_settings=SAFETY_SETTINGS)
+                topic_response = await generate_content_async(model, topic_prompt, safety_settings=SAFETY_SETTINGS)
                 next_topic_raw = topic_response.text.strip()
                 next_topic = next_topic_raw.strip('"\'.,\n')
                 if ':' in next_topic:
@@ -460,13 +508,18 @@ P.S. 오늘 밤 따뜻하게 잠자리에 들었으면 좋겠어."""
         exchange_diary.reply_received = True
         exchange_diary.reply_created_at = datetime.utcnow()
         
-        db.commit()
+        await asyncio.to_thread(db.commit)
         
         print(f"✅ 교환일기 {exchange_diary_id}에 답장이 생성되었습니다.")
         
+    except RetryJob:
+        db.rollback()
+        raise
     except Exception as e:
         print(f"⚠️ 답장 생성 중 오류 발생: {e}")
         db.rollback()
+        if retry_on_failure:
+            raise
     finally:
         db.close()
 
@@ -475,8 +528,227 @@ P.S. 오늘 밤 따뜻하게 잠자리에 들었으면 좋겠어."""
 # 감정일기 엔드포인트
 # ===========================================
 
+# 날씨 키워드 (날씨 -> 키워드 집합, 앞쪽 날씨 우선)
+_WEATHER_KEYWORD_SETS = lexicon.register_many('weather', {
+    '비': ['비', '비옴', '비온다', '비와', '소나기', '장마', '빗물'],
+    '눈': ['눈', '눈옴', '눈온다', '눈와', '눈발', '함박눈'],
+    '맑음': ['맑음', '맑은', '화창', '밝음', '햇살'],
+    '흐림': ['흐림', '흐린', '구름', '흐려'],
+    '바람': ['바람', '강풍', '바람불어'],
+    '안개': ['안개', '짙은 안개'],
+    '번개': ['번개', '천둥', '천둥번개', '뇌우']
+})
+
+# 감정 분석 폴백 키워드 (감정 -> 키워드 집합)
+_DIARY_EMOTION_KEYWORD_SETS = lexicon.register_many('diary_emotion', {
+    '피로': ['지쳤', '피곤', '힘들', '지침', '할일 많'],
+    '스트레스': ['스트레스', '답답', '짜증', '화나'],
+    '기쁨': ['기쁘', '행복', '좋아', '즐거'],
+    '슬픔': ['슬프', '우울', '힘들', '아프'],
+    '걱정': ['걱정', '불안', '염려', '근심'],
+    '만족': ['만족', '뿌듯', '성취'],
+    '후회': ['후회', '아쉬', '미안']
+})
+# 감정 분석 호출 자체가 실패했을 때 쓰는 감정
+_DIARY_ERROR_FALLBACK_EMOTIONS = ('피로', '스트레스', '기쁨', '슬픔', '걱정')
+
+
+def detect_weather_from_text(text: str) -> Optional[str]:
+    """텍스트에 언급된 날씨 (없으면 None)"""
+    scan = lexicon.scan(text)
+    for weather_type, keyword_set in _WEATHER_KEYWORD_SETS.items():
+        if scan.has(keyword_set):
+            return weather_type
+    return None
+
+
+def detect_emotions_from_text(text: str, emotions: Optional[tuple] = None) -> dict:
+    """텍스트의 감정 키워드로 감정 추출 (LLM 감정 분석 폴백)"""
+    scan = lexicon.scan(text.lower())
+    detected_emotions = [
+        emotion for emotion in (emotions or _DIARY_EMOTION_KEYWORD_SETS)
+        if scan.has(_DIARY_EMOTION_KEYWORD_SETS[emotion])
+    ]
+    if detected_emotions:
+        return {
+            "emotions": detected_emotions[:5],
+            "dominant": detected_emotions[0],
+            "intensity": 0.7
+        }
+    return {"emotions": ["평온"], "dominant": "평온", "intensity": 0.5}
+
+
+# 일기 생성 시 제목/내용/감정을 JSON 구조화 출력 한 번으로 받음 (DIARY_STRUCTURED_OUTPUT=0 이면 기존 2회 호출)
+DIARY_STRUCTURED_OUTPUT = os.environ.get("DIARY_STRUCTURED_OUTPUT", "1") != "0"
+
+# 감정 분석 지침 (감정 분석 프롬프트와 구조화 출력 프롬프트 공용)
+_DIARY_EMOTION_GUIDELINES = """**중요 지침:**
+- 일기 내용에서 실제로 드러나는 감정만 추출하세요
+- "할일 많아서 지쳤다", "피곤하다", "힘들다" 같은 내용이면 "피로", "지침", "스트레스" 같은 감정을 추출하세요
+- "평온"은 정말로 평온하고 차분한 감정이 드러날 때만 사용하세요
+- 감정이 명확하지 않으면 추측하지 말고, 실제로 드러나는 감정만 추출하세요
+- 감정 키워드: 기쁨, 슬픔, 설렘, 그리움, 사랑, 외로움, 행복, 감사, 희망, 피로, 지침, 스트레스, 걱정, 불안, 화남, 답답함, 만족, 후회, 아쉬움, 평온, 편안함"""
+
+_DIARY_TEXT_FORMAT = """일기 형식:
+제목: [일기 제목]
+내용: [일기 내용]"""
+
+_DIARY_STRUCTURED_FORMAT = """일기를 쓴 뒤, 작성한 일기 내용에서 드러나는 감정도 함께 분석해주세요.
+
+""" + _DIARY_EMOTION_GUIDELINES + """
+
+다음 JSON 형식으로만 응답하세요:
+- title: 일기 제목
+- content: 일기 내용
+- emotions.emotions: 일기에서 드러나는 감정 목록 (최대 5개)
+- emotions.dominant: 가장 주된 감정
+- emotions.intensity: 감정의 강도 (0.0-1.0)"""
+
+# 구조화 출력 스키마 (title, content, emotions)
+DIARY_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": {"type": "STRING"},
+        "content": {"type": "STRING"},
+        "emotions": {
+            "type": "OBJECT",
+            "properties": {
+                "emotions": {"type": "ARRAY", "items": {"type": "STRING"}},
+                "dominant": {"type": "STRING"},
+                "intensity": {"type": "NUMBER"},
+            },
+            "required": ["emotions", "dominant", "intensity"],
+        },
+    },
+    "required": ["title", "content", "emotions"],
+}
+
+
+def _split_diary_text(diary_text: str) -> Tuple[str, str]:
+    """'제목: ... 내용: ...' 형식의 생성 결과를 (제목, 내용)으로 분리"""
+    title = "오늘의 일기"
+    content = diary_text
+    
+    if "제목:" in diary_text:
+        parts = diary_text.split("제목:")
+        if len(parts) > 1:
+            title_part = parts[1].split("\n")[0].strip()
+            if title_part:
+                title = title_part
+    
+    if "내용:" in diary_text:
+        parts = diary_text.split("내용:")
+        if len(parts) > 1:
+            content = parts[1].strip()
+    
+    return strip_keyword_highlights(title).strip(), strip_keyword_highlights(content).strip()
+
+
+def _validate_emotions(emotions) -> Optional[dict]:
+    """LLM이 반환한 감정 분석 결과 검증 (형식이 맞지 않거나 감정이 비어 있으면 None)"""
+    if not isinstance(emotions, dict):
+        return None
+    names = [
+        name.strip() for name in emotions.get("emotions") or []
+        if isinstance(name, str) and name.strip()
+    ][:5]
+    dominant = emotions.get("dominant")
+    intensity = emotions.get("intensity")
+    if not names or not isinstance(dominant, str) or not dominant.strip():
+        return None
+    if isinstance(intensity, bool) or not isinstance(intensity, (int, float)) or not 0.0 <= intensity <= 1.0:
+        return None
+    return {"emotions": names, "dominant": dominant.strip(), "intensity": float(intensity)}
+
+
+async def _generate_diary_structured(prompt_body: str) -> Tuple[str, str, Optional[dict]]:
+    """구조화 출력 한 번으로 (제목, 내용, 감정) 생성 (제목/내용이 형식에 맞지 않으면 ValueError)"""
+    response = await generate_content_async(
+        model,
+        f"{prompt_body}\n\n{_DIARY_STRUCTURED_FORMAT}",
+        safety_settings=SAFETY_SETTINGS,
+        generation_config={
+            "response_mime_type": "application/json",
+            "response_schema": DIARY_RESPONSE_SCHEMA,
+        }
+    )
+    data = json.loads(response.text)
+    if not isinstance(data, dict):
+        raise ValueError("JSON 객체가 아닙니다")
+    title = data.get("title")
+    content = data.get("content")
+    if not isinstance(title, str) or not isinstance(content, str):
+        raise ValueError("제목/내용 형식이 올바르지 않습니다")
+    title = strip_keyword_highlights(title).strip()
+    content = strip_keyword_highlights(content).strip()
+    if not title or not content:
+        raise ValueError("제목/내용이 비어 있습니다")
+    return title, content, _validate_emotions(data.get("emotions"))
+
+
+async def _analyze_diary_emotions(content: str, fallback_text: str) -> dict:
+    """일기 내용 감정 분석 (실패하면 fallback_text의 감정 키워드로 추출)"""
+    emotion_prompt = f"""다음 일기 내용을 분석해서 감정을 추출해주세요:
+
+{content}
+
+{_DIARY_EMOTION_GUIDELINES}
+
+감정을 JSON 형식으로 반환해주세요 (최대 5개까지):
+{{
+  "emotions": ["감정1", "감정2", "감정3"],
+  "dominant": "가장 주된 감정",
+  "intensity": 0.0-1.0
+}}"""
+    
+    try:
+        emotion_response = await generate_content_async(model, emotion_prompt, safety_settings=SAFETY_SETTINGS)
+        emotion_text = emotion_response.text.strip()
+        # JSON 추출
+        json_start = emotion_text.find('{')
+        json_end = emotion_text.rfind('}')
+        if json_start != -1 and json_end != -1:
+            emotions_json = json.loads(emotion_text[json_start:json_end+1])
+        else:
+            raise ValueError("JSON 형식이 아닙니다")
+        
+        # emotions가 없거나 비어있으면 감정 키워드 직접 추출
+        if not emotions_json.get('emotions') or len(emotions_json.get('emotions', [])) == 0:
+            emotions_json = detect_emotions_from_text(fallback_text)
+        return emotions_json
+    except Exception as e:
+        print(f"감정 분석 오류: {e}")
+        return detect_emotions_from_text(fallback_text, _DIARY_ERROR_FALLBACK_EMOTIONS)
+
+
+async def _write_diary(prompt_body: str, fallback_text: Optional[str] = None) -> Tuple[str, str, dict]:
+    """일기 (제목, 내용, 감정) 생성
+
+    구조화 출력 한 번으로 생성하고, 실패하면 기존처럼 본문 생성 후 감정 분석을 따로 호출합니다.
+    감정이 비어 있거나 형식이 맞지 않으면 fallback_text(없으면 생성된 일기 내용)의 감정 키워드로 추출합니다.
+    """
+    if DIARY_STRUCTURED_OUTPUT:
+        try:
+            title, content, emotions_json = await _generate_diary_structured(prompt_body)
+            return title, content, emotions_json or detect_emotions_from_text(fallback_text or content)
+        except Exception as e:
+            print(f"구조화 일기 생성 실패, 기존 방식으로 재시도: {type(e).__name__}: {e}")
+    
+    response = await generate_content_async(model, f"{prompt_body}\n\n{_DIARY_TEXT_FORMAT}", safety_settings=SAFETY_SETTINGS)
+    title, content = _split_diary_text(response.text.strip())
+    emotions_json = await _analyze_diary_emotions(content, fallback_text or content)
+    return title, content, emotions_json
+
+
+def _save_row(row, db: Session):
+    """새 행 저장 후 다시 읽기 (비동기 엔드포인트에서 스레드로 실행)"""
+    db.add(row)
+    db.commit()
+    db.refresh(row)
+
+
 @router.post("/diary/generate")
-def generate_diary(
+async def generate_diary(
     request: DiaryGenerateRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -491,21 +763,7 @@ def generate_diary(
             keywords = request.keywords.strip()
             
             # 날씨 키워드 추출
-            weather_keywords = {
-                '비': ['비', '비옴', '비온다', '비와', '소나기', '장마', '빗물'],
-                '눈': ['눈', '눈옴', '눈온다', '눈와', '눈발', '함박눈'],
-                '맑음': ['맑음', '맑은', '화창', '밝음', '햇살'],
-                '흐림': ['흐림', '흐린', '구름', '흐려'],
-                '바람': ['바람', '강풍', '바람불어'],
-                '안개': ['안개', '짙은 안개'],
-                '번개': ['번개', '천둥', '천둥번개', '뇌우']
-            }
-            
-            detected_weather = None
-            for weather_type, weather_keyword_list in weather_keywords.items():
-                if any(keyword in keywords for keyword in weather_keyword_list):
-                    detected_weather = weather_type
-                    break
+            detected_weather = detect_weather_from_text(keywords)
             
             # 키워드 기반 프롬프트 생성
             prompt = f"""다음 키워드들을 바탕으로 오늘의 일기를 작성해주세요:
@@ -517,114 +775,10 @@ def generate_diary(
 - 자연스럽고 진솔한 톤으로 작성하세요
 - 300-500자 정도의 분량으로 작성하세요
 - 키워드에서 느껴지는 감정과 경험을 자세히 묘사해주세요
-- 키워드를 별표(**)나 기타 특수문자로 강조하지 말고 자연스럽게 문장 속에 녹여주세요
-
-일기 형식:
-제목: [일기 제목]
-내용: [일기 내용]"""
-            
-            response = model.generate_content(prompt, safety_settings=SAFETY_SETTINGS)
-            diary_text = response.text.strip()
-            
-            # 제목과 내용 분리
-            title = "오늘의 일기"
-            content = diary_text
-            
-            if "제목:" in diary_text:
-                parts = diary_text.split("제목:")
-                if len(parts) > 1:
-                    title_part = parts[1].split("\n")[0].strip()
-                    if title_part:
-                        title = title_part
-            
-            if "내용:" in diary_text:
-                parts = diary_text.split("내용:")
-                if len(parts) > 1:
-                    content = parts[1].strip()
-            
-            title = strip_keyword_highlights(title).strip()
-            content = strip_keyword_highlights(content).strip()
-            
-            # 감정 분석
-            emotion_prompt = f"""다음 일기 내용을 분석해서 감정을 추출해주세요:
-
-{content}
-
-**중요 지침:**
-- 일기 내용에서 실제로 드러나는 감정만 추출하세요
-- "할일 많아서 지쳤다", "피곤하다", "힘들다" 같은 내용이면 "피로", "지침", "스트레스" 같은 감정을 추출하세요
-- "평온"은 정말로 평온하고 차분한 감정이 드러날 때만 사용하세요
-- 감정이 명확하지 않으면 추측하지 말고, 실제로 드러나는 감정만 추출하세요
-- 감정 키워드: 기쁨, 슬픔, 설렘, 그리움, 사랑, 외로움, 행복, 감사, 희망, 피로, 지침, 스트레스, 걱정, 불안, 화남, 답답함, 만족, 후회, 아쉬움, 평온, 편안함
-
-감정을 JSON 형식으로 반환해주세요 (최대 5개까지):
-{{
-  "emotions": ["감정1", "감정2", "감정3"],
-  "dominant": "가장 주된 감정",
-  "intensity": 0.0-1.0
-}}"""
+- 키워드를 별표(**)나 기타 특수문자로 강조하지 말고 자연스럽게 문장 속에 녹여주세요"""
             
-            try:
-                emotion_response = model.generate_content(emotion_prompt, safety_settings=SAFETY_SETTINGS)
-                emotion_text = emotion_response.text.strip()
-                # JSON 추출
-                json_start = emotion_text.find('{')
-                json_end = emotion_text.rfind('}')
-                if json_start != -1 and json_end != -1:
-                    emotions_json = json.loads(emotion_text[json_start:json_end+1])
-                else:
-                    raise ValueError("JSON 형식이 아닙니다")
-                
-                # emotions가 없거나 비어있으면 기본값 설정
-                if not emotions_json.get('emotions') or len(emotions_json.get('emotions', [])) == 0:
-                    # 키워드에서 직접 감정 추출
-                    emotion_keywords_dict = {
-                        '피로': ['지쳤', '피곤', '힘들', '지침', '할일 많'],
-                        '스트레스': ['스트레스', '답답', '짜증', '화나'],
-                        '기쁨': ['기쁘', '행복', '좋아', '즐거'],
-                        '슬픔': ['슬프', '우울', '힘들', '아프'],
-                        '걱정': ['걱정', '불안', '염려', '근심'],
-                        '만족': ['만족', '뿌듯', '성취'],
-                        '후회': ['후회', '아쉬', '미안']
-                    }
-                    detected_emotions = []
-                    keywords_lower = keywords.lower()
-                    for emotion, keyword_list in emotion_keywords_dict.items():
-                        if any(keyword in keywords_lower for keyword in keyword_list):
-                            detected_emotions.append(emotion)
-                    
-                    if detected_emotions:
-                        emotions_json = {
-                            "emotions": detected_emotions[:5],
-                            "dominant": detected_emotions[0],
-                            "intensity": 0.7
-                        }
-                    else:
-                        emotions_json = {"emotions": ["평온"], "dominant": "평온", "intensity": 0.5}
-            except Exception as e:
-                print(f"감정 분석 오류: {e}")
-                # 키워드에서 직접 감정 추출
-                emotion_keywords_dict = {
-                    '피로': ['지쳤', '피곤', '힘들', '지침', '할일 많'],
-                    '스트레스': ['스트레스', '답답', '짜증', '화나'],
-                    '기쁨': ['기쁘', '행복', '좋아', '즐거'],
-                    '슬픔': ['슬프', '우울', '힘들', '아프'],
-                    '걱정': ['걱정', '불안', '염려', '근심']
-                }
-                detected_emotions = []
-                keywords_lower = keywords.lower()
-                for emotion, keyword_list in emotion_keywords_dict.items():
-                    if any(keyword in keywords_lower for keyword in keyword_list):
-                        detected_emotions.append(emotion)
-                
-                if detected_emotions:
-                    emotions_json = {
-                        "emotions": detected_emotions[:5],
-                        "dominant": detected_emotions[0],
-                        "intensity": 0.7
-                    }
-                else:
-                    emotions_json = {"emotions": ["평온"], "dominant": "평온", "intensity": 0.5}
+            # 일기 생성 + 감정 분석 (감정 추출 실패 시 키워드에서 직접 추출)
+            title, content, emotions_json = await _write_diary(prompt, keywords)
             
             # 날씨 정보
             weather = fetch_current_weather(detected_weather or "맑음")
@@ -638,9 +792,7 @@ def generate_diary(
                 emotions=json.dumps(emotions_json, ensure_ascii=False),
                 weather=weather
             )
-            db.add(new_diary)
-            db.commit()
-            db.refresh(new_diary)
+            await asyncio.to_thread(_save_row, new_diary, db)
             
             return {
                 "diary": {
@@ -680,22 +832,7 @@ def generate_diary(
                 conversation_text += f"{char_name}: {text}\n"
         
         # 사용자 메시지에서 날씨 키워드 추출
-        weather_keywords = {
-            '비': ['비', '비옴', '비온다', '비와', '소나기', '장마', '빗물'],
-            '눈': ['눈', '눈옴', '눈온다', '눈와', '눈발', '함박눈'],
-            '맑음': ['맑음', '맑은', '화창', '밝음', '햇살'],
-            '흐림': ['흐림', '흐린', '구름', '흐려'],
-            '바람': ['바람', '강풍', '바람불어'],
-            '안개': ['안개', '짙은 안개'],
-            '번개': ['번개', '천둥', '천둥번개', '뇌우']
-        }
-        
-        detected_weather = None
-        user_text_combined = ' '.join(user_messages)
-        for weather_type, keywords_list in weather_keywords.items():
-            if any(keyword in user_text_combined for keyword in keywords_list):
-                detected_weather = weather_type
-                break
+        detected_weather = detect_weather_from_text(' '.join(user_messages))
         
         # Gemini API로 일기 생성
         prompt = f"""다음은 오늘 나눈 대화 내용입니다:
@@ -712,114 +849,10 @@ def generate_diary(
 - 대화를 통해 느낀 내 감정의 변화와 깨달음 등을 포함
 - 자연스럽고 진솔한 톤으로 작성
 - 300-500자 정도의 분량으로 작성
-- 캐릭터의 답장 내용은 최소한으로만 언급하고, 내 감정과 경험이 주인공이 되도록 작성하세요
-
-일기 형식:
-제목: [일기 제목]
-내용: [일기 내용]"""
-        
-        response = model.generate_content(prompt, safety_settings=SAFETY_SETTINGS)
-        diary_text = response.text.strip()
-        
-        # 제목과 내용 분리
-        title = "오늘의 일기"
-        content = diary_text
-        
-        if "제목:" in diary_text:
-            parts = diary_text.split("제목:")
-            if len(parts) > 1:
-                title_part = parts[1].split("\n")[0].strip()
-                if title_part:
-                    title = title_part
+- 캐릭터의 답장 내용은 최소한으로만 언급하고, 내 감정과 경험이 주인공이 되도록 작성하세요"""
         
-        if "내용:" in diary_text:
-            parts = diary_text.split("내용:")
-            if len(parts) > 1:
-                content = parts[1].strip()
-        
-        title = strip_keyword_highlights(title).strip()
-        content = strip_keyword_highlights(content).strip()
-        
-        # 감정 분석
-        emotion_prompt = f"""다음 일기 내용을 분석해서 감정을 추출해주세요:
-
-{content}
-
-**중요 지침:**
-- 일기 내용에서 실제로 드러나는 감정만 추출하세요
-- "할일 많아서 지쳤다", "피곤하다", "힘들다" 같은 내용이면 "피로", "지침", "스트레스" 같은 감정을 추출하세요
-- "평온"은 정말로 평온하고 차분한 감정이 드러날 때만 사용하세요
-- 감정이 명확하지 않으면 추측하지 말고, 실제로 드러나는 감정만 추출하세요
-- 감정 키워드: 기쁨, 슬픔, 설렘, 그리움, 사랑, 외로움, 행복, 감사, 희망, 피로, 지침, 스트레스, 걱정, 불안, 화남, 답답함, 만족, 후회, 아쉬움, 평온, 편안함
-
-감정을 JSON 형식으로 반환해주세요 (최대 5개까지):
-{{
-  "emotions": ["감정1", "감정2", "감정3"],
-  "dominant": "가장 주된 감정",
-  "intensity": 0.0-1.0
-}}"""
-        
-        try:
-            emotion_response = model.generate_content(emotion_prompt, safety_settings=SAFETY_SETTINGS)
-            emotion_text = emotion_response.text.strip()
-            # JSON 추출
-            json_start = emotion_text.find('{')
-            json_end = emotion_text.rfind('}')
-            if json_start != -1 and json_end != -1:
-                emotions_json = json.loads(emotion_text[json_start:json_end+1])
-            else:
-                raise ValueError("JSON 형식이 아닙니다")
-            
-            # emotions가 없거나 비어있으면 기본값 설정
-            if not emotions_json.get('emotions') or len(emotions_json.get('emotions', [])) == 0:
-                # 일기 내용에서 감정 키워드 직접 추출
-                emotion_keywords_dict = {
-                    '피로': ['지쳤', '피곤', '힘들', '지침', '할일 많'],
-                    '스트레스': ['스트레스', '답답', '짜증', '화나'],
-                    '기쁨': ['기쁘', '행복', '좋아', '즐거'],
-                    '슬픔': ['슬프', '우울', '힘들', '아프'],
-                    '걱정': ['걱정', '불안', '염려', '근심'],
-                    '만족': ['만족', '뿌듯', '성취'],
-                    '후회': ['후회', '아쉬', '미안']
-                }
-                detected_emotions = []
-                content_lower = content.lower()
-                for emotion, keywords_list in emotion_keywords_dict.items():
-                    if any(keyword in content_lower for keyword in keywords_list):
-                        detected_emotions.append(emotion)
-                
-                if detected_emotions:
-                    emotions_json = {
-                        "emotions": detected_emotions[:5],
-                        "dominant": detected_emotions[0],
-                        "intensity": 0.7
-                    }
-                else:
-                    emotions_json = {"emotions": ["평온"], "dominant": "평온", "intensity": 0.5}
-        except Exception as e:
-            print(f"감정 분석 오류: {e}")
-            # 일기 내용에서 직접 감정 추출
-            emotion_keywords_dict = {
-                '피로': ['지쳤', '피곤', '힘들', '지침', '할일 많'],
-                '스트레스': ['스트레스', '답답', '짜증', '화나'],
-                '기쁨': ['기쁘', '행복', '좋아', '즐거'],
-                '슬픔': ['슬프', '우울', '힘들', '아프'],
-                '걱정': ['걱정', '불안', '염려', '근심']
-            }
-            detected_emotions = []
-            content_lower = content.lower()
-            for emotion, keywords_list in emotion_keywords_dict.items():
-                if any(keyword in content_lower for keyword in keywords_list):
-                    detected_emotions.append(emotion)
-            
-            if detected_emotions:
-                emotions_json = {
-                    "emotions": detected_emotions[:5],
-                    "dominant": detected_emotions[0],
-                    "intensity": 0.7
-                }
-            else:
-                emotions_json = {"emotions": ["평온"], "dominant": "평온", "intensity": 0.5}
+        # 일기 생성 + 감정 분석 (감정 추출 실패 시 일기 내용에서 직접 추출)
+        title, content, emotions_json = await _write_diary(prompt)
         
         # 날씨 정보 (대화에서 추출한 날씨 또는 기본값) + 실시간 반영
         weather = fetch_current_weather(detected_weather or "맑음")
@@ -834,9 +867,7 @@ def generate_diary(
             emotions=json.dumps(emotions_json, ensure_ascii=False),
             weather=weather
         )
-        db.add(diary)
-        db.commit()
-        db.refresh(diary)
+        await asyncio.to_thread(_save_row, diary, db)
         
         return {
             "id": diary.id,
@@ -856,13 +887,27 @@ def generate_diary(
 
 @router.get("/diary/list")
 def get_diary_list(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """일기 목록 조회"""
-    diaries = db.query(EmotionDiary).filter(
+    """일기 목록 조회
+
+    본문(content)은 읽지 않고 목록에 필요한 컬럼만 조회합니다. 본문은 GET /diary/{diary_id}로 조회합니다.
+    limit이 있으면 (diary_date, id) 커서로 한 페이지만 반환합니다.
+    """
+    query = db.query(EmotionDiary).options(load_only(
+        EmotionDiary.id, EmotionDiary.title, EmotionDiary.summary, EmotionDiary.diary_date,
+        EmotionDiary.emotions, EmotionDiary.weather
+    )).filter(
         EmotionDiary.user_id == current_user.id
-    ).order_by(EmotionDiary.diary_date.desc(), EmotionDiary.id.desc()).all()
+    )
+    next_cursor = None
+    if limit is None:
+        diaries = query.order_by(EmotionDiary.diary_date.desc(), EmotionDiary.id.desc()).all()
+    else:
+        diaries, next_cursor = paginate_desc(query, EmotionDiary.diary_date, EmotionDiary.id, limit, cursor)
     
     return {
         "diaries": [
@@ -875,7 +920,8 @@ def get_diary_list(
                 "weather": d.weather or "맑음"
             }
             for d in diaries
-        ]
+        ],
+        "next_cursor": next_cursor
     }
 
 
@@ -1022,40 +1068,87 @@ def create_exchange_diary(
                 # 스케줄링된 시간에 답장 생성
                 scheduled_datetime_kst = convert_to_kst(scheduled_time_utc)
                 
-                scheduler.add_job(
-                    generate_reply,
-                    trigger=DateTrigger(run_date=scheduled_datetime_kst),
-                    args=[exchange_diary.id],
-                    id=f"reply_{exchange_diary.id}",
-                    replace_existing=True
+                enqueue_job(
+                    db,
+                    REPLY_JOB,
+                    {"exchange_diary_id": exchange_diary.id},
+                    run_at=scheduled_time_utc,
+                    key=f"reply_{exchange_diary.id}",
+                    priority=REPLY_PRIORITY_SCHEDULED
                 )
                 print(f"✅ 답장 생성이 {scheduled_datetime_kst}에 예약되었습니다.")
+                reply_status = "scheduled"
             else:
-                # 즉시 답장 생성
-                generate_reply(exchange_diary.id)
+                # 즉시 답장 생성 - 답장 워커 풀에서 우선 처리하고 요청은 바로 반환
+                enqueue_job(
+                    db,
+                    REPLY_JOB,
+                    {"exchange_diary_id": exchange_diary.id},
+                    key=f"reply_{exchange_diary.id}",
+                    priority=REPLY_PRIORITY_IMMEDIATE
+                )
+                reply_status = "pending"
+        else:
+            reply_status = None
         
-        return {"success": True, "diary_id": exchange_diary.id}
+        return {"success": True, "diary_id": exchange_diary.id, "reply_status": reply_status}
     except Exception as e:
         print(f"교환일기 생성 오류: {e}")
         raise HTTPException(status_code=500, detail=f"교환일기 생성 중 오류가 발생했습니다: {str(e)}")
 
 
+# 교환일기 목록 요약 보기의 본문 미리보기 길이
+EXCHANGE_DIARY_PREVIEW_LENGTH = 100
+
+
 @router.get("/exchange-diary/list")
 def get_exchange_diary_list(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """교환일기 목록 조회"""
-    diaries = db.query(ExchangeDiary).filter(
+    """교환일기 목록 조회
+
+    답장 본문(reply_content) 등 목록에 쓰지 않는 긴 컬럼은 읽지 않습니다.
+    view="summary"이면 content 대신 앞부분만 DB에서 잘라 content_preview로 반환합니다.
+    (전체 본문은 GET /exchange-diary/{diary_id}, 답장은 GET /exchange-diary/{diary_id}/reply)
+    limit이 있으면 (created_at, id) 커서로 한 페이지만 반환합니다.
+    """
+    columns = [
+        ExchangeDiary.id, ExchangeDiary.character_id, ExchangeDiary.reply_received,
+        ExchangeDiary.reply_read, ExchangeDiary.reacted, ExchangeDiary.preview_message,
+        ExchangeDiary.reply_created_at, ExchangeDiary.scheduled_time,
+        ExchangeDiary.created_at, ExchangeDiary.updated_at,
+    ]
+    if view == "summary":
+        columns.append(func.substr(ExchangeDiary.content, 1, EXCHANGE_DIARY_PREVIEW_LENGTH + 1).label("content_preview"))
+    else:
+        columns.append(ExchangeDiary.content)
+    query = db.query(*columns).filter(
         ExchangeDiary.user_id == current_user.id
-    ).order_by(ExchangeDiary.created_at.desc()).all()
+    )
+    next_cursor = None
+    if limit is None:
+        diaries = query.order_by(ExchangeDiary.created_at.desc(), ExchangeDiary.id.desc()).all()
+    else:
+        diaries, next_cursor = paginate_desc(query, ExchangeDiary.created_at, ExchangeDiary.id, limit, cursor)
     
     result = []
     for diary in diaries:
-        result.append({
+        item = {
             "id": diary.id,
             "character_id": diary.character_id,
-            "content": diary.content,
+        }
+        if view == "summary":
+            preview = diary.content_preview or ""
+            if len(preview) > EXCHANGE_DIARY_PREVIEW_LENGTH:
+                preview = preview[:EXCHANGE_DIARY_PREVIEW_LENGTH] + "..."
+            item["content_preview"] = preview
+        else:
+            item["content"] = diary.content
+        item.update({
             "reply_received": diary.reply_received,
             "reply_read": diary.reply_read,
             "reacted": diary.reacted,
@@ -1065,8 +1158,9 @@ def get_exchange_diary_list(
             "created_at": diary.created_at.isoformat() + 'Z' if diary.created_at else None,
             "updated_at": diary.updated_at.isoformat() + 'Z' if diary.updated_at else None
         })
+        result.append(item)
     
-    return {"diaries": result}
+    return {"diaries": result, "next_cursor": next_cursor}
 
 
 @router.get("/exchange-diary/{diary_id}")
@@ -1140,11 +1234,8 @@ def delete_exchange_diary(
     if not diary:
         raise HTTPException(status_code=404, detail="Exchange diary not found")
     
-    # 스케줄러에서 예약된 작업 제거
-    try:
-        scheduler.remove_job(f"reply_{diary_id}")
-    except:
-        pass
+    # 예약된 답장 작업 제거
+    cancel_job(db, f"reply_{diary_id}")
     
     db.delete(diary)
     db.commit()
@@ -1153,17 +1244,14 @@ def delete_exchange_diary(
 
 
 @router.post("/exchange-diary/{diary_id}/react")
-def react_to_reply(
+async def react_to_reply(
     diary_id: int,
     reaction: dict,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """교환일기 답장에 반응"""
-    diary = db.query(ExchangeDiary).filter(
-        ExchangeDiary.id == diary_id,
-        ExchangeDiary.user_id == current_user.id
-    ).first()
+    """교환일기 답장에 반응 (DB 작업은 스레드에서, 속삭임/주제 생성만 이벤트 루프에서 실행)"""
+    diary = await asyncio.to_thread(_get_own_exchange_diary, diary_id, current_user.id, db)
     
     if not diary:
         raise HTTPException(status_code=404, detail="Exchange diary not found")
@@ -1176,18 +1264,15 @@ def react_to_reply(
             "next_topic": diary.next_topic
         }
     
-    diary.reacted = True
-    
     # AI로 속삭임 메시지와 내일의 주제 생성
     whisper_message = ""
     next_topic = ""
     
     if model:
-        try:
-            persona = CHARACTER_PERSONAS.get(diary.character_id)
-            if persona:
-                # 속삭임 메시지 생성
-                whisper_prompt = f"""당신은 드라마 캐릭터 '{persona['name']}'입니다.
+        persona = CHARACTER_PERSONAS.get(diary.character_id)
+        if persona:
+            # 속삭임 메시지 프롬프트
+            whisper_prompt = f"""당신은 드라마 캐릭터 '{persona['name']}'입니다.
 사용자가 당신의 답장에 하트 반응을 보냈습니다.
 사용자에게 짧고 따뜻한 속삭임 메시지를 작성해주세요.
 
@@ -1196,12 +1281,9 @@ def react_to_reply(
 - 따뜻하고 감사하는 톤으로 작성하세요
 
 속삭임:"""
-                
-                response = model.generate_content(whisper_prompt, safety_settings=SAFETY_SETTINGS)
-                whisper_message = response.text.strip()
-                
-                # 내일의 주제 생성
-                topic_prompt = f"""당신은 드라마 캐릭터 '{persona['name']}'입니다.
+            
+            # 내일의 주제 프롬프트
+            topic_prompt = f"""당신은 드라마 캐릭터 '{persona['name']}'입니다.
 사용자가 오늘 일기를 작성했습니다:
 {diary.content[:200]}
 
@@ -1213,11 +1295,14 @@ def react_to_reply(
 - 질문 형태로 작성하되, 물음표는 빼고 작성하세요
 
 주제:"""
-                
-                response = model.generate_content(topic_prompt, safety_settings=SAFETY_SETTINGS)
-                next_topic = response.text.strip().rstrip('?')
-        except Exception as e:
-            print(f"속삭임/주제 생성 실패: {e}")
+            
+            # 속삭임과 주제는 서로 독립적이므로 동시에 생성 (실패한 쪽은 아래 기본 메시지 사용)
+            generated = await gather_with_fallbacks({
+                "whisper": _generate_text(whisper_prompt),
+                "topic": _generate_text(topic_prompt),
+            }, fallbacks="")
+            whisper_message = generated["whisper"]
+            next_topic = generated["topic"].rstrip('?')
     
     # 기본 메시지 설정
     if not whisper_message:
@@ -1225,6 +1310,29 @@ def react_to_reply(
     if not next_topic:
         next_topic = "오늘 하루는 어땠어?"
     
+    user_nickname = current_user.nickname or current_user.username or '당신'
+    await asyncio.to_thread(_save_reaction, diary, whisper_message, next_topic, user_nickname, db)
+    
+    return {
+        "success": True,
+        "whisper_message": whisper_message,
+        "next_topic": next_topic
+    }
+
+
+def _get_own_exchange_diary(diary_id: int, user_id: int, db: Session) -> Optional[ExchangeDiary]:
+    """사용자의 교환일기 조회 (없으면 None, 속삭임 생성을 기다리는 동안 연결을 쥐지 않도록 돌려줌)"""
+    diary = db.query(ExchangeDiary).filter(
+        ExchangeDiary.id == diary_id,
+        ExchangeDiary.user_id == user_id
+    ).first()
+    release_connection(db)
+    return diary
+
+
+def _save_reaction(diary: ExchangeDiary, whisper_message: str, next_topic: str, user_nickname: str, db: Session):
+    """리액션 결과 저장 후 다음 날 주제 리마인더 예약"""
+    diary.reacted = True
     diary.whisper_message = whisper_message
     diary.next_topic = next_topic
     db.commit()
@@ -1242,9 +1350,6 @@ def react_to_reply(
             persona = CHARACTER_PERSONAS.get(diary.character_id)
             char_name = persona.get('name', '').split(' (')[0] if persona else '캐릭터'
             
-            # 사용자 닉네임 가져오기
-            user_nickname = current_user.nickname or current_user.username or '당신'
-            
             # 주제 관련 알림 메시지
             topic_notification_messages = [
                 f"{user_nickname}, 어제 말한 '{next_topic}' 생각해 봤어요? 나 기다리고 있는데.",
@@ -1254,35 +1359,27 @@ def react_to_reply(
             ]
             notification_body = random.choice(topic_notification_messages)
             
-            def send_topic_reminder():
-                PushNotificationService.send_notification(
-                    user_id=diary.user_id,
-                    title=f"{char_name}이(가) 기다리고 있어요",
-                    body=notification_body,
-                    data={
+            enqueue_job(
+                db,
+                TOPIC_REMINDER_JOB,
+                {
+                    "user_id": diary.user_id,
+                    "title": f"{char_name}이(가) 기다리고 있어요",
+                    "body": notification_body,
+                    "data": {
                         "type": "topic_reminder",
                         "topic": next_topic,
                         "character_id": diary.character_id,
                         "diary_id": diary.id
                     }
-                )
-            
-            scheduler.add_job(
-                send_topic_reminder,
-                trigger=DateTrigger(run_date=tomorrow_evening),
-                id=f"topic_reminder_{diary.id}",
-                replace_existing=True
+                },
+                run_at=tomorrow_evening,
+                key=f"topic_reminder_{diary.id}"
             )
             
             print(f"📅 주제 리마인더 스케줄링: {tomorrow_evening.strftime('%Y-%m-%d %H:%M:%S KST')}")
         except Exception as e:
             print(f"⚠️ 주제 리마인더 스케줄링 오류: {e}")
-    
-    return {
-        "success": True,
-        "whisper_message": whisper_message,
-        "next_topic": next_topic
-    }
 
 
 @router.get("/exchange-diary/today-topic")
@@ -0,0 +1,128 @@
+"""
+감정 점수 모듈
+메시지 텍스트의 키워드/이모지/표현을 바탕으로 0-100 감정 점수를 계산합니다.
+키워드 목록은 공용 키워드 사전(lexicon)에 등록하되, 점수 계산은 감정 키워드만 담은 전용 매처로 합니다.
+(전체 사전 스캔은 날씨/말투 키워드까지 훑고 캐시 잠금과 집합별 결과를 만들어, 메시지가 많을 때 더 느림)
+정규식은 모듈 로드 시 한 번만 컴파일합니다.
+"""
+
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from keyword_matcher import KeywordMatcher
+from lexicon import lexicon
+
+# 기본 중립 점수
+NEUTRAL_SCORE = 50
+
+# 강한 긍정 키워드
+STRONG_POSITIVE_KEYWORDS = [
+    '사랑', '행복', '기쁨', '설레', '두근', '사랑해', '좋아해',
+    '완전', '최고', '너무좋아', '진짜좋아', '대박', '신나', '즐거워'
+]
+
+# 일반 긍정 키워드
+POSITIVE_KEYWORDS = [
+    '좋아', '웃음', '미소', '떨려', '고마워', '감사', '축하', '응원',
+    '안심', '위로', '괜찮', '힘내', '잘될', '믿어', '기대', '소중',
+    '특별', '의미', '보고싶', '그리워', '기쁨', '평화', '편안', '즐거',
+    '재밌', '재미있', '멋져', '좋네', '좋구나', '좋다', '예쁘'
+]
+
+# 강한 부정 키워드
+STRONG_NEGATIVE_KEYWORDS = [
+    '힘들어', '너무힘들', '정말힘들', '죽겠', '못하겠', '우울', '슬퍼',
+    '아파', '외로워', '괴로워', '고통', '불안', '두려워', '무서워',
+    '최악', '싫어', '미워', '화나', '짜증'
+]
+
+# 일반 부정 키워드
+NEGATIVE_KEYWORDS = [
+    '힘들', '걱정', '답답', '서운', '실망', '후회', '아쉽', '미안',
+    '그만', '안돼', '못해', '어려워', '피곤', '지쳐', '지친',
+    '슬픔', '외로움', '불안함', '부담', '스트레스', '힘듦'
+]
+
+_STRONG_NEGATIVE = lexicon.register('emotion.strong_negative', STRONG_NEGATIVE_KEYWORDS)
+
+# (키워드 집합, 포함된 키워드마다 더하는 점수)
+_KEYWORD_GROUPS = (
+    (lexicon.register('emotion.strong_positive', STRONG_POSITIVE_KEYWORDS), 12),
+    (lexicon.register('emotion.positive', POSITIVE_KEYWORDS), 8),
+    (_STRONG_NEGATIVE, -12),
+    (lexicon.register('emotion.negative', NEGATIVE_KEYWORDS), -8),
+)
+
+
+def _keyword_weights() -> Dict[str, int]:
+    # 여러 목록에 있는 키워드는 목록마다 한 번씩 더해지도록 가중치를 합산
+    weights: Dict[str, int] = {}
+    for name, weight in _KEYWORD_GROUPS:
+        for keyword in lexicon.keywords(name):
+            weights[keyword] = weights.get(keyword, 0) + weight
+    return weights
+
+
+# 감정 키워드 전용 매처 (키워드 -> 포함 시 더하는 점수)
+_KEYWORD_WEIGHTS = _keyword_weights()
+_STRONG_NEGATIVE_SET = frozenset(lexicon.keywords(_STRONG_NEGATIVE))
+_keyword_matcher = KeywordMatcher(_KEYWORD_WEIGHTS)
+
+# 감탄사
+_EXCLAMATION_RE = re.compile(r'[!]{2,}')
+_QUESTION_RE = re.compile(r'[?]{2,}')
+_ELLIPSIS_RE = re.compile(r'\.{3,}')
+
+# 이모지 (문자 클래스 - '❤️', '☹️' 등의 변형 선택자 U+FE0F도 각각 한 글자로 셈)
+_POSITIVE_EMOJI_RE = re.compile(r'[😊😄😁😃😀😆😍🥰😘💕💖❤️💗🎉✨🌟😎🤗😌☺️🙂]')
+_NEGATIVE_EMOJI_RE = re.compile(r'[😢😭😔😞😟😕🙁☹️😣😖😫😩😤😠😡💔]')
+
+# 복합 표현
+_INTENSE_POSITIVE_RE = re.compile(r'(너무|정말|진짜|완전|엄청).{0,3}(좋아|행복|기쁨|설레|사랑)')
+_INTENSE_NEGATIVE_RE = re.compile(r'(너무|정말|진짜|완전|엄청).{0,3}(힘들|슬퍼|아파|외로|우울)')
+
+
+def _score(text: str) -> int:
+    found = _keyword_matcher.find_all(text)
+
+    # 키워드 점수 계산 (포함된 키워드마다 한 번)
+    score = NEUTRAL_SCORE + sum(_KEYWORD_WEIGHTS[keyword] for keyword in found)
+
+    # 감탄사
+    if _EXCLAMATION_RE.search(text) and found.isdisjoint(_STRONG_NEGATIVE_SET):
+        score += 5
+
+    if _QUESTION_RE.search(text) or _ELLIPSIS_RE.search(text):
+        score -= 5
+
+    # 이모지 처리
+    score += len(_POSITIVE_EMOJI_RE.findall(text)) * 10
+    score -= len(_NEGATIVE_EMOJI_RE.findall(text)) * 10
+
+    # 복합 표현
+    if _INTENSE_POSITIVE_RE.search(text):
+        score += 8
+
+    if _INTENSE_NEGATIVE_RE.search(text):
+        score -= 8
+
+    # 점수 범위 제한 (0-100)
+    return max(0, min(100, score))
+
+
+def calculate_emotion_score(text):
+    """메시지 텍스트에서 감정 점수 계산 (0-100)"""
+    if not text or not isinstance(text, str):
+        return NEUTRAL_SCORE  # 기본값: 중립
+    return _score(text)
+
+
+def calculate_emotion_scores(texts: Iterable) -> List[int]:
+    """여러 메시지의 감정 점수를 한 번에 계산"""
+    return [_score(text) if text and isinstance(text, str) else NEUTRAL_SCORE for text in texts]
+
+
+def sum_emotion_scores(texts: Iterable) -> Tuple[int, int]:
+    """여러 메시지의 감정 점수 (합계, 개수)"""
+    scores = calculate_emotion_scores(texts)
+    return sum(scores), len(scores)
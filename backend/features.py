@@ -11,12 +11,18 @@ from pydantic import BaseModel
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
+import asyncio
+import threading
 
-from database import get_db, User, ChatHistory, CharacterArchetype
+from database import get_db, release_connection, SessionLocal, User, ChatHistory, CharacterArchetype
+from chat_store import load_messages_bulk, count_messages_bulk
+from archetype_store import archetype_adjustments, personas_hash, load_archetype_snapshot, save_archetype_snapshot
 from auth import get_current_user, get_current_user_optional
 from config import model, SAFETY_SETTINGS
+from llm_gateway import generate_content_async
 from personas import CHARACTER_PERSONAS
 from ai_service import analyze_user_speech_style
+from lexicon import lexicon
 
 router = APIRouter(tags=["features"])
 
@@ -108,23 +114,28 @@ def search_character_info_online(character_name: str) -> str:
     except:
         return ""
 
+# 따뜻함 키워드
+_ARCHETYPE_WARMTH_POSITIVE = lexicon.register('archetype.warmth_positive', ['따뜻', '포근', '안아', '위로', '사랑', '좋아', '행복', '다정', '부드럽', '친근', '공감', '지지', '보호', '아끼', '소중'])
+_ARCHETYPE_WARMTH_NEGATIVE = lexicon.register('archetype.warmth_negative', ['차갑', '냉정', '거리', '거만', '무뚝뚝', '차분', '냉담', '무관심', '거부', '차단'])
+# 이상적 키워드
+_ARCHETYPE_IDEAL = lexicon.register('archetype.ideal', ['꿈', '희망', '이상', '미래', '상상', '낭만', '철학', '추상', '신비', '운명', '기적', '영원'])
+# 현실적 키워드
+_ARCHETYPE_REALISM = lexicon.register('archetype.realism', ['현실', '실용', '구체', '실제', '일상', '실질', '현재', '과거', '경험', '사실', '논리', '이성'])
+
+# 대화 기록 보정용 키워드
+_ARCHETYPE_CHAT_WARMTH = lexicon.register('archetype_chat.warmth', ['따뜻', '포근', '안아', '위로', '사랑', '좋아', '행복'])
+_ARCHETYPE_CHAT_REALISM = lexicon.register('archetype_chat.realism', ['현실', '실용', '구체', '실제', '일상'])
+_ARCHETYPE_CHAT_IDEAL = lexicon.register('archetype_chat.ideal', ['이상', '꿈', '희망', '미래', '상상'])
+
+
 def analyze_archetype_by_keywords(text: str) -> Tuple[float, float]:
     """키워드 기반 성향 분석 (폴백 방법)"""
-    text_lower = text.lower()
-    
-    # 따뜻함 키워드
-    warmth_positive = ['따뜻', '포근', '안아', '위로', '사랑', '좋아', '행복', '다정', '부드럽', '친근', '공감', '지지', '보호', '아끼', '소중']
-    warmth_negative = ['차갑', '냉정', '거리', '거만', '무뚝뚝', '차분', '냉담', '무관심', '거부', '차단']
+    scan = lexicon.scan(text.lower())
     
-    # 이상적 키워드
-    ideal_keywords = ['꿈', '희망', '이상', '미래', '상상', '낭만', '철학', '추상', '신비', '운명', '기적', '영원']
-    # 현실적 키워드
-    realism_keywords = ['현실', '실용', '구체', '실제', '일상', '실질', '현재', '과거', '경험', '사실', '논리', '이성']
-    
-    warmth_count = sum(1 for kw in warmth_positive if kw in text_lower)
-    warmth_neg_count = sum(1 for kw in warmth_negative if kw in text_lower)
-    ideal_count = sum(1 for kw in ideal_keywords if kw in text_lower)
-    realism_count = sum(1 for kw in realism_keywords if kw in text_lower)
+    warmth_count = scan.count(_ARCHETYPE_WARMTH_POSITIVE)
+    warmth_neg_count = scan.count(_ARCHETYPE_WARMTH_NEGATIVE)
+    ideal_count = scan.count(_ARCHETYPE_IDEAL)
+    realism_count = scan.count(_ARCHETYPE_REALISM)
     
     # 따뜻함 점수 계산
     total_warmth = warmth_count + warmth_neg_count
@@ -143,6 +154,24 @@ def analyze_archetype_by_keywords(text: str) -> Tuple[float, float]:
     
     return (warmth_score, realism_score)
 
+def persona_archetype_text(persona: dict) -> str:
+    """성향 분석에 쓰는 페르소나 텍스트 (description, style_guide, dialogue_examples의 캐릭터 대사)"""
+    all_texts = []
+    
+    if persona.get('description'):
+        all_texts.append(persona['description'])
+    
+    if persona.get('style_guide'):
+        all_texts.extend(persona['style_guide'])
+    
+    if persona.get('dialogue_examples'):
+        for example in persona['dialogue_examples']:
+            if isinstance(example, dict) and example.get('character'):
+                all_texts.append(example['character'])
+    
+    # 모든 대사를 하나의 텍스트로 합치기
+    return "\n".join(all_texts)
+
 def analyze_character_archetype_from_persona(char_id: str, persona: dict) -> Tuple[float, float]:
     """
     personas.py의 대사들과 인터넷 검색 정보를 종합하여 캐릭터의 성향 지도 위치를 정교하게 계산
@@ -168,26 +197,11 @@ def analyze_character_archetype_from_persona(char_id: str, persona: dict) -> Tup
         online_info = search_character_info_online(character_name)
         
         # 2. personas.py에서 가져온 대사들 수집
-        all_texts = []
-        
-        # 캐릭터 페르소나 데이터 수집 (description, style_guide, dialogue_examples)
-        if persona.get('description'):
-            all_texts.append(persona['description'])
+        combined_text = persona_archetype_text(persona)
         
-        if persona.get('style_guide'):
-            all_texts.extend(persona['style_guide'])
-        
-        if persona.get('dialogue_examples'):
-            for example in persona['dialogue_examples']:
-                if isinstance(example, dict) and example.get('character'):
-                    all_texts.append(example['character'])
-        
-        if not all_texts and not online_info:
+        if not combined_text and not online_info:
             return (0.5, 0.5)  # 기본값
         
-        # 모든 대사를 하나의 텍스트로 합치기
-        combined_text = "\n".join(all_texts)
-        
         # Gemini API를 사용하여 종합 분석
         prompt = f"""다음은 드라마 캐릭터 '{character_name}'에 대한 정보입니다.
 [인터넷 검색 정보]
@@ -262,72 +276,85 @@ realism: 0.35
 # 캐릭터 성향 데이터 캐시 (메모리)
 _character_archetype_cache = None
 
+# 하드코딩된 캐릭터 성향 (warmth, realism) - 계산보다 우선
+FIXED_ARCHETYPES = {
+    'sseuregi': (0.85, 0.35),  # 쓰레기 - 매우 따뜻하고 이상적
+    'yong_sik': (0.75, 0.2),  # 황용식
+    'kim_tan': (0.75, 0.15),  # 김탄 - 매우 따뜻하고 매우 이상적 (왼쪽 위쪽)
+}
+
+
+def _archetype_entry(char_id: str, name: str, warmth_score: float, realism_score: float) -> dict:
+    return {
+        "character_id": char_id,
+        "name": name,
+        "warmth": round(warmth_score, 2),
+        "realism": round(realism_score, 2)
+    }
+
+
+def _save_archetype_row(db: Session, existing: Optional[CharacterArchetype], char_id: str, name: str,
+                        warmth_score: float, realism_score: float):
+    """character_archetypes 행 저장 또는 업데이트 (commit은 호출한 쪽에서)"""
+    if existing:
+        existing.warmth = str(warmth_score)
+        existing.realism = str(realism_score)
+    else:
+        db.add(CharacterArchetype(
+            character_id=char_id,
+            name=name,
+            warmth=str(warmth_score),
+            realism=str(realism_score)
+        ))
+
+
 def initialize_archetype_cache(db: Session):
-    """서버 시작 시 모든 캐릭터의 성향을 미리 계산하여 캐시"""
+    """서버 시작 시 캐릭터 성향 데이터 캐시 준비 (LLM 호출 없이 바로 반환)
+
+    1. 페르소나 해시가 같은 스냅샷 파일이 있으면 그대로 사용합니다.
+    2. 없으면 DB에 저장된 값과 하드코딩된 값을 쓰고, DB에 없는 캐릭터는 키워드 기반 값으로 먼저 채웁니다.
+       그 캐릭터들은 백그라운드 스레드에서 Gemini로 다시 계산해 캐시를 갱신하고, 끝나면 스냅샷을 저장합니다.
+    """
     global _character_archetype_cache
     
     if _character_archetype_cache is not None:
         return _character_archetype_cache
     
+    personas_key = personas_hash(CHARACTER_PERSONAS)
+    snapshot = load_archetype_snapshot(personas_key)
+    if snapshot is not None:
+        _character_archetype_cache = snapshot
+        print(f"[성향 지도] 스냅샷에서 {len(snapshot)}개 캐릭터 성향 데이터 로드")
+        return snapshot
+    
     print("[성향 지도] 캐릭터 성향 데이터 초기화 중...")
+    stored = {row.character_id: row for row in db.query(CharacterArchetype).all()}
     archetype_data = []
+    pending = []
     
     for char_id, persona in CHARACTER_PERSONAS.items():
-        # 특정 캐릭터는 하드코딩된 값 사용 (우선순위)
-        if char_id == 'sseuregi':  # 쓰레기
-            warmth_score, realism_score = 0.85, 0.35  # 매우 따뜻하고 이상적
-        elif char_id == 'yong_sik':  # 황용식
-            warmth_score, realism_score = 0.75, 0.2
-        elif char_id == 'kim_tan':  # 김탄
-            warmth_score, realism_score = 0.75, 0.15  # 매우 따뜻하고 매우 이상적 (왼쪽 위쪽)
+        name = persona.get('name', char_id)
+        if char_id in FIXED_ARCHETYPES:
+            # 특정 캐릭터는 하드코딩된 값 사용 (우선순위) 및 DB 업데이트
+            warmth_score, realism_score = FIXED_ARCHETYPES[char_id]
+            _save_archetype_row(db, stored.get(char_id), char_id, name, warmth_score, realism_score)
+        elif char_id in stored:
+            # DB에 있으면 사용
+            cached = stored[char_id]
+            archetype_data.append({
+                "character_id": char_id,
+                "name": cached.name,
+                "warmth": float(cached.warmth),
+                "realism": float(cached.realism)
+            })
+            continue
         else:
-            # DB에서 먼저 확인
-            cached = db.query(CharacterArchetype).filter(CharacterArchetype.character_id == char_id).first()
-            
-            if cached:
-                # DB에 있으면 사용
-                archetype_data.append({
-                    "character_id": char_id,
-                    "name": cached.name,
-                    "warmth": float(cached.warmth),
-                    "realism": float(cached.realism)
-                })
-                continue
-            else:
-                # DB에 없으면 계산하고 저장
-                warmth_score, realism_score = analyze_character_archetype_from_persona(char_id, persona)
+            # DB에 없으면 키워드 기반 값으로 먼저 채우고 백그라운드에서 계산
+            persona_text = persona_archetype_text(persona)
+            warmth_score, realism_score = analyze_archetype_by_keywords(persona_text) if persona_text else (0.5, 0.5)
+            pending.append(char_id)
         
-        # 특정 캐릭터는 하드코딩된 값으로 DB 업데이트
-        if char_id in ['sseuregi', 'yong_sik', 'kim_tan']:
-            # DB에 저장 또는 업데이트
-            existing = db.query(CharacterArchetype).filter(CharacterArchetype.character_id == char_id).first()
-            if existing:
-                existing.warmth = str(warmth_score)
-                existing.realism = str(realism_score)
-            else:
-                archetype = CharacterArchetype(
-                    character_id=char_id,
-                    name=persona.get('name', char_id),
-                    warmth=str(warmth_score),
-                    realism=str(realism_score)
-                )
-                db.add(archetype)
-        elif char_id not in ['sseuregi', 'yong_sik']:
-            # DB에 저장
-            archetype = CharacterArchetype(
-                character_id=char_id,
-                name=persona.get('name', char_id),
-                warmth=str(warmth_score),
-                realism=str(realism_score)
-            )
-            db.add(archetype)
-            
-        archetype_data.append({
-            "character_id": char_id,
-            "name": persona.get('name', char_id),
-            "warmth": round(warmth_score, 2),
-            "realism": round(realism_score, 2)
-        })
+        archetype_data.append(_archetype_entry(char_id, name, warmth_score, realism_score))
     
     try:
         db.commit()
@@ -335,9 +362,95 @@ def initialize_archetype_cache(db: Session):
         db.rollback()
     
     _character_archetype_cache = archetype_data
-    print(f"[성향 지도] {len(archetype_data)}개 캐릭터 성향 데이터 초기화 완료")
+    print(f"[성향 지도] {len(archetype_data)}개 캐릭터 성향 데이터 초기화 완료 (백그라운드 계산 대기 {len(pending)}개)")
+    
+    if pending:
+        threading.Thread(
+            target=_warm_up_archetypes, args=(pending, personas_key), name="archetype-warmup", daemon=True
+        ).start()
+    else:
+        save_archetype_snapshot(personas_key, archetype_data)
     return archetype_data
 
+
+def _warm_up_archetypes(char_ids: List[str], personas_key: str):
+    """키워드 기반 값으로 채운 캐릭터를 Gemini로 다시 계산해 캐시를 제자리에서 갱신하고 스냅샷 저장"""
+    entries = {entry["character_id"]: entry for entry in _character_archetype_cache}
+    db = SessionLocal()
+    try:
+        for char_id in char_ids:
+            persona = CHARACTER_PERSONAS[char_id]
+            name = persona.get('name', char_id)
+            warmth_score, realism_score = analyze_character_archetype_from_persona(char_id, persona)
+            
+            existing = db.query(CharacterArchetype).filter(CharacterArchetype.character_id == char_id).first()
+            _save_archetype_row(db, existing, char_id, name, warmth_score, realism_score)
+            db.commit()
+            
+            entries[char_id].update(_archetype_entry(char_id, name, warmth_score, realism_score))
+        
+        save_archetype_snapshot(personas_key, _character_archetype_cache)
+        print(f"[성향 지도] 백그라운드 성향 계산 완료 ({len(char_ids)}개)")
+    except Exception as e:
+        db.rollback()
+        print(f"[성향 지도] 백그라운드 성향 계산 오류: {e}")
+    finally:
+        db.close()
+
+
+def compute_user_archetype_adjustments(user_id: int, db: Session) -> dict:
+    """사용자의 최근 대화 30개로 캐릭터별 성향 보정값 계산 ({캐릭터 ID: (warmth, realism)})
+
+    대화 목록 조회 한 번과 메시지 일괄 조회 한 번으로 모든 캐릭터의 메시지를 한 번에 분류합니다.
+    """
+    recent_chats = db.query(ChatHistory).filter(
+        ChatHistory.user_id == user_id
+    ).order_by(ChatHistory.created_at.desc()).limit(30).all()
+    
+    # 캐릭터별 [전체, 따뜻함, 현실적, 이상적] 메시지 수
+    counts = {}
+    messages_by_chat = load_messages_bulk(recent_chats, db)
+    for messages in messages_by_chat.values():
+        for msg in messages:
+            if not isinstance(msg, dict):
+                continue
+            char_id = msg.get('character_id')
+            if not char_id:
+                continue
+            scan = lexicon.scan((msg.get('text') or '').lower())
+            bucket = counts.setdefault(char_id, [0, 0, 0, 0])
+            bucket[0] += 1
+            if scan.has(_ARCHETYPE_CHAT_WARMTH):
+                bucket[1] += 1
+            if scan.has(_ARCHETYPE_CHAT_REALISM):
+                bucket[2] += 1
+            if scan.has(_ARCHETYPE_CHAT_IDEAL):
+                bucket[3] += 1
+    
+    adjustments = {}
+    for char_id, (total_count, warmth_count, realism_count, ideal_count) in counts.items():
+        if total_count <= 10:  # 충분한 데이터가 있을 때만 보정
+            continue
+        chat_warmth = min(1.0, warmth_count / max(1, total_count / 3))
+        if realism_count > ideal_count:
+            chat_realism = 0.7
+        elif ideal_count > realism_count:
+            chat_realism = 0.3
+        else:
+            chat_realism = 0.5
+        adjustments[char_id] = (chat_warmth, chat_realism)
+    return adjustments
+
+
+def get_user_archetype_adjustments(user_id: int, db: Session) -> dict:
+    """사용자별 성향 보정값 (대화 저장 시 무효화되는 캐시 사용)"""
+    adjustments = archetype_adjustments.get(user_id)
+    if adjustments is None:
+        adjustments = compute_user_archetype_adjustments(user_id, db)
+        archetype_adjustments.put(user_id, adjustments)
+    return adjustments
+
+
 @router.get("/archetype/map")
 @router.post("/archetype/map")
 def get_archetype_map(
@@ -410,50 +523,16 @@ def get_archetype_map(
             db.rollback()
         
         # 사용자와의 대화 기록이 있으면 약간 보정 (20% 가중치) - 실시간 보정만
-        for char_data in archetype_data:
-            char_id = char_data["character_id"]
-            if user_id:
-                recent_chats = db.query(ChatHistory).filter(
-                    ChatHistory.user_id == user_id
-                ).order_by(ChatHistory.created_at.desc()).limit(30).all()
-                
-                warmth_keywords = ['따뜻', '포근', '안아', '위로', '사랑', '좋아', '행복']
-                realism_keywords = ['현실', '실용', '구체', '실제', '일상']
-                ideal_keywords = ['이상', '꿈', '희망', '미래', '상상']
-                
-                warmth_count = 0
-                realism_count = 0
-                ideal_count = 0
-                total_count = 0
-                
-                for chat in recent_chats:
-                    try:
-                        messages = json.loads(chat.messages) if isinstance(chat.messages, str) else chat.messages
-                        for msg in messages:
-                            if isinstance(msg, dict) and msg.get('character_id') == char_id:
-                                text = msg.get('text', '').lower()
-                                total_count += 1
-                                if any(k in text for k in warmth_keywords):
-                                    warmth_count += 1
-                                if any(k in text for k in realism_keywords):
-                                    realism_count += 1
-                                if any(k in text for k in ideal_keywords):
-                                    ideal_count += 1
-                    except:
-                        continue
-                
-                if total_count > 10:  # 충분한 데이터가 있을 때만 보정
-                    chat_warmth = min(1.0, warmth_count / max(1, total_count / 3))
-                    if realism_count > ideal_count:
-                        chat_realism = 0.7
-                    elif ideal_count > realism_count:
-                        chat_realism = 0.3
-                    else:
-                        chat_realism = 0.5
-                    
-                    # 80% 기본 성향 + 20% 대화 기록
-                    char_data["warmth"] = round(char_data["warmth"] * 0.8 + chat_warmth * 0.2, 2)
-                    char_data["realism"] = round(char_data["realism"] * 0.8 + chat_realism * 0.2, 2)
+        if user_id:
+            adjustments = get_user_archetype_adjustments(user_id, db)
+            for char_data in archetype_data:
+                adjustment = adjustments.get(char_data["character_id"])
+                if adjustment is None:
+                    continue
+                chat_warmth, chat_realism = adjustment
+                # 80% 기본 성향 + 20% 대화 기록
+                char_data["warmth"] = round(char_data["warmth"] * 0.8 + chat_warmth * 0.2, 2)
+                char_data["realism"] = round(char_data["realism"] * 0.8 + chat_realism * 0.2, 2)
         
         # 반환 형식 변환 (warmth, realism을 x, y로 매핑)
         characters = []
@@ -518,6 +597,27 @@ def get_music_playlist():
     return {"songs": MUSIC_PLAYLIST}
 
 
+# 감정 키워드 매핑 (기분 -> 키워드 집합)
+_MOOD_KEYWORD_SETS = lexicon.register_many('mood', {
+    '우울': ['우울', '슬퍼', '울어', '눈물', '힘들', '지침', '피곤', '무기력'],
+    '위로': ['위로', '힘내', '괜찮', '안심', '걱정', '고민'],
+    '불면증': ['불면', '잠못', '잠안', '밤새', '수면'],
+    '한숨': ['한숨', '답답', '답답해', '답답함'],
+    '걱정': ['걱정', '걱정돼', '걱정되', '불안', '불안해'],
+    '응원': ['응원', '힘내', '화이팅', '파이팅', '할수있', '할 수 있'],
+    '희망': ['희망', '기대', '기대돼', '기대되', '좋아질', '좋아질거'],
+    '그리움': ['그리워', '그리움', '보고싶', '보고 싶', '사랑', '좋아'],
+    '청춘': ['청춘', '젊음', '추억', '회상', '옛날'],
+    '막막함': ['막막', '막막해', '막막함', '불안', '걱정'],
+    '설렘': ['설레', '설렘', '떨려', '두근', '두근거려'],
+    '행복': ['행복', '기쁘', '좋아', '즐거', '신나'],
+    '용기': ['용기', '도전', '시도', '해볼', '도전해'],
+    '현실': ['현실', '현실적', '어른', '성숙', '이해'],
+    '고독': ['고독', '외로', '혼자', '외로워'],
+    '사랑': ['사랑', '좋아', '좋아해', '사랑해', '따뜻']
+})
+
+
 def analyze_user_mood_from_chat(user_id: int, db: Session) -> List[str]:
     """사용자의 최근 대화 기록을 분석하여 기분/감정을 추출"""
     try:
@@ -535,9 +635,10 @@ def analyze_user_mood_from_chat(user_id: int, db: Session) -> List[str]:
         
         # 모든 사용자 메시지 수집
         all_user_texts = []
+        messages_by_chat = load_messages_bulk(histories, db)
         for history in histories:
             try:
-                messages = json.loads(history.messages) if isinstance(history.messages, str) else history.messages
+                messages = messages_by_chat.get(history.id, [])
                 if not messages or not isinstance(messages, list):
                     continue
                 
@@ -552,29 +653,10 @@ def analyze_user_mood_from_chat(user_id: int, db: Session) -> List[str]:
         
         combined_text = ' '.join(all_user_texts)
         
-        # 감정 키워드 매핑
-        mood_keywords = {
-            '우울': ['우울', '슬퍼', '울어', '눈물', '힘들', '지침', '피곤', '무기력'],
-            '위로': ['위로', '힘내', '괜찮', '안심', '걱정', '고민'],
-            '불면증': ['불면', '잠못', '잠안', '밤새', '수면'],
-            '한숨': ['한숨', '답답', '답답해', '답답함'],
-            '걱정': ['걱정', '걱정돼', '걱정되', '불안', '불안해'],
-            '응원': ['응원', '힘내', '화이팅', '파이팅', '할수있', '할 수 있'],
-            '희망': ['희망', '기대', '기대돼', '기대되', '좋아질', '좋아질거'],
-            '그리움': ['그리워', '그리움', '보고싶', '보고 싶', '사랑', '좋아'],
-            '청춘': ['청춘', '젊음', '추억', '회상', '옛날'],
-            '막막함': ['막막', '막막해', '막막함', '불안', '걱정'],
-            '설렘': ['설레', '설렘', '떨려', '두근', '두근거려'],
-            '행복': ['행복', '기쁘', '좋아', '즐거', '신나'],
-            '용기': ['용기', '도전', '시도', '해볼', '도전해'],
-            '현실': ['현실', '현실적', '어른', '성숙', '이해'],
-            '고독': ['고독', '외로', '혼자', '외로워'],
-            '사랑': ['사랑', '좋아', '좋아해', '사랑해', '따뜻']
-        }
-        
+        mood_scan = lexicon.scan(combined_text)
         mood_scores = {}
-        for mood, keywords in mood_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in combined_text)
+        for mood, keyword_set in _MOOD_KEYWORD_SETS.items():
+            score = mood_scan.count(keyword_set)
             if score > 0:
                 mood_scores[mood] = score
         
@@ -589,8 +671,46 @@ def analyze_user_mood_from_chat(user_id: int, db: Session) -> List[str]:
         return []
 
 
+def _music_recommendation_inputs(user_id: int, request_moods: list, db: Session) -> Tuple[list, dict, list]:
+    """(추천에 쓸 기분, 캐릭터별 대화 메시지 수, 대화에서 분석한 기분) 반환"""
+    # 사용자의 기분 분석 (요청된 감정이 없으면)
+    detected_moods = []
+    if not request_moods or len(request_moods) == 0:
+        detected_moods = analyze_user_mood_from_chat(user_id, db)
+    
+    moods_to_use = request_moods if request_moods else detected_moods
+    
+    # 모든 캐릭터와의 대화 수 계산
+    histories = db.query(ChatHistory).filter(
+        ChatHistory.user_id == user_id,
+        ChatHistory.is_manual == 1
+    ).all()
+    
+    character_message_counts = {}
+    message_counts = count_messages_bulk(histories, db)
+    
+    for history in histories:
+        try:
+            history_character_ids = json.loads(history.character_ids) if isinstance(history.character_ids, str) else history.character_ids
+            
+            if not history_character_ids or not isinstance(history_character_ids, list):
+                continue
+            
+            message_count = message_counts.get(history.id, 0)
+            
+            for char_id in history_character_ids:
+                if char_id not in character_message_counts:
+                    character_message_counts[char_id] = 0
+                character_message_counts[char_id] += message_count
+        except Exception:
+            continue
+    
+    release_connection(db)
+    return moods_to_use, character_message_counts, detected_moods
+
+
 @router.post("/music/character-recommend")
-def get_character_music_recommendation(
+async def get_character_music_recommendation(
     request: dict,
     current_user: Optional[User] = Depends(get_current_user_optional),
     db: Session = Depends(get_db)
@@ -613,37 +733,10 @@ def get_character_music_recommendation(
                 "comment": None
             }
         
-        # 사용자의 기분 분석 (요청된 감정이 없으면)
-        detected_moods = []
-        if not request_moods or len(request_moods) == 0:
-            detected_moods = analyze_user_mood_from_chat(user_id, db)
-        
-        moods_to_use = request_moods if request_moods else detected_moods
-        
-        # 모든 캐릭터와의 대화 수 계산
-        histories = db.query(ChatHistory).filter(
-            ChatHistory.user_id == user_id,
-            ChatHistory.is_manual == 1
-        ).all()
-        
-        character_message_counts = {}
-        
-        for history in histories:
-            try:
-                history_character_ids = json.loads(history.character_ids) if isinstance(history.character_ids, str) else history.character_ids
-                messages = json.loads(history.messages) if isinstance(history.messages, str) else history.messages
-                
-                if not history_character_ids or not isinstance(history_character_ids, list):
-                    continue
-                
-                message_count = len(messages) if messages and isinstance(messages, list) else 0
-                
-                for char_id in history_character_ids:
-                    if char_id not in character_message_counts:
-                        character_message_counts[char_id] = 0
-                    character_message_counts[char_id] += message_count
-            except Exception:
-                continue
+        # 기분 분석과 캐릭터별 대화 수 계산은 DB 작업이므로 스레드에서 실행
+        moods_to_use, character_message_counts, detected_moods = await asyncio.to_thread(
+            _music_recommendation_inputs, user_id, request_moods, db
+        )
         
         if not character_message_counts:
             recommended_song = random.choice(MUSIC_PLAYLIST)
@@ -700,7 +793,7 @@ def get_character_music_recommendation(
 
 코멘트:"""
                 
-                response = model.generate_content(prompt, safety_settings=SAFETY_SETTINGS)
+                response = await generate_content_async(model, prompt, safety_settings=SAFETY_SETTINGS)
                 comment = response.text.strip()
                 comment = comment.replace(f"{character_name}:", "").replace('"', '').replace("'", "").strip()
                 
@@ -734,6 +827,14 @@ def get_character_music_recommendation(
 # 심리 리포트
 # ===========================================
 
+# 심리 리포트 감정 키워드 - 중요 지침 반영
+_REPORT_EMOTION_KEYWORD_SETS = lexicon.register_many('report', {
+    'romance': ['사랑', '좋아', '설레', '두근', '행복', '기쁨', '떨려', '심쿵', '설렘'],
+    'comfort': ['힘들', '슬퍼', '위로', '괜찮', '걱정', '불안', '외로워', '울적', '지침'],
+    'conflict': ['화나', '짜증', '답답', '싫어', '미워', '스트레스', '피곤', '짜증나']
+})
+
+
 @router.post("/psychology/report")
 def generate_psychology_report(
     request: dict,
@@ -765,23 +866,15 @@ def generate_psychology_report(
         speech_style = analyze_user_speech_style(chat_history_for_analysis)
         
         # 감정 키워드 분석 - 중요 지침 반영
-        emotion_keywords = {
-            'romance': ['사랑', '좋아', '설레', '두근', '행복', '기쁨', '떨려', '심쿵', '설렘'],
-            'comfort': ['힘들', '슬퍼', '위로', '괜찮', '걱정', '불안', '외로워', '울적', '지침'],
-            'conflict': ['화나', '짜증', '답답', '싫어', '미워', '스트레스', '피곤', '짜증나']
-        }
-        
         keyword_counts = {}
         emotion_scores = {'romance': 0, 'comfort': 0, 'conflict': 0}
         
-        all_text = ' '.join(user_messages)
+        report_scan = lexicon.scan(' '.join(user_messages))
         
-        for emotion, keywords in emotion_keywords.items():
-            for keyword in keywords:
-                count = all_text.count(keyword)
-                if count > 0:
-                    keyword_counts[keyword] = keyword_counts.get(keyword, 0) + count
-                    emotion_scores[emotion] += count
+        for emotion, keyword_set in _REPORT_EMOTION_KEYWORD_SETS.items():
+            for keyword, count in report_scan.occurrences(keyword_set).items():
+                keyword_counts[keyword] = keyword_counts.get(keyword, 0) + count
+                emotion_scores[emotion] += count
         
         # 주요 감정 결정
         dominant_mood = max(emotion_scores.items(), key=lambda x: x[1])[0] if max(emotion_scores.values()) > 0 else 'neutral'
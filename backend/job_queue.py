@@ -0,0 +1,329 @@
+"""
+예약 작업 큐 모듈
+교환일기 답장, 주제 리마인더처럼 나중에 실행할 작업을 scheduled_jobs 테이블에 저장합니다.
+- 재시작해도 예약된 작업이 사라지지 않습니다.
+- 각 프로세스의 디스패처가 실행 시각이 된 작업을 배치로 임대(lease)해서 실행합니다.
+  PostgreSQL은 SELECT ... FOR UPDATE SKIP LOCKED, SQLite는 조건부 UPDATE 한 번으로 가져가므로
+  워커가 여러 개여도 한 작업은 한 프로세스만 실행합니다.
+- 임대 시간 안에 끝나지 않은 작업(프로세스 종료 등)은 임대가 만료되면 다시 실행됩니다.
+- 작업은 앱 이벤트 루프에서 최대 JOB_WORKER_CONCURRENCY개까지 동시에 실행되며,
+  빈 자리만큼만 가져가므로 나중에 등록된 우선순위 높은 작업이 큰 배치 뒤에 밀리지 않습니다.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import inspect
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, ScheduledJob
+
+# 실행할 작업을 확인하는 간격 (초)
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", "5"))
+# 한 번에 가져가는 작업 수
+JOB_BATCH_SIZE = int(os.environ.get("JOB_BATCH_SIZE", "10"))
+# 작업 임대 시간 (초) - 이 안에 끝나지 않으면 다른 디스패처가 다시 가져감
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "600"))
+# 동시에 실행하는 작업 수 (LLM 호출이 긴 답장 생성이 대부분)
+JOB_WORKER_CONCURRENCY = int(os.environ.get("JOB_WORKER_CONCURRENCY", "4"))
+# 실패 시 최대 시도 횟수 / 재시도 대기 (초)
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_DELAY_SECONDS = 60
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# 작업 종류 -> 핸들러 (payload dict와 시도 횟수를 받는 함수 또는 코루틴 함수)
+_handlers: Dict[str, Callable] = {}
+
+
+class RetryJob(Exception):
+    """핸들러가 지금은 실행할 수 없을 때 (요청 한도 초과 등) delay초 뒤 다시 실행하도록 요청"""
+
+    def __init__(self, delay: float, reason: str = "retry requested"):
+        super().__init__(reason)
+        self.delay = delay
+
+
+def job_handler(kind: str):
+    """작업 종류의 핸들러 등록 데코레이터"""
+    def decorator(func: Callable) -> Callable:
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+# ===========================================
+# 등록 / 취소
+# ===========================================
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    run_at: Optional[datetime] = None,
+    key: Optional[str] = None,
+    priority: int = 0
+) -> ScheduledJob:
+    """작업 등록 후 커밋 (run_at은 UTC, 없으면 즉시)
+
+    key가 같은 작업이 있으면 새로 만들지 않고 그 작업을 다시 예약합니다.
+    """
+    if run_at is None:
+        run_at = datetime.utcnow()
+    elif run_at.tzinfo is not None:
+        run_at = run_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    job = None
+    if key is not None:
+        job = db.query(ScheduledJob).filter(ScheduledJob.job_key == key).first()
+    if job is None:
+        job = ScheduledJob(kind=kind, job_key=key)
+        db.add(job)
+
+    job.payload = json.dumps(payload or {}, ensure_ascii=False)
+    job.priority = priority
+    job.run_at = run_at
+    job.status = JOB_PENDING
+    job.attempts = 0
+    job.lease_token = None
+    job.leased_until = None
+    job.last_error = None
+    db.commit()
+
+    dispatcher.notify()
+    return job
+
+
+def cancel_job(db: Session, key: str) -> bool:
+    """아직 실행되지 않은 작업 취소 후 커밋 (취소했으면 True)"""
+    deleted = db.query(ScheduledJob).filter(
+        ScheduledJob.job_key == key,
+        ScheduledJob.status == JOB_PENDING
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
+
+
+def has_active_job(db: Session, key: str) -> bool:
+    """대기 중이거나 실행 중인 작업이 있는지"""
+    return db.query(ScheduledJob.id).filter(
+        ScheduledJob.job_key == key,
+        ScheduledJob.status.in_([JOB_PENDING, JOB_RUNNING])
+    ).first() is not None
+
+
+# ===========================================
+# 임대 / 완료
+# ===========================================
+
+def _due_filter(now: datetime):
+    """실행할 작업: 실행 시각이 된 대기 작업 + 임대가 만료된 실행 중 작업"""
+    return or_(
+        and_(ScheduledJob.status == JOB_PENDING, ScheduledJob.run_at <= now),
+        and_(ScheduledJob.status == JOB_RUNNING, ScheduledJob.leased_until < now),
+    )
+
+
+def claim_due_jobs(db: Session, limit: int = JOB_BATCH_SIZE) -> List[ScheduledJob]:
+    """실행 시각이 된 작업을 최대 limit개 임대해서 반환"""
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+
+    candidates = db.query(ScheduledJob.id).filter(
+        _due_filter(now)
+    ).order_by(ScheduledJob.priority, ScheduledJob.run_at).limit(limit)
+    if db.bind.dialect.name == "postgresql":
+        # 다른 디스패처가 잠근 행은 건너뜀
+        candidates = candidates.with_for_update(skip_locked=True)
+    ids = [row.id for row in candidates.all()]
+    if not ids:
+        db.rollback()
+        return []
+
+    # 조건을 다시 걸어 갱신하므로, 그 사이 다른 프로세스가 가져간 작업은 제외됨 (SQLite)
+    db.query(ScheduledJob).filter(
+        ScheduledJob.id.in_(ids),
+        _due_filter(now)
+    ).update({
+        ScheduledJob.status: JOB_RUNNING,
+        ScheduledJob.lease_token: token,
+        ScheduledJob.leased_until: now + timedelta(seconds=JOB_LEASE_SECONDS),
+        ScheduledJob.attempts: ScheduledJob.attempts + 1,
+    }, synchronize_session=False)
+    db.commit()
+
+    return db.query(ScheduledJob).filter(
+        ScheduledJob.lease_token == token
+    ).order_by(ScheduledJob.priority, ScheduledJob.run_at).all()
+
+
+def _finish_job(job_id: int, token: str, error: Optional[str] = None, retry_delay: Optional[float] = None):
+    """임대한 작업을 완료/실패로 기록 (임대를 잃은 경우 무시)"""
+    db = SessionLocal()
+    try:
+        job = db.query(ScheduledJob).filter(
+            ScheduledJob.id == job_id,
+            ScheduledJob.lease_token == token
+        ).first()
+        if job is None:
+            return
+        job.lease_token = None
+        job.leased_until = None
+        if error is None:
+            job.status = JOB_DONE
+            job.last_error = None
+        elif (job.attempts or 0) < JOB_MAX_ATTEMPTS:
+            if retry_delay is None:
+                retry_delay = JOB_RETRY_DELAY_SECONDS * job.attempts
+            job.status = JOB_PENDING
+            job.run_at = datetime.utcnow() + timedelta(seconds=retry_delay)
+            job.last_error = error
+        else:
+            job.status = JOB_FAILED
+            job.last_error = error
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_job(job_id: int, kind: str, payload: str, token: str, attempt: int):
+    """임대한 작업 하나 실행 (동기 핸들러와 DB 기록은 스레드에서 실행)"""
+    handler = _handlers.get(kind)
+    if handler is None:
+        await asyncio.to_thread(_finish_job, job_id, token, f"unknown job kind: {kind}")
+        return
+    try:
+        args = (json.loads(payload or "{}"), attempt)
+        if inspect.iscoroutinefunction(handler):
+            await handler(*args)
+        else:
+            result = await asyncio.to_thread(handler, *args)
+            if inspect.isawaitable(result):
+                await result
+    except RetryJob as e:
+        print(f"[작업 큐] {kind} #{job_id} {e.delay:.0f}초 뒤 다시 실행: {e}")
+        await asyncio.to_thread(_finish_job, job_id, token, str(e), e.delay)
+        return
+    except Exception as e:
+        print(f"[작업 큐] {kind} #{job_id} 실패: {e}")
+        await asyncio.to_thread(_finish_job, job_id, token, str(e))
+        return
+    await asyncio.to_thread(_finish_job, job_id, token)
+
+
+# ===========================================
+# 디스패처 / 워커 풀
+# ===========================================
+
+def _claim_jobs(limit: int) -> List[tuple]:
+    """작업을 임대해서 (id, 종류, payload, 임대 토큰, 시도 횟수) 목록으로 반환 (스레드에서 실행)"""
+    db = SessionLocal()
+    try:
+        return [
+            (job.id, job.kind, job.payload, job.lease_token, job.attempts or 1)
+            for job in claim_due_jobs(db, limit)
+        ]
+    except Exception as e:
+        print(f"[작업 큐] 작업 조회 실패: {e}")
+        db.rollback()
+        return []
+    finally:
+        db.close()
+
+
+class JobDispatcher:
+    """실행 시각이 된 작업을 임대해서 앱 이벤트 루프에서 실행하는 백그라운드 태스크 (프로세스당 하나)
+
+    LLM 클라이언트(grpc_asyncio)는 처음 사용한 이벤트 루프에 묶이므로 작업도 앱 루프에서 실행합니다.
+    동기 DB 작업(임대, 완료 기록)만 스레드에서 실행합니다.
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = JOB_POLL_INTERVAL_SECONDS,
+        batch_size: int = JOB_BATCH_SIZE,
+        concurrency: int = JOB_WORKER_CONCURRENCY
+    ):
+        self._poll_interval = poll_interval
+        self._batch_size = batch_size
+        self._concurrency = max(1, concurrency)
+        self._active = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._workers: Set[asyncio.Task] = set()
+
+    def start(self):
+        """앱 이벤트 루프에서 디스패처 태스크 시작 (startup 이벤트에서 호출)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run(), name="job-dispatcher")
+
+    async def stop(self):
+        """디스패처와 실행 중인 작업 취소 (취소된 작업은 임대 만료 후 다시 실행됨)"""
+        tasks = list(self._workers)
+        if self._task is not None:
+            tasks.append(self._task)
+        self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop = None
+
+    def notify(self):
+        """새 작업이 등록되었거나 워커 자리가 비었음을 알림 (바로 다시 확인, 다른 스레드에서도 호출 가능)"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wakeup.set()
+        else:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            # 가져간 작업이 없거나 워커가 모두 차 있으면 알림/폴링 간격까지 대기
+            if await self.dispatch_once() == 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def dispatch_once(self) -> int:
+        """빈 워커 수만큼 작업을 임대해서 실행 태스크로 넘기고 가져간 작업 수 반환"""
+        slots = min(self._batch_size, self._concurrency - self._active)
+        if slots <= 0:
+            return 0
+
+        jobs = await asyncio.to_thread(_claim_jobs, slots)
+        for job in jobs:
+            self._active += 1
+            task = asyncio.get_running_loop().create_task(self._execute(job))
+            self._workers.add(task)
+            task.add_done_callback(self._workers.discard)
+        return len(jobs)
+
+    async def _execute(self, job):
+        try:
+            await run_job(*job)
+        finally:
+            self._active -= 1
+            self.notify()
+
+
+dispatcher = JobDispatcher()
@@ -0,0 +1,269 @@
+"""
+LLM JSON 응답 파서 모듈
+멀티 캐릭터/토론 응답({"response_A": "...", "response_B": "..."})을 청크 단위로 읽으면서
+문자열 필드가 닫히는 즉시 꺼냅니다. json.loads가 실패하는 응답도 최대한 복구합니다.
+- 코드 블록(```json), 앞뒤 설명 문장, // 및 /* */ 주석, 빠진/남는 쉼표를 무시
+- 값 안의 이스케이프되지 않은 줄바꿈과 따옴표(뒤에 , } ] " 가 오지 않는 따옴표)는 값의 일부로 취급
+- 응답이 중간에 끊기면 마지막 필드의 받은 부분까지 복구
+파싱 결과(정상/복구/실패)는 출처별로 집계해 /health에서 확인할 수 있습니다.
+"""
+
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 멀티 캐릭터/토론 응답의 캐릭터별 필드
+RESPONSE_FIELDS = ("response_A", "response_B")
+
+PARSE_OK = "ok"
+PARSE_RECOVERED = "recovered"
+PARSE_FAILED = "failed"
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+# 파서 상태
+_SEEK_KEY = 0         # 키(따옴표 문자열)를 찾는 중
+_IN_KEY = 1           # 키 문자열 안
+_SEEK_COLON = 2       # 키 뒤의 ':'를 찾는 중
+_SEEK_VALUE = 3       # ':' 뒤의 값 시작을 찾는 중
+_IN_VALUE = 4         # 문자열 값 안
+_VALUE_QUOTE = 5      # 값 안에서 따옴표를 만남 - 닫는 따옴표인지 뒤 문자로 판단
+_LINE_COMMENT = 6     # // 주석
+_BLOCK_COMMENT = 7    # /* */ 주석
+
+
+class ResponseFieldParser:
+    """응답 텍스트를 feed()로 조금씩 넣으면 완성된 문자열 필드를 (키, 값)으로 돌려주는 관대한 파서"""
+
+    def __init__(self, fields: Iterable[str] = RESPONSE_FIELDS):
+        self.fields = tuple(fields)
+        self.values: Dict[str, str] = {}
+        self.partial = False
+        self._raw: List[str] = []
+        self._state = _SEEK_KEY
+        self._comment_return = _SEEK_KEY
+        self._slash = False
+        self._key: List[str] = []
+        self._value: List[str] = []
+        self._pending_ws: List[str] = []
+        self._escape: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """청크를 읽고 이번 청크에서 닫힌 대상 필드 목록 반환"""
+        self._raw.append(chunk)
+        completed = []
+        for ch in chunk:
+            field = self._step(ch)
+            if field is not None:
+                completed.append(field)
+        return completed
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """입력 끝 처리 - 닫히지 않은 마지막 필드를 복구해서 반환"""
+        completed = []
+        if self._state == _VALUE_QUOTE:
+            field = self._close_value()
+            if field is not None:
+                completed.append(field)
+        elif self._state == _IN_VALUE:
+            if self._escape is not None:
+                self._value.append(self._escape)
+            self.partial = True
+            field = self._close_value()
+            if field is not None:
+                completed.append(field)
+        self._state = _SEEK_KEY
+        return completed
+
+    @property
+    def raw_text(self) -> str:
+        return "".join(self._raw)
+
+    def result(self) -> Dict[str, str]:
+        """대상 필드 중 찾은 값"""
+        return {field: self.values[field] for field in self.fields if field in self.values}
+
+    def status(self) -> str:
+        """정상(json.loads로 읽히는 응답) / 복구(일부라도 찾음) / 실패"""
+        found = self.result()
+        if not found:
+            return PARSE_FAILED
+        if self.partial or len(found) < len(self.fields):
+            return PARSE_RECOVERED
+        text = _strip_code_fence(self.raw_text)
+        start, end = text.find('{'), text.rfind('}')
+        try:
+            json.loads(text[start:end + 1] if start != -1 and end > start else text)
+        except ValueError:
+            return PARSE_RECOVERED
+        return PARSE_OK
+
+    # ---------------------------------------
+    # 내부 상태 전이
+    # ---------------------------------------
+
+    def _step(self, ch: str) -> Optional[Tuple[str, str]]:
+        state = self._state
+
+        if state == _IN_VALUE:
+            self._read_string_char(ch, self._value, value=True)
+            return None
+        if state == _IN_KEY:
+            if self._read_string_char(ch, self._key, value=False):
+                self._state = _SEEK_COLON
+            return None
+        if state == _VALUE_QUOTE:
+            if ch.isspace():
+                self._pending_ws.append(ch)
+                return None
+            if ch in ',}]"':
+                field = self._close_value()
+                if ch == '"':
+                    # 쉼표 없이 다음 키가 이어진 경우
+                    self._key = []
+                    self._state = _IN_KEY
+                return field
+            # 닫는 따옴표가 아니라 값 안의 따옴표였음
+            self._value.append('"')
+            self._value.extend(self._pending_ws)
+            self._pending_ws = []
+            self._state = _IN_VALUE
+            self._read_string_char(ch, self._value, value=True)
+            return None
+        if state == _LINE_COMMENT:
+            if ch == '\n':
+                self._state = self._comment_return
+            return None
+        if state == _BLOCK_COMMENT:
+            if self._slash and ch == '/':
+                self._state = self._comment_return
+            self._slash = ch == '*'
+            return None
+
+        # 문자열 밖: 주석 건너뛰기
+        if self._slash:
+            self._slash = False
+            if ch == '/':
+                self._comment_return, self._state = state, _LINE_COMMENT
+                return None
+            if ch == '*':
+                self._comment_return, self._state = state, _BLOCK_COMMENT
+                return None
+        if ch == '/':
+            self._slash = True
+            return None
+
+        if state == _SEEK_COLON:
+            if ch == ':':
+                self._state = _SEEK_VALUE
+            elif ch == '"':
+                # 값이 없는 문자열이었음 - 새 키로 다시 시작
+                self._key = []
+                self._state = _IN_KEY
+            elif not ch.isspace():
+                self._state = _SEEK_KEY
+        elif state == _SEEK_VALUE:
+            if ch == '"':
+                self._value = []
+                self._state = _IN_VALUE
+            elif not ch.isspace():
+                # 문자열이 아닌 값 (숫자, 객체 등) - 안쪽의 키는 계속 찾음
+                self._state = _SEEK_KEY
+        elif ch == '"':
+            self._key = []
+            self._state = _IN_KEY
+        return None
+
+    def _read_string_char(self, ch: str, buffer: List[str], value: bool) -> bool:
+        """문자열 안의 문자 하나 처리 (닫는 따옴표를 만나면 True)"""
+        if self._escape is not None:
+            self._escape += ch
+            if self._escape.startswith('\\u') and len(self._escape) < 6:
+                return False
+            buffer.append(_decode_escape(self._escape))
+            self._escape = None
+            return False
+        if ch == '\\':
+            self._escape = '\\'
+            return False
+        if ch == '"':
+            if not value:
+                return True
+            self._pending_ws = []
+            self._state = _VALUE_QUOTE
+            return False
+        buffer.append(ch)
+        return False
+
+    def _close_value(self) -> Optional[Tuple[str, str]]:
+        key = "".join(self._key)
+        # \uD83D\uDE00 같은 서로게이트 쌍을 한 문자로 합침
+        value = "".join(self._value).encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+        self._key, self._value, self._pending_ws, self._escape = [], [], [], None
+        self._state = _SEEK_KEY
+        if key not in self.fields or key in self.values:
+            return None
+        self.values[key] = value
+        return key, value
+
+
+def _decode_escape(escape: str) -> str:
+    """\\n, \\uXXXX 같은 이스케이프를 문자로 (알 수 없는 이스케이프는 문자 그대로)"""
+    if escape.startswith('\\u'):
+        try:
+            return chr(int(escape[2:], 16))
+        except ValueError:
+            return escape[1:]
+    return _ESCAPES.get(escape[1], escape[1])
+
+
+def _strip_code_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+# ===========================================
+# 파싱 결과 집계
+# ===========================================
+
+class JsonParseMetrics:
+    """출처별 파싱 결과(정상/복구/실패) 카운터"""
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, source: str, status: str):
+        with self._lock:
+            counts = self._counts.setdefault(source, {PARSE_OK: 0, PARSE_RECOVERED: 0, PARSE_FAILED: 0})
+            counts[status] = counts.get(status, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {source: dict(counts) for source, counts in self._counts.items()}
+
+
+json_parse_metrics = JsonParseMetrics()
+
+
+def parse_response_fields(text: Optional[str], source: str, fields: Iterable[str] = RESPONSE_FIELDS) -> Dict[str, str]:
+    """완성된 응답 텍스트에서 필드 값 추출 후 결과 집계 (찾은 필드만 반환)"""
+    parser = ResponseFieldParser(fields)
+    parser.feed(text or "")
+    parser.finish()
+    record_parse_result(parser, source)
+    return parser.result()
+
+
+def record_parse_result(parser: ResponseFieldParser, source: str):
+    """파서 결과를 집계하고 정상이 아니면 원본 일부를 로그로 남김"""
+    status = parser.status()
+    json_parse_metrics.record(source, status)
+    if status != PARSE_OK:
+        print(f"⚠️ [{source}] JSON 응답 {status}: 찾은 필드 {list(parser.result())}, 원본: {parser.raw_text[:200]}")
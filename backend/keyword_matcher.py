@@ -0,0 +1,90 @@
+"""
+키워드 매칭 모듈
+여러 키워드를 Aho-Corasick 오토마톤으로 한 번에 컴파일해 두고,
+텍스트를 한 번만 훑어서 포함된 키워드를 모두 찾습니다.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class KeywordMatcher:
+    """Aho-Corasick 기반 다중 키워드 매처"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(dict.fromkeys(k for k in keywords if k))
+        # 상태별 전이, 실패 링크, 출력(해당 상태에서 끝나는 키워드 목록)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        self._build()
+
+    def _build(self):
+        for keyword in self.keywords:
+            state = 0
+            for ch in keyword:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][ch] = next_state
+                state = next_state
+            self._output[state].append(keyword)
+
+        # BFS로 실패 링크 계산
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0) if self._goto[fail].get(ch, 0) != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> Set[str]:
+        """텍스트에 포함된 키워드 집합"""
+        found: Set[str] = set()
+        if not text:
+            return found
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def count_all(self, text: str) -> Dict[str, int]:
+        """텍스트에 포함된 키워드별 등장 횟수 (겹치는 등장 포함)"""
+        counts: Dict[str, int] = {}
+        if not text:
+            return counts
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword in output[state]:
+                counts[keyword] = counts.get(keyword, 0) + 1
+        return counts
+
+    def contains_any(self, text: str) -> bool:
+        """키워드가 하나라도 포함되어 있는지"""
+        if not text:
+            return False
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                return True
+        return False
@@ -0,0 +1,143 @@
+"""
+한국어 키워드 사전 모듈
+- 분석기마다 따로 갖고 있던 키워드 목록을 이름 붙은 키워드 집합으로 한 곳에 등록합니다.
+- 등록된 모든 집합은 하나의 Aho-Corasick 오토마톤(KeywordMatcher)으로 컴파일되어,
+  텍스트를 한 번만 훑어서 집합별 히트 수를 모두 구합니다.
+- 최근 스캔 결과를 캐시해 같은 텍스트를 여러 분석기가 다시 훑지 않습니다.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from keyword_matcher import KeywordMatcher
+
+# 캐시할 최근 스캔 결과 수
+LEXICON_SCAN_CACHE_SIZE = 1024
+
+
+class LexiconScan:
+    """텍스트 한 번의 스캔 결과 (집합별 히트 조회)"""
+
+    __slots__ = ("_sets", "_occurrences", "_hits")
+
+    def __init__(self, sets: Dict[str, Tuple[str, ...]], occurrences: Dict[str, int], owners: Dict[str, Tuple[str, ...]]):
+        self._sets = sets
+        # 키워드별 등장 횟수 (겹치는 등장 포함)
+        self._occurrences = occurrences
+        # 집합 이름별 텍스트에 포함된 키워드
+        hits: Dict[str, set] = {}
+        for keyword in occurrences:
+            for name in owners[keyword]:
+                hits.setdefault(name, set()).add(keyword)
+        self._hits: Dict[str, FrozenSet[str]] = {name: frozenset(found) for name, found in hits.items()}
+
+    def hits(self, name: str) -> FrozenSet[str]:
+        """집합에서 텍스트에 포함된 키워드"""
+        return self._hits.get(name, frozenset())
+
+    def count(self, name: str) -> int:
+        """집합에서 텍스트에 포함된 키워드 수 (키워드마다 한 번)"""
+        return len(self._hits.get(name, ()))
+
+    def has(self, name: str) -> bool:
+        """집합의 키워드가 하나라도 포함되어 있는지"""
+        return name in self._hits
+
+    def occurrences(self, name: str) -> Dict[str, int]:
+        """집합의 키워드별 등장 횟수 (등록 순서)"""
+        if name not in self._hits:
+            return {}
+        return {keyword: self._occurrences[keyword] for keyword in self._sets[name] if keyword in self._occurrences}
+
+    def counts(self, names: Iterable[str]) -> Dict[str, int]:
+        """여러 집합의 히트 수 (히트가 없는 집합은 0)"""
+        return {name: self.count(name) for name in names}
+
+    def first(self, names: Iterable[str]) -> Optional[str]:
+        """주어진 순서에서 처음으로 히트한 집합 이름"""
+        for name in names:
+            if name in self._hits:
+                return name
+        return None
+
+    def matched(self, names: Iterable[str]) -> List[str]:
+        """주어진 순서에서 히트한 집합 이름 목록"""
+        return [name for name in names if name in self._hits]
+
+
+_EMPTY_SCAN = LexiconScan({}, {}, {})
+
+
+class Lexicon:
+    """이름 붙은 키워드 집합 레지스트리
+
+    집합은 모듈 로드 시 등록하고, 첫 스캔 때 전체를 하나의 오토마톤으로 컴파일합니다.
+    나중에 집합이 추가되면 다음 스캔 때 다시 컴파일합니다.
+    """
+
+    def __init__(self, cache_size: int = LEXICON_SCAN_CACHE_SIZE):
+        self._sets: Dict[str, Tuple[str, ...]] = {}
+        # 컴파일 시점의 집합/키워드별 소속 집합 (스캔 결과가 참조)
+        self._compiled_sets: Dict[str, Tuple[str, ...]] = {}
+        self._owners: Dict[str, Tuple[str, ...]] = {}
+        self._matcher: Optional[KeywordMatcher] = None
+        self._cache: "OrderedDict[str, LexiconScan]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def register(self, name: str, keywords: Iterable[str]) -> str:
+        """키워드 집합 등록 (같은 이름이면 교체) 후 이름 반환"""
+        keywords = tuple(dict.fromkeys(k for k in keywords if k))
+        with self._lock:
+            if self._sets.get(name) != keywords:
+                self._sets[name] = keywords
+                self._matcher = None
+                self._cache.clear()
+        return name
+
+    def register_many(self, prefix: str, groups: Dict[str, Iterable[str]]) -> Dict[str, str]:
+        """{라벨: 키워드 목록}을 '<prefix>.<라벨>' 집합들로 등록하고 {라벨: 집합 이름} 반환 (순서 유지)"""
+        return {label: self.register(f"{prefix}.{label}", keywords) for label, keywords in groups.items()}
+
+    def keywords(self, name: str) -> Tuple[str, ...]:
+        """등록된 집합의 키워드"""
+        return self._sets[name]
+
+    def _compile(self) -> Tuple[KeywordMatcher, Dict[str, Tuple[str, ...]], Dict[str, Tuple[str, ...]]]:
+        with self._lock:
+            if self._matcher is None:
+                owners: Dict[str, List[str]] = {}
+                for name, keywords in self._sets.items():
+                    for keyword in keywords:
+                        owners.setdefault(keyword, []).append(name)
+                self._compiled_sets = dict(self._sets)
+                self._owners = {keyword: tuple(names) for keyword, names in owners.items()}
+                self._matcher = KeywordMatcher(self._owners.keys())
+            return self._matcher, self._compiled_sets, self._owners
+
+    def scan(self, text: str) -> LexiconScan:
+        """텍스트를 한 번 훑어서 모든 집합의 히트를 계산"""
+        if not text or not isinstance(text, str):
+            return _EMPTY_SCAN
+
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return cached
+
+        matcher, sets, owners = self._compile()
+        result = LexiconScan(sets, matcher.count_all(text), owners)
+
+        with self._lock:
+            # 스캔 중에 집합이 바뀌었으면 캐시하지 않음
+            if self._matcher is matcher:
+                self._cache[text] = result
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+
+# 전역 키워드 사전 (모든 분석기가 공유)
+lexicon = Lexicon()
@@ -0,0 +1,111 @@
+"""
+LLM 비동기 게이트웨이 모듈
+Gemini 호출을 asyncio 기반으로 수행하고, 재시도/백오프와 동시 호출 수 제한을 담당합니다.
+매 시도 전에 rate_limiter의 토큰 버킷(API 키/사용자/엔드포인트 종류)에서 허용을 받습니다.
+엔드포인트는 스레드풀 워커를 점유하지 않고 이벤트 루프 위에서 응답을 기다립니다.
+"""
+
+import os
+import time
+import random
+import asyncio
+import weakref
+from typing import Any, Awaitable, Dict, Optional
+
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, InternalServerError
+
+from rate_limiter import llm_rate_limiter, current_llm_scope
+
+# 재시도 대상 예외
+RETRYABLE_EXCEPTIONS = (ResourceExhausted, ServiceUnavailable, InternalServerError)
+
+# 재시도 설정
+MAX_ATTEMPTS = 3
+BACKOFF_MIN_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 10.0
+
+# 이벤트 루프당 동시에 진행할 수 있는 LLM 호출 수
+MAX_CONCURRENT_GENERATIONS = int(os.environ.get("LLM_MAX_CONCURRENCY", "256"))
+# 동시 생성 작업 하나의 기본 제한 시간 (초)
+TASK_TIMEOUT_SECONDS = float(os.environ.get("LLM_TASK_TIMEOUT_SECONDS", "60"))
+# 요청 한도 초과(429) 후 백그라운드 작업이 LLM 호출을 미루는 시간 (초)
+RATE_LIMIT_COOLDOWN_SECONDS = float(os.environ.get("LLM_RATE_LIMIT_COOLDOWN_SECONDS", "30"))
+
+# 이벤트 루프별 세마포어 (루프가 바뀌면 그 루프에서 새로 만듦)
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+# 마지막으로 요청 한도 초과가 난 뒤 쿨다운이 끝나는 시각 (time.monotonic 기준)
+_rate_limited_until = 0.0
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """동시 호출 제한용 세마포어 (현재 이벤트 루프에서 처음 사용할 때 생성)"""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+    return semaphore
+
+
+def rate_limit_cooldown() -> float:
+    """최근 요청 한도 초과로 남은 쿨다운 시간 (초, 없으면 0)
+
+    예약 작업처럼 미뤄도 되는 호출은 쿨다운 중에 시작하지 않고 나중에 다시 시도합니다.
+    """
+    return max(0.0, _rate_limited_until - time.monotonic())
+
+
+def _backoff_delay(attempt: int) -> float:
+    """지수 백오프 + 지터 (1초, 2초, 4초 ... 최대 10초)"""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_MIN_SECONDS * (2 ** (attempt - 1)))
+    return delay * (0.5 + random.random() / 2)
+
+
+async def generate_content_async(model_instance, *args, max_attempts: int = MAX_ATTEMPTS, **kwargs):
+    """Gemini API 비동기 호출 (재시도/백오프 포함)
+
+    model.generate_content와 같은 인자를 받습니다. stream=True이면 async for로 순회할 수 있는 응답을 반환합니다.
+    호출 한도를 넘어 대기 기한 안에 허용을 받지 못하면 rate_limiter.RateLimitExceeded를 올립니다.
+    """
+    global _rate_limited_until
+    endpoint_class, user = current_llm_scope()
+    attempt = 0
+    while True:
+        attempt += 1
+        await llm_rate_limiter.acquire(endpoint_class, user)
+        try:
+            async with _get_semaphore():
+                print(f"[LLM Gateway] Gemini API 비동기 호출 시도 ({attempt}/{max_attempts})...")
+                return await model_instance.generate_content_async(*args, **kwargs)
+        except RETRYABLE_EXCEPTIONS as e:
+            if isinstance(e, ResourceExhausted):
+                _rate_limited_until = time.monotonic() + RATE_LIMIT_COOLDOWN_SECONDS
+                # 다른 요청의 호출도 잠시 멈춰 429가 연달아 나지 않게 함
+                llm_rate_limiter.penalize()
+            if attempt >= max_attempts:
+                raise
+            delay = _backoff_delay(attempt)
+            print(f"[LLM Gateway] 일시적 오류, {delay:.1f}초 후 재시도: {e}")
+            await asyncio.sleep(delay)
+
+
+async def gather_with_fallbacks(
+    tasks: Dict[str, Awaitable],
+    fallbacks: Any = None,
+    timeout: Optional[float] = TASK_TIMEOUT_SECONDS
+) -> Dict[str, Any]:
+    """서로 독립적인 생성 작업을 동시에 실행하고 {이름: 결과} 반환
+
+    전체 소요 시간은 가장 느린 작업 하나의 시간입니다. 작업별로 timeout을 적용하며,
+    실패하거나 시간을 넘긴 작업은 기본값(fallbacks가 dict이면 fallbacks[이름], 아니면 fallbacks)으로 채웁니다.
+    호출한 쪽이 취소되면 남은 작업도 함께 취소됩니다.
+    """
+    async def run(name: str, task: Awaitable):
+        try:
+            return await asyncio.wait_for(task, timeout)
+        except Exception as e:
+            print(f"[LLM Gateway] 동시 작업 '{name}' 실패, 기본값 사용: {type(e).__name__}: {e}")
+            return fallbacks.get(name) if isinstance(fallbacks, dict) else fallbacks
+
+    names = list(tasks)
+    results = await asyncio.gather(*(run(name, tasks[name]) for name in names))
+    return dict(zip(names, results))
@@ -10,10 +10,12 @@ from fastapi.responses import FileResponse, Response
 from pathlib import Path
 
 from config import CORS_ORIGINS, ORIGIN_REGEX
-from database import Base, engine
+from json_stream import json_parse_metrics
+from rate_limiter import LLMScopeMiddleware, llm_rate_limiter
+from persona_cache import persona_prefix_cache
 
 # 라우터 import
-from auth import router as auth_router
+from auth import router as auth_router, token_subject
 from chat import router as chat_router
 from diary import router as diary_router
 from features import router as features_router
@@ -41,12 +43,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ===========================================
-# 데이터베이스 테이블 생성
-# ===========================================
-
-# 앱 시작 시 테이블 생성
-Base.metadata.create_all(bind=engine)
+# LLM 호출 속도 제한 범위 (요청 경로별 엔드포인트 종류, 사용자)
+app.add_middleware(LLMScopeMiddleware, user_key=token_subject)
 
 # ===========================================
 # 라우터 등록
@@ -70,16 +68,46 @@ app.include_router(features_router)
 
 @app.on_event("startup")
 async def startup_event():
-    """서버 시작 시 캐릭터 성향 데이터 초기화"""
+    """서버 시작 시 DB 마이그레이션, 프롬프트 템플릿 컴파일, 날씨 갱신/예약 작업 디스패처 시작 및 캐릭터 성향 데이터 초기화"""
     from database import get_db
+    from migrations import run_migrations, RUN_MIGRATIONS_ON_STARTUP
     from features import initialize_archetype_cache
+    from prompt_templates import compile_prompt_skeletons
+    from weather import weather_provider
+    from diary import recover_pending_replies
+    from job_queue import dispatcher
     
+    # 적용되지 않은 마이그레이션만 실행 (최신이면 버전 조회 한 번)
+    if RUN_MIGRATIONS_ON_STARTUP:
+        try:
+            run_migrations()
+        except Exception as e:
+            print(f"마이그레이션 오류: {e}")
+    
+    compile_prompt_skeletons()
+    weather_provider.start()
+    
+    # 재시작 전에 예약되었던 교환일기 답장을 복구하고 예약 작업 실행 시작
+    try:
+        recover_pending_replies()
+    except Exception as e:
+        print(f"교환일기 답장 예약 복구 오류: {e}")
+    dispatcher.start()
+    
+    # 스냅샷/DB 값으로 바로 준비하고, 없는 캐릭터는 백그라운드에서 계산
     db = next(get_db())
     try:
         initialize_archetype_cache(db)
     finally:
         db.close()
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """서버 종료 시 예약 작업 디스패처 정지 (실행 중이던 작업은 임대 만료 후 다시 실행됨)"""
+    from job_queue import dispatcher
+    await dispatcher.stop()
+
 # ===========================================
 # 루트 엔드포인트
 # ===========================================
@@ -96,8 +124,13 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    """헬스 체크 엔드포인트"""
-    return {"status": "healthy"}
+    """헬스 체크 엔드포인트 (LLM JSON 응답 파싱 결과, 호출 속도 제한 버킷, 페르소나 컨텍스트 캐시 상태 포함)"""
+    return {
+        "status": "healthy",
+        "llm_json_parse": json_parse_metrics.snapshot(),
+        "llm_rate_limit": llm_rate_limiter.snapshot(),
+        "persona_cache": persona_prefix_cache.snapshot()
+    }
 
 
 @app.get("/favicon.ico")
@@ -0,0 +1,143 @@
+"""
+캐릭터 기억 조회 캐시 모듈
+- (사용자, 캐릭터)별 상위 기억을 메모리에 캐시해 대화 턴마다 DB를 조회하지 않습니다.
+- last_referenced 갱신은 메모리에 모아 두었다가 주기적으로 한 번의 배치 UPDATE로 반영합니다.
+  (읽기 요청이 쓰기 트랜잭션이 되지 않도록)
+"""
+
+import os
+import time
+import atexit
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+
+from database import SessionLocal, CharacterMemory
+
+# (사용자, 캐릭터)별 기억 캐시 유지 시간 (초)
+MEMORY_CACHE_TTL_SECONDS = int(os.environ.get("MEMORY_CACHE_TTL_SECONDS", "600"))
+# 캐시할 (사용자, 캐릭터) 조합 수
+MEMORY_CACHE_SIZE = 4096
+# last_referenced 배치 반영 주기 (초)
+MEMORY_TOUCH_FLUSH_INTERVAL_SECONDS = 30
+
+# 프롬프트 구성에 필요한 필드만 담은 읽기 전용 기억
+MemorySnapshot = namedtuple("MemorySnapshot", ["id", "memory_type", "content", "importance", "last_referenced"])
+
+
+class MemoryTouchBuffer:
+    """last_referenced 갱신을 모아 두었다가 배치 UPDATE로 반영"""
+
+    def __init__(self, interval: int = MEMORY_TOUCH_FLUSH_INTERVAL_SECONDS):
+        self._interval = interval
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def touch(self, memory_ids: Iterable[int], referenced_at: Optional[datetime] = None):
+        referenced_at = referenced_at or datetime.utcnow()
+        with self._lock:
+            for memory_id in memory_ids:
+                self._pending[memory_id] = referenced_at
+        self._ensure_started()
+
+    def flush(self) -> int:
+        """모아 둔 갱신을 DB에 반영하고 반영한 행 수 반환"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+
+        # ORM 일괄 UPDATE는 행 수를 검사해 삭제된 기억 하나로 배치 전체가 실패하므로 Core executemany 사용
+        # (없는 id는 0행 갱신으로 넘어감)
+        table = CharacterMemory.__table__
+        statement = update(table).where(table.c.id == bindparam("memory_id")).values(
+            last_referenced=bindparam("referenced_at")
+        )
+        db = SessionLocal()
+        try:
+            db.execute(
+                statement,
+                [{"memory_id": memory_id, "referenced_at": referenced_at} for memory_id, referenced_at in pending.items()]
+            )
+            db.commit()
+            return len(pending)
+        except Exception as e:
+            db.rollback()
+            print(f"기억 참조 시간 반영 오류 (다음 주기에 재시도): {e}")
+            with self._lock:
+                for memory_id, referenced_at in pending.items():
+                    if memory_id not in self._pending or self._pending[memory_id] < referenced_at:
+                        self._pending[memory_id] = referenced_at
+            return 0
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.flush()
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="memory-touch-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+
+class MemoryCache:
+    """(사용자, 캐릭터)별 상위 기억 캐시"""
+
+    def __init__(self, ttl: int = MEMORY_CACHE_TTL_SECONDS, maxsize: int = MEMORY_CACHE_SIZE):
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, int, List[MemorySnapshot]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, character_id: str, limit: int) -> Optional[List[MemorySnapshot]]:
+        key = (user_id, character_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, cached_limit, memories = entry
+            if expires_at < time.time() or cached_limit < limit:
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return memories[:limit]
+
+    def put(self, user_id: int, character_id: str, limit: int, memories: List[MemorySnapshot]):
+        key = (user_id, character_id)
+        with self._lock:
+            self._entries[key] = (time.time() + self._ttl, limit, memories)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int, character_ids: Optional[Iterable[str]] = None):
+        """기억이 추가/삭제되었을 때 호출 (character_ids가 없으면 사용자 전체)"""
+        with self._lock:
+            if character_ids is None:
+                for key in [k for k in self._entries if k[0] == user_id]:
+                    self._entries.pop(key, None)
+            else:
+                for character_id in character_ids:
+                    self._entries.pop((user_id, character_id), None)
+
+
+memory_touch_buffer = MemoryTouchBuffer()
+memory_cache = MemoryCache()
+
+# 서버 종료 시 남은 갱신 반영
+atexit.register(memory_touch_buffer.stop)
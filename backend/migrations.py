@@ -0,0 +1,274 @@
+"""
+데이터베이스 마이그레이션 모듈
+schema_version 테이블에 적용된 버전을 기록하고, 아직 적용되지 않은 마이그레이션만 순서대로 한 번씩 실행합니다.
+- 별도 단계로 실행: python migrations.py
+- 서버 시작 시 run_migrations() (RUN_MIGRATIONS_ON_STARTUP=0 이면 건너뜀)
+여러 워커가 동시에 시작해도 마이그레이션 잠금을 잡은 한 프로세스만 실행합니다.
+(PostgreSQL: advisory lock, SQLite: DB 파일 옆 잠금 파일)
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import inspect, text, func
+
+from database import (
+    Base, engine, SessionLocal, SchemaVersion, User, UserAvatar, ChatHistory, ChatDailyStat,
+    CharacterMemory, EmotionDiary, ExchangeDiary
+)
+
+# 서버 시작 시 마이그레이션 실행 여부
+RUN_MIGRATIONS_ON_STARTUP = os.environ.get("RUN_MIGRATIONS_ON_STARTUP", "1") != "0"
+# PostgreSQL advisory lock 키 (임의의 고정값)
+MIGRATION_LOCK_KEY = 823_150_417
+
+
+# ===========================================
+# 마이그레이션 단계
+# ===========================================
+
+def _add_missing_columns(table: str, columns):
+    """테이블에 없는 컬럼만 추가 (columns: [(컬럼 이름, 컬럼 정의 DDL)])"""
+    existing = {col['name'] for col in inspect(engine).get_columns(table)}
+    with engine.connect() as conn:
+        for name, ddl in columns:
+            if name in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+            conn.commit()
+            print(f"데이터베이스 마이그레이션 완료: {table}.{name} 컬럼 추가됨")
+
+
+def create_tables():
+    """모델에 정의된 테이블 중 없는 테이블 생성"""
+    Base.metadata.create_all(bind=engine)
+
+
+def _create_missing_indexes(*models):
+    """기존 테이블에 모델의 __table_args__ 인덱스 중 없는 것만 생성"""
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def migrate_chat_histories_manual():
+    """chat_histories.is_manual 컬럼 추가"""
+    _add_missing_columns('chat_histories', [('is_manual', 'INTEGER DEFAULT 0')])
+
+
+def migrate_emotion_diaries():
+    """emotion_diaries.weather 컬럼 추가"""
+    _add_missing_columns('emotion_diaries', [('weather', "VARCHAR DEFAULT '맑음'")])
+
+
+def migrate_chat_histories_quote():
+    """chat_histories.is_manual_quote, quote_message_id 컬럼 추가"""
+    _add_missing_columns('chat_histories', [
+        ('is_manual_quote', 'INTEGER DEFAULT 0'),
+        ('quote_message_id', 'VARCHAR'),
+    ])
+
+
+def migrate_exchange_diaries():
+    """exchange_diaries 답장 관련 컬럼 추가 및 기존 답장의 preview_message, reply_created_at 채우기"""
+    _add_missing_columns('exchange_diaries', [
+        ('scheduled_time', 'TIMESTAMP'),
+        ('preview_message', 'TEXT'),
+        ('reply_created_at', 'TIMESTAMP'),
+        ('topic_used', 'INTEGER DEFAULT 0'),
+    ])
+
+    with engine.connect() as conn:
+        try:
+            # PostgreSQL과 SQLite 모두 호환되는 쿼리
+            # preview_message가 없는 답장들에 대해 첫 50자로 설정
+            conn.execute(text("""
+                UPDATE exchange_diaries
+                SET preview_message = CASE
+                    WHEN length(reply_content) > 50 THEN substring(reply_content, 1, 50) || '...'
+                    ELSE reply_content
+                END
+                WHERE reply_received = TRUE AND (preview_message IS NULL OR preview_message = '')
+            """))
+
+            # reply_created_at가 없는 답장들에 대해 updated_at 또는 created_at으로 설정
+            conn.execute(text("""
+                UPDATE exchange_diaries
+                SET reply_created_at = COALESCE(updated_at, created_at)
+                WHERE reply_received = TRUE AND reply_created_at IS NULL
+            """))
+
+            conn.commit()
+            print("기존 교환일기 답장 데이터 마이그레이션 완료")
+        except Exception as e:
+            conn.rollback()
+            print(f"기존 데이터 마이그레이션 오류 (무시 가능): {e}")
+
+
+def migrate_character_archetypes():
+    """character_archetypes.order_chaos, good_evil 컬럼 추가"""
+    _add_missing_columns('character_archetypes', [
+        ('order_chaos', 'VARCHAR'),
+        ('good_evil', 'VARCHAR'),
+    ])
+
+
+def migrate_chat_messages():
+    """chat_messages 행이 없는 기존 대화의 messages JSON을 한 메시지당 한 행으로 옮김"""
+    from chat_store import backfill_chat_messages
+
+    db = SessionLocal()
+    try:
+        migrated = backfill_chat_messages(db)
+        if migrated:
+            print(f"데이터베이스 마이그레이션 완료: chat_messages 백필 {migrated}개 대화")
+    finally:
+        db.close()
+
+
+def migrate_listing_indexes():
+    """사용자별 목록 조회용 복합 인덱스 추가"""
+    _create_missing_indexes(ChatHistory, CharacterMemory, EmotionDiary, ExchangeDiary)
+
+
+def migrate_user_avatars():
+    """users.profile_pic에 저장된 프로필 사진을 user_avatars 테이블로 옮김"""
+    from avatar_store import avatar_etag
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        existing = {user_id for (user_id,) in db.query(UserAvatar.user_id).all()}
+        rows = db.query(User.id, User.profile_pic).filter(
+            User.profile_pic != None, User.profile_pic != ''
+        ).all()
+        moved = 0
+        for user_id, profile_pic in rows:
+            if user_id not in existing:
+                db.add(UserAvatar(user_id=user_id, data=profile_pic, etag=avatar_etag(profile_pic)))
+                moved += 1
+        db.query(User).filter(User.profile_pic != None, User.profile_pic != '').update(
+            {User.profile_pic: ''}, synchronize_session=False
+        )
+        db.commit()
+        if moved:
+            print(f"데이터베이스 마이그레이션 완료: 프로필 사진 {moved}개 user_avatars로 이동")
+    finally:
+        db.close()
+
+
+def migrate_chat_stats():
+    """집계 테이블이 비어 있고 대화가 있으면 기존 대화로 집계 테이블을 채움"""
+    from chat_stats import rebuild_chat_stats
+
+    db = SessionLocal()
+    try:
+        if db.query(ChatDailyStat.id).first() is None and db.query(ChatHistory.id).first() is not None:
+            rebuilt = rebuild_chat_stats(db)
+            print(f"데이터베이스 마이그레이션 완료: 채팅 통계 집계 {rebuilt}개 대화")
+    finally:
+        db.close()
+
+
+# (버전, 설명, 함수) - 새 마이그레이션은 다음 버전 번호로 끝에 추가
+# 새 테이블만 추가하는 경우에도 create_tables를 다시 실행하는 버전을 추가합니다.
+MIGRATIONS = [
+    (1, "create tables", create_tables),
+    (2, "chat_histories.is_manual", migrate_chat_histories_manual),
+    (3, "emotion_diaries.weather", migrate_emotion_diaries),
+    (4, "chat_histories quote columns", migrate_chat_histories_quote),
+    (5, "exchange_diaries reply columns", migrate_exchange_diaries),
+    (6, "character_archetypes alignment columns", migrate_character_archetypes),
+    (7, "chat_messages backfill", migrate_chat_messages),
+    (8, "chat stats rollup", migrate_chat_stats),
+    (9, "user-scoped listing indexes", migrate_listing_indexes),
+    (10, "user avatars table", migrate_user_avatars),
+    (11, "scheduled jobs table", create_tables),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ===========================================
+# 실행
+# ===========================================
+
+def current_version() -> int:
+    """적용된 최신 버전 (schema_version 테이블이 없으면 0)"""
+    if not inspect(engine).has_table(SchemaVersion.__tablename__):
+        return 0
+    db = SessionLocal()
+    try:
+        return db.query(func.max(SchemaVersion.version)).scalar() or 0
+    finally:
+        db.close()
+
+
+@contextmanager
+def _migration_lock():
+    """프로세스 간 마이그레이션 잠금"""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        return
+
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        yield
+        return
+
+    with open(f"{database}.migrate.lock", "a+b") as lock_file:
+        if sys.platform == "win32":
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def run_migrations() -> int:
+    """적용되지 않은 마이그레이션을 순서대로 실행하고 적용된 개수 반환
+
+    최신 버전이면 잠금 없이 바로 반환합니다. 실패한 마이그레이션은 기록하지 않고 예외를 그대로 올립니다.
+    """
+    if current_version() >= LATEST_VERSION:
+        return 0
+
+    applied = 0
+    with _migration_lock():
+        # 잠금을 기다리는 동안 다른 프로세스가 적용했을 수 있으므로 다시 확인
+        version = current_version()
+        for migration_version, description, migrate in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            print(f"[마이그레이션] v{migration_version} {description} 실행 중...")
+            migrate()
+            db = SessionLocal()
+            try:
+                db.add(SchemaVersion(version=migration_version, description=description, applied_at=datetime.utcnow()))
+                db.commit()
+            finally:
+                db.close()
+            applied += 1
+    if applied:
+        print(f"[마이그레이션] {applied}개 적용 완료 (현재 버전 v{LATEST_VERSION})")
+    return applied
+
+
+if __name__ == "__main__":
+    run_migrations()
@@ -0,0 +1,66 @@
+"""
+목록 API 커서 페이지네이션 모듈
+(정렬 컬럼, id) 키셋 기준으로 다음 페이지를 조회합니다. OFFSET을 쓰지 않으므로 뒤쪽 페이지도 인덱스로 바로 찾습니다.
+커서는 마지막 항목의 (정렬 값, id)를 담은 불투명한 문자열이며 응답의 next_cursor로 전달합니다.
+"""
+
+import json
+import base64
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# 페이지 크기 기본값 / 최대값
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(sort_value: Any, item_id: int) -> str:
+    """(정렬 값, id)를 커서 문자열로 변환"""
+    if isinstance(sort_value, datetime):
+        value = {"dt": sort_value.isoformat()}
+    elif isinstance(sort_value, date):
+        value = {"d": sort_value.isoformat()}
+    else:
+        value = {"v": sort_value}
+    payload = json.dumps([value, item_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """커서 문자열을 (정렬 값, id)로 변환 (형식이 잘못되면 400)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, item_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if "dt" in value:
+            sort_value = datetime.fromisoformat(value["dt"])
+        elif "d" in value:
+            sort_value = date.fromisoformat(value["d"])
+        else:
+            sort_value = value["v"]
+        return sort_value, int(item_id)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate_desc(query, sort_column, id_column, limit: int, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """(sort_column, id) 내림차순으로 커서 다음의 limit개와 다음 커서 반환
+
+    query 결과의 각 항목은 sort_column/id_column과 같은 이름의 속성을 가져야 합니다.
+    """
+    if cursor:
+        sort_value, item_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < item_id)
+        ))
+    items = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return items, next_cursor
@@ -0,0 +1,190 @@
+"""
+페르소나 프롬프트 캐시 관리 모듈
+캐릭터별 정적 프롬프트를 Gemini 컨텍스트 캐시(CachedContent)에 등록해 두고,
+대화 요청 시 캐시 핸들을 참조해 매번 같은 입력 토큰을 보내지 않도록 합니다.
+TTL이 가까워지면 연장하고, 오래 쓰이지 않은 캐시는 삭제합니다.
+- 캐시가 있으면 잠금 없이 바로 반환하고, 생성은 캐릭터별 잠금 안에서 한 번만 합니다.
+- TTL 연장과 정리는 요청을 기다리게 하지 않도록 백그라운드 태스크에서 합니다.
+"""
+
+import os
+import time
+import asyncio
+from datetime import timedelta
+from typing import Dict, Optional, Set
+
+import google.generativeai as genai
+
+from config import model
+from personas import CHARACTER_PERSONAS
+from prompt_templates import get_single_skeleton, NICKNAME_SLOT
+
+# 캐시 사용 여부 (PERSONA_CONTEXT_CACHE=0 이면 사용 안 함)
+PERSONA_CACHE_ENABLED = os.environ.get("PERSONA_CONTEXT_CACHE", "1") != "0"
+# 캐시 TTL (분)
+PERSONA_CACHE_TTL_MINUTES = int(os.environ.get("PERSONA_CACHE_TTL_MINUTES", "60"))
+# 만료까지 남은 시간이 이보다 적으면 TTL 연장 (초)
+PERSONA_CACHE_REFRESH_MARGIN_SECONDS = 10 * 60
+# 이 시간 동안 쓰이지 않은 캐시는 연장하지 않고 삭제 (초)
+PERSONA_CACHE_IDLE_SECONDS = PERSONA_CACHE_TTL_MINUTES * 60
+# 캐시 생성 실패 후 다시 시도하기까지 대기 시간 (초)
+PERSONA_CACHE_RETRY_AFTER_SECONDS = 30 * 60
+# 연장/정리 백그라운드 작업을 시작하는 최소 간격 (초)
+PERSONA_CACHE_SWEEP_SECONDS = 60
+
+
+def _cacheable_prefix(character_id: str) -> str:
+    """캐시에 올릴 정적 프롬프트 (닉네임 자리는 {{USER}} 플레이스홀더로 남김)"""
+    return get_single_skeleton(character_id).replace(NICKNAME_SLOT, '{{USER}}')
+
+
+class PersonaPrefixCache:
+    """캐릭터별 Gemini 컨텍스트 캐시 핸들 관리"""
+
+    def __init__(self, client=None, ttl_minutes: int = PERSONA_CACHE_TTL_MINUTES, base_model=None):
+        # client: CachedContent.create / GenerativeModel.from_cached_content 를 제공하는 객체 (기본값: genai)
+        # base_model: 캐시를 만들 모델 (기본값: config.model)
+        self._client = client
+        self._base_model = base_model or model
+        self._ttl = timedelta(minutes=ttl_minutes)
+        self._entries: Dict[str, dict] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refreshing: Set[str] = set()
+        self._background: Set[asyncio.Task] = set()
+        self._last_sweep = 0.0
+        self.stats = {"hits": 0, "misses": 0, "creates": 0, "refreshes": 0, "evictions": 0, "failures": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return PERSONA_CACHE_ENABLED and self._base_model is not None
+
+    def _create_cached_model(self, character_id: str):
+        """캐시 생성 후 (캐시 핸들, 캐시를 참조하는 모델) 반환 (블로킹 호출)"""
+        client = self._client or genai
+        cached_content = client.caching.CachedContent.create(
+            model=self._base_model.model_name,
+            display_name=f"persona-{character_id}",
+            system_instruction=_cacheable_prefix(character_id),
+            ttl=self._ttl
+        )
+        return cached_content, client.GenerativeModel.from_cached_content(cached_content=cached_content)
+
+    async def get_model(self, character_id: str, persona: dict):
+        """캐릭터의 캐시를 참조하는 모델 반환 (캐시를 쓸 수 없으면 None)"""
+        if not self.enabled:
+            return None
+        # 등록된 페르소나가 아니면 캐시하지 않음
+        if CHARACTER_PERSONAS.get(character_id) is not persona:
+            return None
+
+        now = time.time()
+        self._maybe_sweep(now)
+
+        entry = self._usable_entry(character_id, now)
+        if entry is not None:
+            return entry["model"]
+
+        failed_at = self._failed_at.get(character_id)
+        if failed_at and now - failed_at < PERSONA_CACHE_RETRY_AFTER_SECONDS:
+            return None
+
+        # 같은 캐릭터의 생성만 기다림 (다른 캐릭터 요청은 막지 않음)
+        lock = self._locks.setdefault(character_id, asyncio.Lock())
+        async with lock:
+            # 기다리는 동안 다른 요청이 만들었으면 그대로 사용
+            entry = self._usable_entry(character_id, time.time())
+            if entry is not None:
+                return entry["model"]
+            failed_at = self._failed_at.get(character_id)
+            if failed_at and time.time() - failed_at < PERSONA_CACHE_RETRY_AFTER_SECONDS:
+                return None
+
+            self.stats["misses"] += 1
+            try:
+                cached_content, cached_model = await asyncio.to_thread(self._create_cached_model, character_id)
+            except Exception as e:
+                # 토큰 수 부족, 지원하지 않는 모델 등 - 일정 시간 동안 인라인 프롬프트 사용
+                print(f"⚠️ 페르소나 캐시 생성 실패 ({character_id}): {e}")
+                self._failed_at[character_id] = time.time()
+                self.stats["failures"] += 1
+                return None
+
+            created_at = time.time()
+            self._entries[character_id] = {
+                "cached_content": cached_content,
+                "model": cached_model,
+                "expires_at": created_at + self._ttl.total_seconds(),
+                "last_used": created_at
+            }
+            self._failed_at.pop(character_id, None)
+            self.stats["creates"] += 1
+            print(f"✅ 페르소나 캐시 생성: {character_id}")
+            return cached_model
+
+    def _usable_entry(self, character_id: str, now: float) -> Optional[dict]:
+        """만료되지 않은 캐시 항목 (만료가 가까우면 백그라운드에서 연장 시작)"""
+        entry = self._entries.get(character_id)
+        if entry is None or entry["expires_at"] <= now:
+            return None
+        if entry["expires_at"] - now < PERSONA_CACHE_REFRESH_MARGIN_SECONDS and character_id not in self._refreshing:
+            self._refreshing.add(character_id)
+            self._spawn(self._refresh(character_id, entry))
+        entry["last_used"] = now
+        self.stats["hits"] += 1
+        return entry
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _maybe_sweep(self, now: float):
+        if now - self._last_sweep >= PERSONA_CACHE_SWEEP_SECONDS:
+            self._last_sweep = now
+            self._spawn(self._evict_idle(now))
+
+    async def _refresh(self, character_id: str, entry: dict):
+        """만료가 가까운 캐시의 TTL 연장"""
+        try:
+            await asyncio.to_thread(entry["cached_content"].update, ttl=self._ttl)
+            entry["expires_at"] = time.time() + self._ttl.total_seconds()
+            self.stats["refreshes"] += 1
+        except Exception as e:
+            print(f"⚠️ 페르소나 캐시 TTL 연장 실패 ({character_id}): {e}")
+        finally:
+            self._refreshing.discard(character_id)
+
+    async def _evict_idle(self, now: float):
+        """오래 쓰이지 않았거나 이미 만료된 캐시 정리"""
+        for char_id, entry in list(self._entries.items()):
+            if entry["expires_at"] <= now or now - entry["last_used"] > PERSONA_CACHE_IDLE_SECONDS:
+                if self._entries.get(char_id) is not entry:
+                    continue
+                self._entries.pop(char_id, None)
+                self.stats["evictions"] += 1
+                if entry["expires_at"] > now:
+                    try:
+                        await asyncio.to_thread(entry["cached_content"].delete)
+                    except Exception as e:
+                        print(f"⚠️ 페르소나 캐시 삭제 실패 ({char_id}): {e}")
+
+    def invalidate(self, character_id: str):
+        """서버 측에서 캐시를 찾을 수 없는 경우 등 로컬 핸들 제거"""
+        if self._entries.pop(character_id, None) is not None:
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> dict:
+        """현재 캐시 상태 (/health 모니터링용)"""
+        now = time.time()
+        return {
+            "enabled": self.enabled,
+            "stats": dict(self.stats),
+            "entries": {
+                char_id: {"expires_in": round(entry["expires_at"] - now), "idle": round(now - entry["last_used"])}
+                for char_id, entry in list(self._entries.items())
+            }
+        }
+
+
+persona_prefix_cache = PersonaPrefixCache()
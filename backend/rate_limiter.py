@@ -0,0 +1,329 @@
+"""
+LLM 호출 속도 제한 모듈
+Gemini 호출 전에 토큰 버킷으로 호출을 허용할지 정합니다. 호출 한 번(재시도 포함)마다 아래 버킷에서 토큰을 1개씩 씁니다.
+- API 키별: 전체 호출량. 요청 한도 초과(429)가 나면 잠시 비워서 재시도가 몰리지 않게 함
+- 사용자별: 로그인 사용자는 토큰의 사용자, 아니면 클라이언트 IP
+  (LLM_TRUSTED_PROXIES에 등록한 프록시를 거친 요청은 X-Forwarded-For의 원래 클라이언트 IP)
+- 엔드포인트 종류별: chat / diary / analytics
+토큰이 모자라면 종류별 대기 기한까지 기다렸다가 호출하고, 기한 안에 토큰이 생기지 않으면 바로 RateLimitExceeded를 올립니다.
+호출한 쪽은 기존 오류 처리 경로에서 안내 문구나 기본 응답을 돌려줍니다.
+요청의 사용자/엔드포인트 종류는 LLMScopeMiddleware가 컨텍스트 변수에 담아 두고, 예약 작업은 llm_scope()로 지정합니다.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import ipaddress
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+ENDPOINT_CHAT = "chat"
+ENDPOINT_DIARY = "diary"
+ENDPOINT_ANALYTICS = "analytics"
+
+# 버킷 설정: (분당 호출 수, 최대 버스트). 분당 호출 수가 0 이하이면 그 버킷은 쓰지 않음
+KEY_LIMIT = (float(os.environ.get("LLM_KEY_RPM", "600")), float(os.environ.get("LLM_KEY_BURST", "60")))
+USER_LIMIT = (float(os.environ.get("LLM_USER_RPM", "30")), float(os.environ.get("LLM_USER_BURST", "8")))
+ENDPOINT_CLASS_LIMITS = {
+    ENDPOINT_CHAT: (float(os.environ.get("LLM_CHAT_RPM", "400")), float(os.environ.get("LLM_CHAT_BURST", "40"))),
+    ENDPOINT_DIARY: (float(os.environ.get("LLM_DIARY_RPM", "120")), float(os.environ.get("LLM_DIARY_BURST", "20"))),
+    ENDPOINT_ANALYTICS: (float(os.environ.get("LLM_ANALYTICS_RPM", "60")), float(os.environ.get("LLM_ANALYTICS_BURST", "10"))),
+}
+
+# 토큰을 기다리는 최대 시간 (초) - 넘을 것 같으면 기다리지 않고 바로 거절
+ENDPOINT_CLASS_DEADLINES = {
+    ENDPOINT_CHAT: float(os.environ.get("LLM_CHAT_QUEUE_SECONDS", "10")),
+    ENDPOINT_DIARY: float(os.environ.get("LLM_DIARY_QUEUE_SECONDS", "30")),
+    ENDPOINT_ANALYTICS: float(os.environ.get("LLM_ANALYTICS_QUEUE_SECONDS", "5")),
+}
+DEFAULT_QUEUE_SECONDS = float(os.environ.get("LLM_QUEUE_SECONDS", "10"))
+
+# 429 이후 API 키 버킷을 비워 두는 시간 (초)
+RATE_LIMIT_PENALTY_SECONDS = float(os.environ.get("LLM_RATE_LIMIT_PENALTY_SECONDS", "5"))
+# 버킷을 유지할 사용자 수 (오래 안 쓴 사용자부터 버림)
+USER_BUCKET_CACHE_SIZE = 10000
+# X-Forwarded-For를 믿을 프록시 주소/대역 (쉼표 구분, 예: "127.0.0.1,10.0.0.0/8")
+# 비어 있으면 헤더를 무시하고 연결한 주소를 사용 (uvicorn --proxy-headers로 이미 바꿨다면 그 주소)
+TRUSTED_PROXIES = os.environ.get("LLM_TRUSTED_PROXIES", "")
+
+# 경로 접두사 -> 엔드포인트 종류 (앞에서부터 먼저 맞는 것)
+_ENDPOINT_CLASS_PREFIXES = (
+    ("/chat/summarize", ENDPOINT_ANALYTICS),
+    ("/chat/stats", ENDPOINT_ANALYTICS),
+    ("/chat/debate/summary", ENDPOINT_ANALYTICS),
+    ("/chat/debate/comments", ENDPOINT_ANALYTICS),
+    ("/chat/convert-to-novel", ENDPOINT_ANALYTICS),
+    ("/chat", ENDPOINT_CHAT),
+    ("/diary", ENDPOINT_DIARY),
+    ("/exchange-diary", ENDPOINT_DIARY),
+    ("/archetype", ENDPOINT_ANALYTICS),
+    ("/music", ENDPOINT_ANALYTICS),
+    ("/psychology", ENDPOINT_ANALYTICS),
+)
+
+# 현재 요청/작업의 (엔드포인트 종류, 사용자 키)
+_llm_scope: ContextVar[Tuple[Optional[str], Optional[str]]] = ContextVar("llm_scope", default=(None, None))
+
+
+class RateLimitExceeded(Exception):
+    """대기 기한 안에 호출 토큰을 얻지 못함 (retry_after초 뒤에는 가능할 것으로 예상)"""
+
+    def __init__(self, bucket: str, retry_after: float):
+        super().__init__(f"LLM rate limit exceeded ({bucket}), retry after {retry_after:.1f}s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """분당 rate_per_minute개씩 채워지고 최대 capacity개까지 쌓이는 토큰 버킷 (잠금은 호출한 쪽에서)"""
+
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def level(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def wait_time(self, now: float, cost: float = 1.0) -> float:
+        """cost개를 쓸 수 있을 때까지 남은 시간 (초)"""
+        self._refill(now)
+        blocked = max(0.0, self._updated - now)
+        return blocked + max(0.0, cost - self.tokens) / self.rate
+
+    def take(self, cost: float = 1.0):
+        self.tokens -= cost
+
+    def block(self, now: float, seconds: float):
+        """seconds초 동안 비워 둠 (그 뒤부터 다시 채워짐)"""
+        self.tokens = 0.0
+        self._updated = max(self._updated, now + seconds)
+
+
+def _new_bucket(limit: Tuple[float, float]) -> Optional[TokenBucket]:
+    rate_per_minute, burst = limit
+    return TokenBucket(rate_per_minute, burst) if rate_per_minute > 0 else None
+
+
+def _default_api_key_id() -> str:
+    """설정된 API 키를 구분하는 짧은 해시 (키 자체는 지표에 남기지 않음)"""
+    api_key = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY") or ""
+    return hashlib.sha256(api_key.strip().encode("utf-8")).hexdigest()[:8]
+
+
+class LLMRateLimiter:
+    """API 키 / 사용자 / 엔드포인트 종류별 토큰 버킷으로 LLM 호출을 허용하거나 거절"""
+
+    def __init__(
+        self,
+        key_limit: Tuple[float, float] = KEY_LIMIT,
+        user_limit: Tuple[float, float] = USER_LIMIT,
+        class_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        deadlines: Optional[Dict[str, float]] = None,
+        max_users: int = USER_BUCKET_CACHE_SIZE,
+        penalty_seconds: float = RATE_LIMIT_PENALTY_SECONDS
+    ):
+        self._key_limit = key_limit
+        self._user_limit = user_limit
+        self._class_limits = ENDPOINT_CLASS_LIMITS if class_limits is None else class_limits
+        self._deadlines = ENDPOINT_CLASS_DEADLINES if deadlines is None else deadlines
+        self._max_users = max_users
+        self._penalty_seconds = penalty_seconds
+        self._key_buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._class_buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._user_buckets: "OrderedDict[str, Optional[TokenBucket]]" = OrderedDict()
+        self._counts = {"admitted": 0, "queued": 0, "shed": 0, "penalized": 0}
+        self._lock = threading.Lock()
+        self._api_key_id: Optional[str] = None
+
+    def _key_bucket(self, api_key_id: Optional[str]) -> Tuple[str, Optional[TokenBucket]]:
+        if api_key_id is None:
+            if self._api_key_id is None:
+                self._api_key_id = _default_api_key_id()
+            api_key_id = self._api_key_id
+        if api_key_id not in self._key_buckets:
+            self._key_buckets[api_key_id] = _new_bucket(self._key_limit)
+        return f"api_key:{api_key_id}", self._key_buckets[api_key_id]
+
+    def _buckets(self, api_key_id: Optional[str], endpoint_class: Optional[str], user: Optional[str]) -> List[Tuple[str, TokenBucket]]:
+        buckets = [self._key_bucket(api_key_id)]
+        if endpoint_class in self._class_limits:
+            if endpoint_class not in self._class_buckets:
+                self._class_buckets[endpoint_class] = _new_bucket(self._class_limits[endpoint_class])
+            buckets.append((f"endpoint:{endpoint_class}", self._class_buckets[endpoint_class]))
+        if user is not None:
+            if user not in self._user_buckets:
+                self._user_buckets[user] = _new_bucket(self._user_limit)
+                while len(self._user_buckets) > self._max_users:
+                    self._user_buckets.popitem(last=False)
+            self._user_buckets.move_to_end(user)
+            buckets.append(("user", self._user_buckets[user]))
+        return [(name, bucket) for name, bucket in buckets if bucket is not None]
+
+    async def acquire(
+        self,
+        endpoint_class: Optional[str] = None,
+        user: Optional[str] = None,
+        deadline: Optional[float] = None,
+        api_key_id: Optional[str] = None
+    ):
+        """모든 버킷에서 토큰 1개씩 가져옴 (부족하면 deadline초까지 대기, 그 안에 안 되면 RateLimitExceeded)"""
+        if deadline is None:
+            deadline = self._deadlines.get(endpoint_class, DEFAULT_QUEUE_SECONDS)
+        give_up_at = time.monotonic() + deadline
+        queued = False
+        while True:
+            with self._lock:
+                # 새로 만든 버킷의 갱신 시각보다 now가 앞서지 않도록 버킷을 먼저 준비
+                buckets = self._buckets(api_key_id, endpoint_class, user)
+                now = time.monotonic()
+                waits = [(bucket.wait_time(now), name) for name, bucket in buckets]
+                wait, limited_by = max(waits, default=(0.0, None))
+                if wait <= 0:
+                    for _, bucket in buckets:
+                        bucket.take()
+                    self._counts["admitted"] += 1
+                    return
+                if now + wait > give_up_at:
+                    self._counts["shed"] += 1
+                    raise RateLimitExceeded(limited_by, wait)
+                if not queued:
+                    self._counts["queued"] += 1
+                    queued = True
+            await asyncio.sleep(wait)
+
+    def penalize(self, seconds: Optional[float] = None, api_key_id: Optional[str] = None):
+        """요청 한도 초과(429) 응답을 받았을 때 API 키 버킷을 seconds초(기본 penalty_seconds) 동안 비움"""
+        if seconds is None:
+            seconds = self._penalty_seconds
+        with self._lock:
+            _, bucket = self._key_bucket(api_key_id)
+            if bucket is not None:
+                bucket.block(time.monotonic(), seconds)
+            self._counts["penalized"] += 1
+
+    def snapshot(self) -> dict:
+        """현재 버킷 토큰 수와 허용/대기/거절 횟수"""
+        with self._lock:
+            now = time.monotonic()
+            user_levels = [bucket.level(now) for bucket in self._user_buckets.values() if bucket is not None]
+            return {
+                "api_keys": {key: round(bucket.level(now), 2) for key, bucket in self._key_buckets.items() if bucket is not None},
+                "endpoint_classes": {name: round(bucket.level(now), 2) for name, bucket in self._class_buckets.items() if bucket is not None},
+                "users": {
+                    "tracked": len(user_levels),
+                    "exhausted": sum(1 for level in user_levels if level < 1),
+                },
+                **self._counts,
+            }
+
+
+llm_rate_limiter = LLMRateLimiter()
+
+
+# ===========================================
+# 요청 / 작업 범위
+# ===========================================
+
+def current_llm_scope() -> Tuple[Optional[str], Optional[str]]:
+    """현재 요청/작업의 (엔드포인트 종류, 사용자 키)"""
+    return _llm_scope.get()
+
+
+@contextmanager
+def llm_scope(endpoint_class: Optional[str], user: Optional[str] = None):
+    """블록 안의 LLM 호출을 endpoint_class / user 버킷으로 계산 (예약 작업 등 요청 밖에서 사용)"""
+    token = _llm_scope.set((endpoint_class, user))
+    try:
+        yield
+    finally:
+        _llm_scope.reset(token)
+
+
+def endpoint_class_for_path(path: str) -> Optional[str]:
+    for prefix, endpoint_class in _ENDPOINT_CLASS_PREFIXES:
+        if path == prefix or path.startswith(prefix + "/"):
+            return endpoint_class
+    return None
+
+
+def parse_trusted_proxies(value: str) -> list:
+    """쉼표로 구분한 주소/대역 목록을 ipaddress 네트워크 목록으로 (잘못된 항목은 무시)"""
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            print(f"⚠️ LLM_TRUSTED_PROXIES 항목 무시: {item}")
+    return networks
+
+
+def _is_trusted(address: str, networks) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+class LLMScopeMiddleware:
+    """요청 경로와 사용자로 LLM 호출 범위를 정하는 ASGI 미들웨어
+
+    user_key는 Bearer 토큰을 받아 사용자 식별 문자열(검증 실패 시 None)을 돌려주는 함수입니다.
+    비로그인 요청은 클라이언트 IP로 구분합니다. 연결한 주소가 trusted_proxies에 속하면
+    X-Forwarded-For를 오른쪽부터 읽어 신뢰하는 프록시가 아닌 첫 주소를 클라이언트로 봅니다.
+    (신뢰하지 않는 주소가 보낸 X-Forwarded-For는 위조할 수 있으므로 무시)
+    """
+
+    def __init__(self, app, user_key: Optional[Callable[[str], Optional[str]]] = None,
+                 trusted_proxies: str = TRUSTED_PROXIES):
+        self.app = app
+        self._user_key = user_key
+        self._trusted_proxies = parse_trusted_proxies(trusted_proxies)
+
+    def _client_ip(self, scope) -> Optional[str]:
+        client = scope.get("client")
+        if not client:
+            return None
+        address = client[0]
+        if not self._trusted_proxies or not _is_trusted(address, self._trusted_proxies):
+            return address
+        forwarded = b",".join(
+            value for name, value in scope.get("headers") or [] if name == b"x-forwarded-for"
+        ).decode("latin-1")
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not _is_trusted(hop, self._trusted_proxies):
+                return hop
+            address = hop
+        return address
+
+    def _request_user(self, scope) -> Optional[str]:
+        authorization = dict(scope.get("headers") or []).get(b"authorization", b"")
+        if self._user_key is not None and authorization[:7].lower() == b"bearer ":
+            subject = self._user_key(authorization[7:].decode("latin-1").strip())
+            if subject:
+                return f"user:{subject}"
+        address = self._client_ip(scope)
+        return f"ip:{address}" if address else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with llm_scope(endpoint_class_for_path(scope.get("path", "")), self._request_user(scope)):
+            await self.app(scope, receive, send)
@@ -0,0 +1,45 @@
+"""
+테스트 공통 설정
+모듈을 불러오기 전에 임시 SQLite DB를 DATABASE_URL로 지정하고 테이블을 만듭니다.
+LLM은 호출하지 않습니다 (API 키를 비워 config.model은 None, 필요한 테스트가 가짜 모델로 바꿔 끼움).
+"""
+
+import os
+import sys
+import uuid
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="drama_chat_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.pop("GOOGLE_API_KEY", None)
+os.environ.pop("GEMINI_API_KEY", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal, User  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+run_migrations()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    """테스트마다 새 사용자"""
+    name = f"user_{uuid.uuid4().hex[:12]}"
+    created = User(username=name, email=f"{name}@example.com", hashed_password="x", nickname="테스터")
+    db.add(created)
+    db.commit()
+    db.refresh(created)
+    return created
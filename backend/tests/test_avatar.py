@@ -0,0 +1,79 @@
+"""프로필 사진: 이미지 data URL만 저장하고, 추측할 수 없는 주소에서 이미지로만 내보내는지"""
+
+import base64
+
+import pytest
+from fastapi.testclient import TestClient
+
+from auth import create_access_token
+from avatar_store import avatar_url, decode_avatar, set_avatar
+from main import app
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+PNG_DATA_URL = "data:image/png;base64," + base64.b64encode(PNG).decode()
+DEFAULT_PIC = "https://placehold.co/100x100/bcaaa4/795548?text=User"
+
+client = TestClient(app)
+
+
+def _auth(user):
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.username})}"}
+
+
+def test_profile_update_serves_image_at_etag_url(user):
+    response = client.put("/auth/profile", json={"profile_pic": PNG_DATA_URL}, headers=_auth(user))
+    assert response.status_code == 200
+    url = response.json()["avatar_url"]
+    assert url.startswith(f"/auth/avatar/{user.id}/") and len(url.rsplit("/", 1)[1]) == 32
+
+    image = client.get(url)
+    assert image.status_code == 200
+    assert image.content == PNG
+    assert image.headers["content-type"] == "image/png"
+    assert image.headers["x-content-type-options"] == "nosniff"
+
+    cached = client.get(url, headers={"If-None-Match": image.headers["etag"]})
+    assert cached.status_code == 304
+
+
+def test_avatar_requires_matching_etag(user, db):
+    set_avatar(user.id, PNG_DATA_URL, db)
+    db.commit()
+
+    # 사용자 번호만으로는 받을 수 없음
+    assert client.get(f"/auth/avatar/{user.id}").status_code == 404
+    assert client.get(f"/auth/avatar/{user.id}/{'0' * 32}").status_code == 404
+    assert client.get(avatar_url(user.id, db)).status_code == 200
+
+
+@pytest.mark.parametrize("profile_pic", [
+    "data:text/html;base64," + base64.b64encode(b"<script>alert(1)</script>").decode(),
+    "data:image/svg+xml;base64," + base64.b64encode(b"<svg onload='alert(1)'/>").decode(),
+    "data:image/png,not-base64",
+    "data:image/png;base64,@@@",
+    "https://evil.example/phish",
+    "javascript:alert(1)",
+])
+def test_profile_update_rejects_non_image(user, db, profile_pic):
+    response = client.put("/auth/profile", json={"profile_pic": profile_pic}, headers=_auth(user))
+    assert response.status_code == 422
+    assert avatar_url(user.id, db) is None
+
+    with pytest.raises(ValueError):
+        set_avatar(user.id, profile_pic, db)
+
+
+def test_default_picture_is_stored_as_no_avatar(user, db):
+    client.put("/auth/profile", json={"profile_pic": PNG_DATA_URL}, headers=_auth(user))
+
+    response = client.put("/auth/profile", json={"profile_pic": DEFAULT_PIC}, headers=_auth(user))
+    assert response.status_code == 200
+    assert response.json()["profile_pic"] == ""
+    assert response.json()["avatar_url"] is None
+
+
+def test_decode_avatar_rejects_non_image_media_types():
+    assert decode_avatar(PNG_DATA_URL) == (PNG, "image/png")
+    assert decode_avatar("data:text/html;base64,PHNjcmlwdD4=") is None
+    assert decode_avatar("data:image/svg+xml;base64,PHN2Zy8+") is None
+    assert decode_avatar("https://evil.example/phish") is None
@@ -0,0 +1,65 @@
+"""대화 자동 저장: 같은 대화를 동시에 저장해 (chat_id, seq)가 겹쳐도 세션을 계속 쓸 수 있는지"""
+
+import threading
+
+import chat
+import chat_store
+from chat import ChatRequest, _auto_save_chat, _create_auto_chat
+from database import SessionLocal, ChatHistory, ChatMessage
+
+
+def _messages(count: int):
+    return [
+        {"id": float(i + 1), "sender": "user" if i % 2 == 0 else "ai", "text": f"메시지 {i}", "characterId": None}
+        for i in range(count)
+    ]
+
+
+def _request(chat_id: int, count: int) -> ChatRequest:
+    return ChatRequest(
+        character_ids=["kim_shin"], user_nickname="테스터",
+        chat_history=_messages(count), current_chat_id=chat_id
+    )
+
+
+def _run_save(request: ChatRequest, user_id: int, results: dict, name: str):
+    db = SessionLocal()
+    try:
+        results[name] = _auto_save_chat(request, user_id, db)
+        # 같은 요청에서 이어지는 DB 작업 (실패한 트랜잭션이 남아 있으면 PendingRollbackError)
+        results[name + "_after"] = db.query(ChatHistory).filter(ChatHistory.id == request.current_chat_id).count()
+        db.commit()
+    except Exception as e:
+        results[name + "_error"] = e
+    finally:
+        db.close()
+
+
+def test_concurrent_auto_save_rolls_back_on_seq_conflict(db, user, monkeypatch):
+    created = _create_auto_chat(["kim_shin"], [chat.ChatHistoryItem(**m) for m in _messages(2)], user.id, db)
+    chat_id = created.id
+    results = {}
+
+    # 첫 요청이 마지막 seq를 읽은 뒤 INSERT 하기 직전에, 같은 메시지를 담은 두 번째 요청이 먼저 저장을 끝냄
+    real_insert_rows = chat_store._insert_rows
+    raced = threading.Event()
+
+    def insert_rows_after_other_save(*args, **kwargs):
+        if not raced.is_set():
+            raced.set()
+            other = threading.Thread(target=_run_save, args=(_request(chat_id, 3), user.id, results, "second"))
+            other.start()
+            other.join()
+        return real_insert_rows(*args, **kwargs)
+
+    monkeypatch.setattr(chat_store, "_insert_rows", insert_rows_after_other_save)
+    first = threading.Thread(target=_run_save, args=(_request(chat_id, 3), user.id, results, "first"))
+    first.start()
+    first.join()
+
+    assert "first_error" not in results and "second_error" not in results
+    assert results["first"] == results["second"] == chat_id
+    assert results["first_after"] == results["second_after"] == 1
+
+    seqs = [row.seq for row in db.query(ChatMessage.seq).filter(ChatMessage.chat_id == chat_id).order_by(ChatMessage.seq)]
+    assert seqs == [0, 1, 2]
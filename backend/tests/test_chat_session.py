@@ -0,0 +1,127 @@
+"""세션 모드 대화: 동시 메시지 추가의 seq 할당, 스트리밍 중 대화 삭제, 저장소에서 세션 복원"""
+
+import threading
+
+import pytest
+
+import chat_session
+from chat import ChatHistoryItem, _create_auto_chat, _record_streamed_messages
+from chat_session import chat_sessions, DEBATE_START_MARKER, DEBATE_END_MARKER
+from chat_store import iter_messages_reverse, sync_messages, load_messages
+from config import MAX_HISTORY_MESSAGES
+from database import SessionLocal, ChatHistory, ChatMessage
+
+
+def _new_chat(db, user, count: int = 2) -> ChatHistory:
+    messages = [ChatHistoryItem(id=float(i + 1), sender="user", text=f"메시지 {i}") for i in range(count)]
+    return _create_auto_chat(["kim_shin"], messages, user.id, db)
+
+
+def _seqs(db, chat_id: int):
+    return [row.seq for row in db.query(ChatMessage.seq).filter(ChatMessage.chat_id == chat_id).order_by(ChatMessage.seq)]
+
+
+def test_concurrent_appends_get_distinct_seqs(db, user):
+    chat_id = _new_chat(db, user).id
+    session = chat_sessions.get(db.get(ChatHistory, chat_id), db)
+    errors = []
+    start = threading.Barrier(8)
+
+    def append(worker: int):
+        thread_db = SessionLocal()
+        try:
+            chat = thread_db.get(ChatHistory, chat_id)
+            start.wait()
+            for i in range(5):
+                chat_sessions.append(session, chat, [{"id": worker * 100 + i, "sender": "ai", "text": f"{worker}-{i}"}], thread_db)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            thread_db.close()
+
+    threads = [threading.Thread(target=append, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert _seqs(db, chat_id) == list(range(2 + 8 * 5))
+    assert session.next_seq == 2 + 8 * 5
+
+
+def test_append_reloads_session_changed_elsewhere(db, user):
+    chat = _new_chat(db, user)
+    session = chat_sessions.get(chat, db)
+
+    # 전체 업로드 방식 저장이 세션 모르게 메시지를 추가
+    messages = load_messages(chat, db) + [{"id": 50.0, "sender": "user", "text": "다른 곳에서 추가"}]
+    sync_messages(chat, messages, db)
+    db.commit()
+
+    updated = chat_sessions.append(session, chat, [{"id": 60.0, "sender": "user", "text": "새 메시지"}], db)
+
+    assert _seqs(db, chat.id) == [0, 1, 2, 3]
+    assert updated.next_seq == 4
+    assert [turn["parts"][0]["text"] for turn in updated.history_for_ai()][-2:] == ["다른 곳에서 추가", "새 메시지"]
+
+
+def test_stream_save_skips_deleted_chat(db, user):
+    chat = _new_chat(db, user)
+    chat_id = chat.id
+    session = chat_sessions.get(chat, db)
+    db.delete(chat)
+    db.commit()
+
+    saved = _record_streamed_messages(session, chat_id, [{"id": "kim_shin", "texts": ["안녕", "잘 지냈어?"]}])
+
+    assert [message["text"] for message in saved] == ["안녕", "잘 지냈어?"]
+    assert _seqs(db, chat_id) == []
+
+
+def _turns(count: int, start: int = 0):
+    return [{"id": float(start + i + 1), "sender": "user" if i % 2 == 0 else "ai", "text": f"턴 {start + i}"}
+            for i in range(count)]
+
+
+def _marker(text: str, message_id: float):
+    return {"id": message_id, "sender": "system", "text": text}
+
+
+@pytest.mark.parametrize("layout", [
+    ["turns:100"],
+    ["turns:10"],
+    ["turns:50", "start", "turns:40"],
+    ["turns:50", "start", "turns:10", "end", "turns:5"],
+    ["turns:5", "start", "turns:10", "end", "turns:60"],
+    ["start", "turns:20", "end", "turns:10", "start", "turns:3"],
+])
+def test_load_session_matches_forward_replay(db, user, monkeypatch, layout):
+    messages = []
+    for part in layout:
+        if part == "start":
+            messages.append(_marker(f"'{DEBATE_START_MARKER}'", 10000.0 + len(messages)))
+        elif part == "end":
+            messages.append(_marker(f"'{DEBATE_END_MARKER}'", 10000.0 + len(messages)))
+        else:
+            messages.extend(_turns(int(part.split(":")[1]), start=len(messages)))
+    chat = _create_auto_chat(["kim_shin"], [ChatHistoryItem(**m) for m in messages], user.id, db)
+
+    read = []
+
+    def counting_iter(chat, db):
+        for message in iter_messages_reverse(chat, db):
+            read.append(message)
+            yield message
+
+    monkeypatch.setattr(chat_session, "iter_messages_reverse", counting_iter)
+    loaded = chat_session._load_session(chat, db)
+
+    expected = chat_session.ChatSession(chat.id, [], False, len(messages))
+    for message in messages:
+        expected.apply(message)
+    assert loaded.history_for_ai() == expected.history_for_ai()
+    assert loaded.in_debate == expected.in_debate
+    if layout == ["turns:100"]:
+        # 토론 표시가 없는 대화는 필요한 만큼만 읽음
+        assert len(read) == MAX_HISTORY_MESSAGES
@@ -0,0 +1,101 @@
+"""예약 작업 디스패처: 작업이 앱 이벤트 루프에서 LLM 게이트웨이(generate_content_async)를 거쳐 실행되는지"""
+
+import time
+import asyncio
+from types import SimpleNamespace
+
+import diary
+from database import SessionLocal, ExchangeDiary, ScheduledJob
+from job_queue import dispatcher, enqueue_job, JOB_DONE, JOB_PENDING
+
+REPLY_TEXT = "오늘 일기 잘 읽었어. " * 20
+
+
+class LoopBoundModel:
+    """grpc_asyncio 클라이언트처럼 처음 호출한 이벤트 루프에 묶이는 가짜 모델"""
+
+    def __init__(self, text: str = REPLY_TEXT, error: Exception = None):
+        self.text = text
+        self.error = error
+        self.loop = None
+        self.calls = 0
+
+    async def generate_content_async(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        elif self.loop is not loop:
+            raise RuntimeError("Future attached to a different loop")
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(text=self.text)
+
+
+def _create_exchange_diary(db, user) -> int:
+    exchange = ExchangeDiary(user_id=user.id, character_id="kim_shin", content="오늘은 비가 왔다.")
+    db.add(exchange)
+    db.commit()
+    return exchange.id
+
+
+def _enqueue_reply(exchange_id: int, key: str):
+    # 엔드포인트처럼 스레드풀에서 등록 (디스패처 알림이 다른 스레드에서 옴)
+    db = SessionLocal()
+    try:
+        enqueue_job(db, diary.REPLY_JOB, {"exchange_diary_id": exchange_id}, key=key)
+    finally:
+        db.close()
+
+
+async def _run_reply_job(exchange_id: int, fake: LoopBoundModel, timeout: float = 10.0) -> ScheduledJob:
+    # 요청 처리에서 이미 LLM을 호출해 클라이언트가 앱 루프에 묶인 상태
+    fake.loop = asyncio.get_running_loop()
+    dispatcher.start()
+    try:
+        key = f"reply_{exchange_id}"
+        await asyncio.to_thread(_enqueue_reply, exchange_id, key)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            check = SessionLocal()
+            try:
+                job = check.query(ScheduledJob).filter(ScheduledJob.job_key == key).first()
+                if job.status != "running" and job.attempts:
+                    return job
+            finally:
+                check.close()
+            await asyncio.sleep(0.05)
+        raise AssertionError("작업이 제한 시간 안에 끝나지 않음")
+    finally:
+        await dispatcher.stop()
+
+
+def test_reply_job_runs_on_app_loop(db, user, monkeypatch):
+    fake = LoopBoundModel()
+    monkeypatch.setattr(diary, "model", fake)
+    exchange_id = _create_exchange_diary(db, user)
+
+    job = asyncio.run(_run_reply_job(exchange_id, fake))
+
+    assert job.status == JOB_DONE
+    assert fake.calls >= 1
+    db.expire_all()
+    exchange = db.get(ExchangeDiary, exchange_id)
+    assert exchange.reply_received
+    assert REPLY_TEXT.strip() in exchange.reply_content
+
+
+def test_reply_job_retries_instead_of_fallback_letter(db, user, monkeypatch):
+    fake = LoopBoundModel(error=ValueError("boom"))
+    monkeypatch.setattr(diary, "model", fake)
+    exchange_id = _create_exchange_diary(db, user)
+
+    job = asyncio.run(_run_reply_job(exchange_id, fake))
+
+    assert job.status == JOB_PENDING
+    assert job.attempts == 1
+    assert "boom" in job.last_error
+    db.expire_all()
+    exchange = db.get(ExchangeDiary, exchange_id)
+    assert not exchange.reply_received
+    assert exchange.reply_content is None
@@ -0,0 +1,25 @@
+"""기억 참조 시간 배치 반영: 삭제된 기억 id가 섞여도 나머지 갱신이 반영되고 대기열에 남지 않는지"""
+
+from datetime import datetime
+
+from database import CharacterMemory
+from memory_store import MemoryTouchBuffer
+
+
+def test_flush_skips_missing_memory_ids(db, user):
+    memory = CharacterMemory(user_id=user.id, character_id="kim_shin", memory_type="event", content="첫 만남",
+                             last_referenced=datetime(2020, 1, 1))
+    db.add(memory)
+    db.commit()
+
+    referenced_at = datetime(2026, 1, 1, 12, 0)
+    buffer = MemoryTouchBuffer()
+    buffer._ensure_started = lambda: None
+    buffer.touch([memory.id, 987654321], referenced_at)
+
+    buffer.flush()
+
+    db.expire_all()
+    assert db.get(CharacterMemory, memory.id).last_referenced == referenced_at
+    # 실패로 되돌아간 갱신 없음 (다음 주기에 같은 배치를 다시 시도하지 않음)
+    assert buffer._pending == {}
@@ -0,0 +1,23 @@
+"""캐릭터 음악 추천: 요청에 기분이 없으면 대화에서 분석한 기분으로 가장 많이 대화한 캐릭터가 추천하는지"""
+
+import asyncio
+
+import features
+from chat import ChatHistoryItem, _create_auto_chat
+
+
+def test_recommendation_without_request_moods_uses_detected_moods(db, user):
+    messages = [
+        ChatHistoryItem(id=1.0, sender="user", text="요즘 너무 우울하고 힘들어", characterId=None),
+        ChatHistoryItem(id=2.0, sender="ai", text="내가 옆에 있을게", characterId="kim_shin"),
+    ]
+    saved = _create_auto_chat(["kim_shin"], messages, user.id, db)
+    saved.is_manual = 1
+    db.commit()
+
+    result = asyncio.run(features.get_character_music_recommendation(request={}, current_user=user, db=db))
+
+    assert result["character_id"] == "kim_shin"
+    assert result["comment"]
+    assert "우울" in result["detected_moods"]
+    assert set(result["detected_moods"]) & set(result["song"]["mood"])
@@ -0,0 +1,153 @@
+"""페르소나 컨텍스트 캐시: 가짜 클라이언트로 캐시 적중/생성/연장/정리 확인"""
+
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import persona_cache
+from persona_cache import PersonaPrefixCache, PERSONA_CACHE_REFRESH_MARGIN_SECONDS, PERSONA_CACHE_IDLE_SECONDS
+from personas import CHARACTER_PERSONAS
+
+CHAR_A, CHAR_B = list(CHARACTER_PERSONAS)[:2]
+
+
+class StubClient:
+    """genai.caching.CachedContent / genai.GenerativeModel 대신 쓰는 가짜 클라이언트"""
+
+    def __init__(self, create_delay: float = 0.0, fail: bool = False):
+        self.create_delay = create_delay
+        self.fail = fail
+        self.created = []
+        self.updated = []
+        self.deleted = []
+        self._lock = threading.Lock()
+        self.caching = SimpleNamespace(CachedContent=SimpleNamespace(create=self._create))
+        self.GenerativeModel = SimpleNamespace(
+            from_cached_content=lambda cached_content: SimpleNamespace(cached_content=cached_content)
+        )
+
+    def _create(self, model, display_name, system_instruction, ttl):
+        time.sleep(self.create_delay)
+        if self.fail:
+            raise ValueError("cached content too small")
+        handle = SimpleNamespace(
+            name=display_name,
+            update=lambda ttl: self.updated.append(display_name),
+            delete=lambda: self.deleted.append(display_name),
+        )
+        with self._lock:
+            self.created.append(display_name)
+        return handle
+
+
+def _cache(client: StubClient) -> PersonaPrefixCache:
+    return PersonaPrefixCache(client=client, base_model=SimpleNamespace(model_name="models/stub"))
+
+
+async def _drain(cache: PersonaPrefixCache):
+    while cache._background:
+        await asyncio.gather(*list(cache._background))
+
+
+def test_first_call_misses_then_hits():
+    client = StubClient()
+    cache = _cache(client)
+
+    async def run():
+        first = await cache.get_model(CHAR_A, CHARACTER_PERSONAS[CHAR_A])
+        second = await cache.get_model(CHAR_A, CHARACTER_PERSONAS[CHAR_A])
+        await _drain(cache)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first is not None and first is second
+    assert client.created == [f"persona-{CHAR_A}"]
+    assert cache.stats["misses"] == 1 and cache.stats["creates"] == 1 and cache.stats["hits"] == 1
+    assert CHAR_A in cache.snapshot()["entries"]
+
+
+def test_unregistered_persona_is_not_cached():
+    client = StubClient()
+    cache = _cache(client)
+
+    assert asyncio.run(cache.get_model(CHAR_A, dict(CHARACTER_PERSONAS[CHAR_A]))) is None
+    assert client.created == []
+
+
+def test_concurrent_misses_create_once_per_character_without_blocking_others():
+    client = StubClient(create_delay=0.3)
+    cache = _cache(client)
+
+    async def run():
+        started = time.monotonic()
+        models = await asyncio.gather(
+            *(cache.get_model(CHAR_A, CHARACTER_PERSONAS[CHAR_A]) for _ in range(5)),
+            cache.get_model(CHAR_B, CHARACTER_PERSONAS[CHAR_B]),
+        )
+        await _drain(cache)
+        return models, time.monotonic() - started
+
+    models, elapsed = asyncio.run(run())
+
+    assert sorted(client.created) == sorted([f"persona-{CHAR_A}", f"persona-{CHAR_B}"])
+    assert len({id(m) for m in models[:5]}) == 1
+    assert cache.stats["misses"] == 2 and cache.stats["hits"] == 4
+    # 두 캐릭터의 생성이 한 잠금에 줄 서지 않음
+    assert elapsed < 0.55
+
+
+def test_create_failure_falls_back_and_backs_off():
+    client = StubClient(fail=True)
+    cache = _cache(client)
+
+    async def run():
+        first = await cache.get_model(CHAR_A, CHARACTER_PERSONAS[CHAR_A])
+        second = await cache.get_model(CHAR_A, CHARACTER_PERSONAS[CHAR_A])
+        return first, second
+
+    assert asyncio.run(run()) == (None, None)
+    assert cache.stats["failures"] == 1 and cache.stats["misses"] == 1
+
+
+def test_refresh_ahead_runs_in_background():
+    client = StubClient()
+    cache = _cache(client)
+
+    async def run():
+        cached = await cache.get_model(CHAR_A, CHARACTER_PERSONAS[CHAR_A])
+        await _drain(cache)
+        entry = cache._entries[CHAR_A]
+        entry["expires_at"] = time.time() + PERSONA_CACHE_REFRESH_MARGIN_SECONDS / 2
+        # 만료가 가까워도 요청은 기존 캐시를 바로 받고, 연장은 뒤에서 진행
+        again = await cache.get_model(CHAR_A, CHARACTER_PERSONAS[CHAR_A])
+        assert client.updated == []
+        await _drain(cache)
+        return cached, again, entry
+
+    cached, again, entry = asyncio.run(run())
+
+    assert again is cached
+    assert client.updated == [f"persona-{CHAR_A}"]
+    assert cache.stats["refreshes"] == 1
+    assert entry["expires_at"] - time.time() > PERSONA_CACHE_REFRESH_MARGIN_SECONDS
+
+
+def test_idle_entries_are_deleted_by_background_sweep(monkeypatch):
+    client = StubClient()
+    cache = _cache(client)
+
+    async def run():
+        await cache.get_model(CHAR_A, CHARACTER_PERSONAS[CHAR_A])
+        await _drain(cache)
+        cache._entries[CHAR_A]["last_used"] = time.time() - PERSONA_CACHE_IDLE_SECONDS - 1
+        monkeypatch.setattr(persona_cache, "PERSONA_CACHE_SWEEP_SECONDS", 0)
+        await cache.get_model(CHAR_B, CHARACTER_PERSONAS[CHAR_B])
+        await _drain(cache)
+
+    asyncio.run(run())
+
+    assert client.deleted == [f"persona-{CHAR_A}"]
+    assert CHAR_A not in cache._entries and CHAR_B in cache._entries
+    assert cache.stats["evictions"] == 1
@@ -0,0 +1,123 @@
+"""목록/통계/프로필 사진 쿼리 실행 계획: 실제 조회 코드가 내는 SELECT마다 EXPLAIN QUERY PLAN으로 인덱스 사용 확인"""
+
+import re
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event
+
+import ai_service
+import avatar_store
+import chat
+import diary
+import features
+from chat import ChatHistoryItem, _create_auto_chat
+from database import engine, EmotionDiary, ExchangeDiary
+
+# 사용자별로 조회하는 테이블 (전체 테이블 SCAN이 나오면 안 됨)
+USER_SCOPED_TABLES = (
+    "chat_histories", "chat_messages", "chat_daily_stats", "chat_character_daily_stats",
+    "character_memories", "emotion_diaries", "exchange_diaries", "user_avatars", "users",
+)
+_FULL_SCAN_RE = re.compile(r"^SCAN (\w+)(?! USING)")
+
+CHAT_HISTORY_FLAG_INDEXES = ("ix_chat_histories_user_manual_updated", "ix_chat_histories_user_quote_updated")
+# user_id로만 좁히는 조회 (is_manual_quote가 0 또는 NULL) - user_id로 시작하는 어느 인덱스든 가능
+CHAT_HISTORY_USER_INDEXES = CHAT_HISTORY_FLAG_INDEXES + ("ix_chat_histories_user_created",)
+CHAT_MESSAGES_INDEX = "ix_chat_messages_chat_id_seq"
+AVATAR_PRIMARY_KEY = "INTEGER PRIMARY KEY"
+
+# (조회, 호출, 쓰여야 하는 인덱스 - 각 튜플에서 하나 이상)
+CASES = [
+    ("chat.quotes", lambda u, db: chat.get_saved_quotes(current_user=u, db=db),
+     [("ix_chat_histories_user_quote_updated",)]),
+    ("chat.histories", lambda u, db: chat.get_chat_histories(limit=20, cursor=None, view="summary", current_user=u, db=db),
+     [CHAT_HISTORY_FLAG_INDEXES, (CHAT_MESSAGES_INDEX,)]),
+    ("chat.histories_full", lambda u, db: chat.get_chat_histories(limit=None, cursor=None, view="full", current_user=u, db=db),
+     [CHAT_HISTORY_FLAG_INDEXES, (CHAT_MESSAGES_INDEX,)]),
+    ("chat.histories_all", lambda u, db: chat.get_all_chat_histories(limit=20, cursor=None, view="summary", current_user=u, db=db),
+     [CHAT_HISTORY_USER_INDEXES, (CHAT_MESSAGES_INDEX,)]),
+    ("chat.most_chatted", lambda u, db: chat.get_most_chatted_character(u.id, ["kim_shin"], db),
+     [CHAT_HISTORY_USER_INDEXES, (CHAT_MESSAGES_INDEX,)]),
+    ("chat.stats_weekly", lambda u, db: chat.get_weekly_chat_stats(current_user=u, db=db),
+     [("ix_chat_daily_stats_user_day",), ("ix_chat_character_daily_stats_user_day",)]),
+    ("chat.stats_weekly_history", lambda u, db: chat.get_weekly_history_stats(current_user=u, db=db),
+     [("ix_chat_daily_stats_user_day",), ("ix_chat_character_daily_stats_user_day",)]),
+    ("chat.stats_week_detail", lambda u, db: chat.get_week_detail_stats(week_start=date.today().isoformat(), current_user=u, db=db),
+     [("ix_chat_daily_stats_user_day",), ("ix_chat_character_daily_stats_user_day",)]),
+    ("diary.list", lambda u, db: diary.get_diary_list(limit=20, cursor=None, current_user=u, db=db),
+     [("ix_emotion_diaries_user_date",)]),
+    ("diary.exchange_list", lambda u, db: diary.get_exchange_diary_list(limit=20, cursor=None, view="summary", current_user=u, db=db),
+     [("ix_exchange_diaries_user_created",)]),
+    ("diary.today_topic", lambda u, db: diary.get_today_topic(current_user=u, db=db),
+     [("ix_exchange_diaries_user_reply",)]),
+    ("diary.topic_already_set", lambda u, db: diary._topic_already_set(u.id, datetime.utcnow(), db),
+     [("ix_exchange_diaries_user_created",)]),
+    ("features.archetype_adjustments", lambda u, db: features.compute_user_archetype_adjustments(u.id, db),
+     [("ix_chat_histories_user_created",)]),
+    ("features.mood", lambda u, db: features.analyze_user_mood_from_chat(u.id, db),
+     [("ix_chat_histories_user_manual_updated",)]),
+    ("features.music_inputs", lambda u, db: features._music_recommendation_inputs(u.id, [], db),
+     [("ix_chat_histories_user_manual_updated",)]),
+    ("memories", lambda u, db: ai_service.get_character_memories(u.id, "kim_shin", db),
+     [("ix_character_memories_user_character",)]),
+    ("avatar.get", lambda u, db: avatar_store.get_avatar(u.id, db), [(AVATAR_PRIMARY_KEY,)]),
+    ("avatar.url", lambda u, db: avatar_store.avatar_url(u.id, db), [(AVATAR_PRIMARY_KEY,)]),
+    ("avatar.profile_pic", lambda u, db: avatar_store.get_profile_pic(u.id, db), [(AVATAR_PRIMARY_KEY,)]),
+]
+
+
+@pytest.fixture
+def seeded_user(db, user):
+    """대화/대사/일기/교환일기/프로필 사진이 하나씩 있는 사용자 (메시지 조회 쿼리까지 실행되도록)"""
+    messages = [
+        ChatHistoryItem(id=1.0, sender="user", text="오늘 너무 행복해", characterId=None),
+        ChatHistoryItem(id=2.0, sender="ai", text="다행이다", characterId="kim_shin"),
+    ]
+    saved = _create_auto_chat(["kim_shin"], messages, user.id, db)
+    saved.is_manual = 1
+    quote = _create_auto_chat(["kim_shin"], messages[1:], user.id, db)
+    quote.is_manual_quote = 1
+    db.add(EmotionDiary(user_id=user.id, title="일기", content="내용", diary_date=date.today()))
+    db.add(ExchangeDiary(user_id=user.id, character_id="kim_shin", content="교환일기"))
+    avatar_store.set_avatar(user.id, "data:image/png;base64,AAAA", db)
+    db.commit()
+    return user
+
+
+def _query_plans(db, call):
+    """call이 실행한 SELECT마다 (SQL, 실행 계획 설명 목록)"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    connection = db.connection()
+    return [
+        (statement, [row[3] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)])
+        for statement, parameters in statements
+    ]
+
+
+@pytest.mark.parametrize("name, call, expected", CASES, ids=[case[0] for case in CASES])
+def test_query_uses_index(seeded_user, db, name, call, expected):
+    plans = _query_plans(db, lambda: call(seeded_user, db))
+    assert plans, f"{name}: 실행된 SELECT가 없음"
+
+    details = [detail for _, steps in plans for detail in steps]
+    for statement, steps in plans:
+        for detail in steps:
+            match = _FULL_SCAN_RE.match(detail)
+            assert not (match and match.group(1) in USER_SCOPED_TABLES), f"{name}: 전체 테이블 스캔 {detail}\n{statement}"
+
+    for candidates in expected:
+        assert any(index in detail for detail in details for index in candidates), (
+            f"{name}: {candidates} 중 쓰인 인덱스가 없음\n" + "\n".join(details)
+        )
@@ -0,0 +1,109 @@
+"""LLM 호출 속도 제한: 프록시 뒤 클라이언트 구분과 429 이후 백오프"""
+
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted
+
+import llm_gateway
+from llm_gateway import generate_content_async
+from rate_limiter import (
+    LLMRateLimiter, LLMScopeMiddleware, RateLimitExceeded, current_llm_scope, llm_scope, ENDPOINT_CHAT
+)
+
+
+def _scope_for(middleware: LLMScopeMiddleware, client: str, headers=()):
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["scope"] = current_llm_scope()
+
+    middleware.app = app
+    scope = {"type": "http", "path": "/chat", "client": (client, 5000), "headers": list(headers)}
+    asyncio.run(middleware(scope, None, None))
+    return seen["scope"]
+
+
+def test_anonymous_user_keyed_by_forwarded_client_behind_trusted_proxy():
+    middleware = LLMScopeMiddleware(None, trusted_proxies="10.0.0.0/8")
+
+    # 프록시 두 단계를 거친 요청: 오른쪽부터 신뢰하는 프록시를 건너뛴 첫 주소
+    headers = [(b"x-forwarded-for", b"198.51.100.7, 10.0.0.5")]
+    assert _scope_for(middleware, "10.0.0.1", headers) == (ENDPOINT_CHAT, "ip:198.51.100.7")
+    assert _scope_for(middleware, "10.0.0.1", [(b"x-forwarded-for", b"203.0.113.9")]) == (ENDPOINT_CHAT, "ip:203.0.113.9")
+
+
+def test_forwarded_header_ignored_from_untrusted_peer():
+    middleware = LLMScopeMiddleware(None, trusted_proxies="10.0.0.0/8")
+    headers = [(b"x-forwarded-for", b"198.51.100.7")]
+    assert _scope_for(middleware, "192.0.2.1", headers) == (ENDPOINT_CHAT, "ip:192.0.2.1")
+
+    # 신뢰하는 프록시가 없으면 헤더를 쓰지 않음
+    assert _scope_for(LLMScopeMiddleware(None), "10.0.0.1", headers) == (ENDPOINT_CHAT, "ip:10.0.0.1")
+
+
+def test_logged_in_user_keyed_by_token_subject():
+    middleware = LLMScopeMiddleware(None, user_key=lambda token: "alice" if token == "good" else None)
+    assert _scope_for(middleware, "10.0.0.1", [(b"authorization", b"Bearer good")]) == (ENDPOINT_CHAT, "user:alice")
+    assert _scope_for(middleware, "10.0.0.1", [(b"authorization", b"Bearer bad")]) == (ENDPOINT_CHAT, "ip:10.0.0.1")
+
+
+class RateLimitedModel:
+    """처음 failures번은 429(ResourceExhausted)를 내고 그 뒤에는 응답하는 가짜 모델"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.call_times = []
+
+    async def generate_content_async(self, *args, **kwargs):
+        self.call_times.append(time.monotonic())
+        if len(self.call_times) <= self.failures:
+            raise ResourceExhausted("429 quota exceeded")
+        return SimpleNamespace(text="ok")
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = LLMRateLimiter(
+        key_limit=(6000, 100), user_limit=(6000, 100), class_limits={}, deadlines={}, penalty_seconds=0.3
+    )
+    monkeypatch.setattr(llm_gateway, "llm_rate_limiter", limiter)
+    monkeypatch.setattr(llm_gateway, "_backoff_delay", lambda attempt: 0.0)
+    monkeypatch.setattr(llm_gateway, "_rate_limited_until", 0.0)
+    return limiter
+
+
+def test_429_blocks_api_key_bucket_before_retry(limiter):
+    model = RateLimitedModel(failures=1)
+
+    response = asyncio.run(generate_content_async(model, "안녕"))
+
+    assert response.text == "ok"
+    assert len(model.call_times) == 2
+    # 재시도 백오프는 0이지만 API 키 버킷이 비워진 동안 기다렸다가 다시 호출
+    assert model.call_times[1] - model.call_times[0] >= 0.25
+    snapshot = limiter.snapshot()
+    assert snapshot["penalized"] == 1
+    assert snapshot["queued"] == 1
+    assert llm_gateway.rate_limit_cooldown() > 0
+
+
+def test_429_sheds_calls_that_cannot_wait(limiter):
+    model = RateLimitedModel(failures=1)
+
+    async def run():
+        with pytest.raises(ResourceExhausted):
+            await generate_content_async(model, "첫 호출", max_attempts=1)
+        # 버킷이 비어 있는 동안 짧게만 기다릴 수 있는 호출은 모델을 부르지 않고 바로 거절
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire(ENDPOINT_CHAT, "user:bob", deadline=0.05)
+        with llm_scope(ENDPOINT_CHAT, "user:bob"):
+            return await generate_content_async(model, "다음 호출")
+
+    response = asyncio.run(run())
+
+    assert response.text == "ok"
+    assert len(model.call_times) == 2
+    assert limiter.snapshot()["shed"] == 1
@@ -0,0 +1,68 @@
+"""release_connection: LLM 응답을 기다리기 전에 읽기 트랜잭션의 연결을 풀에 돌려주는지"""
+
+import asyncio
+from types import SimpleNamespace
+
+from database import engine, release_connection, SessionLocal, ExchangeDiary, User
+
+
+def test_read_session_returns_connection_without_expiring_objects(user):
+    db = SessionLocal()
+    try:
+        before = engine.pool.checkedout()
+        loaded = db.query(User).filter(User.id == user.id).first()
+        assert engine.pool.checkedout() == before + 1
+
+        release_connection(db)
+
+        assert engine.pool.checkedout() == before
+        # 로드한 값은 그대로 (다시 조회하려고 연결을 꺼내지 않음)
+        assert loaded.username == user.username
+        assert engine.pool.checkedout() == before
+
+        # 다음 조회는 새 트랜잭션으로 연결을 다시 꺼냄
+        assert db.query(User).filter(User.id == user.id).count() == 1
+        assert engine.pool.checkedout() == before + 1
+    finally:
+        db.close()
+
+
+def test_pending_changes_are_not_committed(user):
+    db = SessionLocal()
+    try:
+        loaded = db.get(User, user.id)
+        loaded.nickname = "바뀐 닉네임"
+
+        release_connection(db)
+        db.rollback()
+
+        assert db.get(User, user.id).nickname != "바뀐 닉네임"
+    finally:
+        db.close()
+
+
+def test_generate_reply_holds_no_connection_during_llm_calls(db, user, monkeypatch):
+    import diary
+
+    entry = ExchangeDiary(user_id=user.id, character_id="kim_shin", content="오늘은 바다를 보고 왔어")
+    db.add(entry)
+    db.commit()
+    entry_id = entry.id
+    db.commit()  # 위에서 id를 다시 읽으며 꺼낸 연결 반환
+
+    held = []
+
+    async def fake_generate(model, prompt, **kwargs):
+        held.append(engine.pool.checkedout())
+        return SimpleNamespace(text="바다 얘기 들으니까 나도 가고 싶다. " * 10)
+
+    monkeypatch.setattr(diary, "model", object())
+    monkeypatch.setattr(diary, "generate_content_async", fake_generate)
+    before = engine.pool.checkedout()
+
+    asyncio.run(diary.generate_reply(entry_id))
+
+    # 답장 본문과 내일의 주제, 두 번의 LLM 호출 모두 연결을 쥐지 않은 상태
+    assert held == [before, before]
+    db.expire_all()
+    assert db.get(ExchangeDiary, entry_id).reply_received
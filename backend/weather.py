@@ -0,0 +1,151 @@
+"""
+날씨 제공 모듈
+OpenWeatherMap 현재 날씨를 백그라운드 스레드에서 주기적으로 받아 메모리에 보관합니다.
+요청 처리 중에는 네트워크 호출 없이 보관된 값만 읽습니다.
+- TTL이 지난 값도 MAX_STALE 동안은 그대로 쓰면서 백그라운드에서 갱신 (stale-while-revalidate)
+- 연속으로 실패하면 일정 시간 API 호출을 멈춤 (서킷 브레이커)
+"""
+
+import os
+import time
+import threading
+from typing import Optional
+
+# 날씨 API 설정
+WEATHER_API_URL = "https://api.openweathermap.org/data/2.5/weather"
+WEATHER_CITY = "Seoul"
+WEATHER_REQUEST_TIMEOUT_SECONDS = 5
+
+# 캐시 설정 (초)
+WEATHER_TTL_SECONDS = 30 * 60          # 이 시간이 지나면 갱신 대상
+WEATHER_MAX_STALE_SECONDS = 3 * 60 * 60  # 이 시간이 지나면 값을 버리고 기본값 사용
+WEATHER_REFRESH_INTERVAL_SECONDS = 10 * 60  # 백그라운드 갱신 주기
+
+# 서킷 브레이커 설정
+WEATHER_FAILURE_THRESHOLD = 3          # 연속 실패 횟수
+WEATHER_CIRCUIT_OPEN_SECONDS = 5 * 60  # 호출 중단 시간
+
+# OpenWeatherMap 설명 -> 한국어 날씨
+WEATHER_MAP = {
+    'clear sky': '맑음',
+    'few clouds': '구름 조금',
+    'scattered clouds': '구름 많음',
+    'broken clouds': '흐림',
+    'shower rain': '소나기',
+    'rain': '비',
+    'thunderstorm': '천둥번개',
+    'snow': '눈',
+    'mist': '안개'
+}
+
+
+class WeatherProvider:
+    """현재 날씨 캐시 (백그라운드 갱신)"""
+
+    def __init__(self):
+        self._weather: Optional[str] = None
+        self._fetched_at = 0.0
+        self._failures = 0
+        self._circuit_open_until = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _api_key() -> Optional[str]:
+        return os.getenv('WEATHER_API_KEY')
+
+    def _fetch(self) -> Optional[str]:
+        """날씨 API 호출 (블로킹, 백그라운드 스레드에서만 호출)"""
+        import requests
+        response = requests.get(
+            WEATHER_API_URL,
+            params={
+                "q": WEATHER_CITY,
+                "appid": self._api_key(),
+                "lang": "kr",
+                "units": "metric"
+            },
+            timeout=WEATHER_REQUEST_TIMEOUT_SECONDS
+        )
+        response.raise_for_status()
+        data = response.json()
+        weather_desc = data.get('weather', [{}])[0].get('description', '')
+        return WEATHER_MAP.get(weather_desc, weather_desc) or None
+
+    def refresh(self):
+        """날씨를 한 번 갱신 (서킷이 열려 있으면 건너뜀)"""
+        now = time.time()
+        with self._lock:
+            if self._refreshing or now < self._circuit_open_until:
+                return
+            self._refreshing = True
+
+        try:
+            weather = self._fetch()
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                if self._failures >= WEATHER_FAILURE_THRESHOLD:
+                    self._circuit_open_until = time.time() + WEATHER_CIRCUIT_OPEN_SECONDS
+                    print(f"날씨 API 연속 {self._failures}회 실패 - {WEATHER_CIRCUIT_OPEN_SECONDS}초간 호출 중단: {e}")
+                else:
+                    print(f"날씨 API 오류 (무시됨): {e}")
+        else:
+            with self._lock:
+                if weather:
+                    self._weather = weather
+                    self._fetched_at = time.time()
+                self._failures = 0
+                self._circuit_open_until = 0.0
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _refresh_in_background(self):
+        threading.Thread(target=self.refresh, name="weather-refresh", daemon=True).start()
+
+    def get(self, default_weather: str) -> str:
+        """현재 날씨 반환 (네트워크 호출 없음)
+
+        API 키가 없거나 아직 받은 값이 없으면 default_weather를 반환합니다.
+        """
+        default_weather = default_weather or "맑음"
+        if not self._api_key():
+            return default_weather
+
+        now = time.time()
+        weather, age = self._weather, now - self._fetched_at
+        if weather is None or age > WEATHER_TTL_SECONDS:
+            # 오래된 값은 일단 쓰고 백그라운드에서 갱신
+            if not self._refreshing and now >= self._circuit_open_until:
+                self._refresh_in_background()
+        if weather is None or age > WEATHER_MAX_STALE_SECONDS:
+            return default_weather
+        return weather
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(WEATHER_REFRESH_INTERVAL_SECONDS)
+
+    def start(self):
+        """백그라운드 주기 갱신 시작 (API 키가 없으면 아무것도 하지 않음)"""
+        if not self._api_key() or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="weather-provider", daemon=True)
+        self._thread.start()
+        print("✅ 날씨 백그라운드 갱신 시작")
+
+    def stop(self):
+        self._stop.set()
+
+
+weather_provider = WeatherProvider()
+
+
+def fetch_current_weather(default_weather: str) -> str:
+    """캐시된 최신 날씨 반환 (API 키가 없거나 값이 없으면 default_weather)"""
+    return weather_provider.get(default_weather)